@@ -0,0 +1,119 @@
+#
+# NicoBot is Nicovideo Player bot for Discord, written from the scratch.
+# This file is part of NicoBot.
+#
+# Copyright (C) 2021 Wonjun Jung (KokoseiJ)
+#
+#    Nicobot is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Measures how many Message objects could be constructed per second.
+
+MESSAGE_CREATE payloads are turned into Message objects with DictObject.lazy
+off and on, and the rate is reported for construction alone, and for
+construction followed by reading the fields a typical command handler reads-
+content, author and channel.
+
+    python benchmarks/bench_dictobject.py [--members 1000] [--number 10000]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+projpath = os.path.normpath(os.path.join(os.path.abspath(__file__), "../.."))
+sys.path.insert(0, projpath)
+
+from discordapi import DictObject, Guild, MemberCache, Message
+from gateway_session import make_guild, make_message
+
+
+class FakeClient:
+    compact = False
+    member_cache = MemberCache
+
+    def __init__(self):
+        self.guilds = {}
+
+    def get_guild(self, id_):
+        return self.guilds.get(id_)
+
+    def get_channel(self, id_):
+        for guild in self.guilds.values():
+            channel = guild.get_channel(id_)
+            if channel is not None:
+                return channel
+
+
+def construct(client, payloads):
+    for payload in payloads:
+        Message(client, payload)
+
+
+def construct_and_read(client, payloads):
+    for payload in payloads:
+        message = Message(client, payload)
+        message.content
+        message.author.id
+        message.channel
+
+
+def best_of(func, client, payloads, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(client, payloads)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return len(payloads) / best
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("--members", type=int, default=1000,
+                           help="members in the guild")
+    argparser.add_argument("--number", type=int, default=10000,
+                           help="messages to construct")
+    argparser.add_argument("--repeat", type=int, default=5)
+    args = argparser.parse_args()
+
+    rng = random.Random(0)
+    client = FakeClient()
+    guild = make_guild(rng, args.members)
+    client.guilds[guild["id"]] = Guild(client, guild)
+    payloads = [make_message(rng, guild) for _ in range(args.number)]
+
+    results = {}
+    for lazy in (False, True):
+        DictObject.lazy = lazy
+        results[lazy] = (
+            best_of(construct, client, payloads, args.repeat),
+            best_of(construct_and_read, client, payloads, args.repeat),
+        )
+    DictObject.lazy = False
+
+    base = results[False]
+    for lazy, (construct_rate, read_rate) in results.items():
+        name = "lazy" if lazy else "eager"
+        print(f"{name:>5}: construct {construct_rate:,.0f} objects/s "
+              f"({construct_rate / base[0]:.1f}x), "
+              f"construct+read {read_rate:,.0f} objects/s "
+              f"({read_rate / base[1]:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#
+# NicoBot is Nicovideo Player bot for Discord, written from the scratch.
+# This file is part of NicoBot.
+#
+# Copyright (C) 2021 Wonjun Jung (KokoseiJ)
+#
+#    Nicobot is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Measures CPU cost per packet of each voice encryption mode.
+
+Only the encryption step is measured- RTP header is assumed to be written
+already, and nothing is sent.
+
+    python benchmarks/bench_encryption.py [--frame-size 240] [--packets 100000]
+"""
+
+import os
+import sys
+import time
+import argparse
+
+projpath = os.path.normpath(os.path.join(os.path.abspath(__file__), "../.."))
+sys.path.insert(0, projpath)
+
+from discordapi.encryption import ENCRYPTION_MODES, HEADER_SIZE
+
+
+def run(cls, frame, packets):
+    buffer = bytearray(4096)
+    encryption = cls(os.urandom(32), buffer)
+
+    start = time.process_time()
+    for _ in range(packets):
+        size = encryption.encrypt(0, frame)
+    elapsed = time.process_time() - start
+
+    return elapsed / packets, size
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("--frame-size", type=int, default=240,
+                           help="Opus frame size, 240 is 96kbps 20ms")
+    argparser.add_argument("--packets", type=int, default=100000)
+    args = argparser.parse_args()
+
+    frame = os.urandom(args.frame_size)
+
+    for mode, cls in ENCRYPTION_MODES.items():
+        per_packet, size = run(cls, frame, args.packets)
+        print(f"{mode:>26}: {per_packet * 1e6:.2f}us/packet, "
+              f"{size} bytes/packet "
+              f"({size - HEADER_SIZE - args.frame_size} bytes overhead)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#
+# NicoBot is Nicovideo Player bot for Discord, written from the scratch.
+# This file is part of NicoBot.
+#
+# Copyright (C) 2021 Wonjun Jung (KokoseiJ)
+#
+#    Nicobot is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Compares id lookups through the entity index against scanning every guild.
+
+Guilds are fed to GatewayEventParser as GUILD_CREATE events, then channels
+and users are looked up by id, and MESSAGE_CREATE payloads are turned into
+Message objects. The scan is the previous implementation of
+DiscordClient.get_channel and .get_user, which built a dict of every channel
+or member in every guild on each call.
+
+    python benchmarks/bench_entity_index.py [--guilds 1000] [--channels 100]
+                                            [--members 10] [--number 1000]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+projpath = os.path.normpath(os.path.join(os.path.abspath(__file__), "../.."))
+sys.path.insert(0, projpath)
+
+from discordapi import DiscordClient, Message
+from gateway_session import make_guild, make_message
+
+
+def scan_channel(client, id_):
+    return {
+        x: y
+        for guild in client.get_guilds().values()
+        for x, y in guild.get_channels().items()
+    }.get(id_)
+
+
+def scan_user(client, id_):
+    return {
+        x: y.user
+        for guild in client.get_guilds().values()
+        for x, y in guild.get_members().items()
+        if guild.get_members() is not None
+    }.get(id_)
+
+
+def rate(func, args):
+    start = time.perf_counter()
+    for arg in args:
+        func(arg)
+    return len(args) / (time.perf_counter() - start)
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("--guilds", type=int, default=1000)
+    argparser.add_argument("--channels", type=int, default=100,
+                           help="channels per guild")
+    argparser.add_argument("--members", type=int, default=10,
+                           help="members per guild")
+    argparser.add_argument("--number", type=int, default=1000,
+                           help="lookups and messages per measurement")
+    args = argparser.parse_args()
+
+    rng = random.Random(0)
+    client = DiscordClient(token="token")
+    client.guilds = {}
+    guilds = [make_guild(rng, args.members, args.channels)
+              for _ in range(args.guilds)]
+    for guild in guilds:
+        client.event_parser.on_guild_create(guild)
+
+    channel_ids = [rng.choice(list(client.index.channels))
+                   for _ in range(args.number)]
+    user_ids = [rng.choice(list(client.index.users))
+                for _ in range(args.number)]
+    payloads = [make_message(rng, rng.choice(guilds))
+                for _ in range(args.number)]
+
+    # The scan takes long- fewer iterations for it
+    scan_number = max(args.number // 100, 1)
+
+    print(f"{args.guilds} guilds, {len(client.index.channels):,} channels, "
+          f"{len(client.index.users):,} users")
+
+    index_rate = rate(client.get_channel, channel_ids)
+    scan_rate = rate(lambda id_: scan_channel(client, id_),
+                     channel_ids[:scan_number])
+    print(f"get_channel: index {index_rate:,.0f}/s, scan {scan_rate:,.1f}/s "
+          f"({index_rate / scan_rate:,.0f}x)")
+
+    index_rate = rate(client.get_user, user_ids)
+    scan_rate = rate(lambda id_: scan_user(client, id_),
+                     user_ids[:scan_number])
+    print(f"get_user: index {index_rate:,.0f}/s, scan {scan_rate:,.1f}/s "
+          f"({index_rate / scan_rate:,.0f}x)")
+
+    index_rate = rate(lambda data: Message(client, data), payloads)
+    client.get_channel = lambda id_: scan_channel(client, id_)
+    scan_rate = rate(lambda data: Message(client, data),
+                     payloads[:scan_number])
+    print(f"Message: index {index_rate:,.0f}/s, scan {scan_rate:,.1f}/s "
+          f"({index_rate / scan_rate:,.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
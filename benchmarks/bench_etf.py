@@ -0,0 +1,127 @@
+#
+# NicoBot is Nicovideo Player bot for Discord, written from the scratch.
+# This file is part of NicoBot.
+#
+# Copyright (C) 2021 Wonjun Jung (KokoseiJ)
+#
+#    Nicobot is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Replays a gateway session through the JSON and the ETF decoder.
+
+Payloads are encoded in ETF the way the gateway does- keys as atoms, and
+snowflakes as integers. Both the size of the payloads and the time to decode
+them are reported, and decoded payloads are checked to be identical.
+
+    python benchmarks/bench_etf.py [--session recorded.jsonl]
+                                   [--guilds 10] [--members 1000]
+                                   [--events 10000]
+"""
+
+import os
+import sys
+import json
+import time
+import struct
+import argparse
+
+projpath = os.path.normpath(os.path.join(os.path.abspath(__file__), "../.."))
+sys.path.insert(0, projpath)
+
+from discordapi import etf
+from discordapi.etf import etf_unpack, _encode
+from gateway_session import make_session, load_session
+
+
+def encode_gateway(obj, buf):
+    if isinstance(obj, dict):
+        buf += struct.pack(">BI", etf.MAP_EXT, len(obj))
+        for key, value in obj.items():
+            key = key.encode()
+            buf += struct.pack(">BB", etf.SMALL_ATOM_UTF8_EXT, len(key))
+            buf += key
+            encode_gateway(value, buf)
+    elif isinstance(obj, list) and obj:
+        buf += struct.pack(">BI", etf.LIST_EXT, len(obj))
+        for value in obj:
+            encode_gateway(value, buf)
+        buf.append(etf.NIL_EXT)
+    elif isinstance(obj, str) and obj.isdigit() and len(obj) >= 17:
+        _encode(int(obj), buf)
+    else:
+        _encode(obj, buf)
+
+
+def pack_gateway(obj):
+    buf = bytearray((etf.VERSION,))
+    encode_gateway(obj, buf)
+    return bytes(buf)
+
+
+def best_of(func, payloads, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.process_time()
+        for payload in payloads:
+            func(payload)
+        elapsed = time.process_time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("--session", help="recorded session to replay")
+    argparser.add_argument("--guilds", type=int, default=10)
+    argparser.add_argument("--members", type=int, default=1000,
+                           help="members per guild")
+    argparser.add_argument("--events", type=int, default=10000)
+    argparser.add_argument("--repeat", type=int, default=5)
+    args = argparser.parse_args()
+
+    if args.session:
+        session = load_session(args.session)
+    else:
+        session = make_session(args.guilds, args.members, events=args.events)
+
+    json_payloads = [json.dumps(x, separators=(",", ":")).encode()
+                     for x in session]
+    etf_payloads = [pack_gateway(x) for x in session]
+
+    for data_json, data_etf in zip(json_payloads, etf_payloads):
+        assert json.loads(data_json) == etf_unpack(data_etf)
+
+    count = len(session)
+    json_size = sum(len(x) for x in json_payloads)
+    etf_size = sum(len(x) for x in etf_payloads)
+    print(f"{count} payloads")
+    print(f"{'json':>5}: {json_size:,} bytes")
+    print(f"{'etf':>5}: {etf_size:,} bytes "
+          f"({etf_size / json_size * 100:.0f}% of json)")
+
+    json_time = best_of(json.loads, json_payloads, args.repeat)
+    etf_time = best_of(etf_unpack, etf_payloads, args.repeat)
+    print(f"{'json':>5}: {json_time / count * 1e6:.1f}us/payload")
+    print(f"{'etf':>5}: {etf_time / count * 1e6:.1f}us/payload "
+          f"({etf_time / json_time:.1f}x json)")
+
+    if etf.erlpack is not None:
+        erlpack_time = best_of(etf.erlpack.unpack, etf_payloads, args.repeat)
+        print(f"erlpack.unpack alone, returning bytes: "
+              f"{erlpack_time / count * 1e6:.1f}us/payload")
+
+
+if __name__ == "__main__":
+    main()
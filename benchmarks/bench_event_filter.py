@@ -0,0 +1,123 @@
+#
+# NicoBot is Nicovideo Player bot for Discord, written from the scratch.
+# This file is part of NicoBot.
+#
+# Copyright (C) 2021 Wonjun Jung (KokoseiJ)
+#
+#    Nicobot is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Measures the cost of events nobody handles, with and without filtering.
+
+A session is replayed through DiscordGateway's decoder and dispatcher, and
+the time until the dispatch thread has handled every event is measured in
+CPU time of the whole process. One handler
+receives every event, the other one only consumes MESSAGE_CREATE, so that
+PRESENCE_UPDATE and TYPING_START are dropped before being decoded. Payloads
+are encoded with their fields in the order the gateway sends them.
+
+    python benchmarks/bench_event_filter.py [--session recorded.jsonl]
+                                            [--guilds 10] [--members 1000]
+                                            [--events 10000]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+projpath = os.path.normpath(os.path.join(os.path.abspath(__file__), "../.."))
+sys.path.insert(0, projpath)
+
+from discordapi import DiscordClient, EventHandler, MethodEventHandler
+from gateway_session import make_session, load_session
+
+
+class AllHandler(EventHandler):
+    def handle(self, event, obj):
+        pass
+
+
+class MessageHandler(MethodEventHandler):
+    def on_message_create(self, obj):
+        pass
+
+
+def encode(payload):
+    payload = {key: payload.get(key) for key in ("t", "s", "op", "d")}
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+def replay(client, frames):
+    decode = client._decode
+    dispatcher = client._dispatcher
+    for data in frames:
+        dispatcher(decode(data))
+    client._dispatch_executor.submit(lambda: None).result()
+
+
+def best_of(client, frames, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.process_time()
+        replay(client, frames)
+        elapsed = time.process_time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("--session", help="recorded session to replay")
+    argparser.add_argument("--guilds", type=int, default=10)
+    argparser.add_argument("--members", type=int, default=1000,
+                           help="members per guild")
+    argparser.add_argument("--events", type=int, default=10000)
+    argparser.add_argument("--repeat", type=int, default=5)
+    args = argparser.parse_args()
+
+    if args.session:
+        session = load_session(args.session)
+    else:
+        session = make_session(args.guilds, args.members, events=args.events)
+
+    setup = [encode(x) for x in session
+             if x.get("t") in ("READY", "GUILD_CREATE")]
+    frames = [encode(x) for x in session
+              if x.get("t") not in ("READY", "GUILD_CREATE")]
+    counts = {}
+    for payload in session[len(setup):]:
+        counts[payload.get("t")] = counts.get(payload.get("t"), 0) + 1
+    print(f"{len(frames)} events: " + ", ".join(
+        f"{count} {event}" for event, count in counts.items()
+    ))
+
+    results = {}
+    for handler in (AllHandler, MessageHandler):
+        client = DiscordClient(token="token", handler=handler)
+        replay(client, setup)
+
+        elapsed = best_of(client, frames, args.repeat)
+        results[handler.__name__] = elapsed
+        print(f"{handler.__name__:>14}: {elapsed * 1000:.1f}ms "
+              f"({elapsed / len(frames) * 1e6:.1f}us/event)")
+
+    base = results["AllHandler"]
+    print(f"filtered: {base / results['MessageHandler']:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+#
+# NicoBot is Nicovideo Player bot for Discord, written from the scratch.
+# This file is part of NicoBot.
+#
+# Copyright (C) 2021 Wonjun Jung (KokoseiJ)
+#
+#    Nicobot is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+"""Measures the latency of Channel.send over HTTPS, with and without pooling.
+
+A local HTTPS server with a self-signed certificate stands in for the API.
+The pooled urllib3 transport of DiscordClient is compared against the
+previous one-connection-per-request urllib transport, which pays a TCP and
+a TLS handshake on every call. Requires openssl to generate the certificate.
+
+    python benchmarks/bench_http_pool.py [--number 1000]
+"""
+
+import os
+import ssl
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+import subprocess
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import urllib3
+
+projpath = os.path.normpath(os.path.join(os.path.abspath(__file__), "../.."))
+sys.path.insert(0, projpath)
+
+from discordapi import DiscordClient, RateLimitHandler, json_dumps
+from discordapi.channel import get_channel
+from discordapi.client import construct_url
+from gateway_session import make_user, snowflake
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        data = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        message = dict(self.server.message, content=data["content"])
+        body = json.dumps(message).encode()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, context, message):
+        super(MockServer, self).__init__(("127.0.0.1", 0), MockHandler)
+        self.socket = context.wrap_socket(self.socket, server_side=True)
+        self.message = message
+        self.url = f"https://127.0.0.1:{self.server_address[1]}/"
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.start()
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+        self.thread.join()
+
+
+class UrllibClient(DiscordClient):
+    """DiscordClient opening a new connection for every request."""
+
+    def __init__(self, token, cafile):
+        super(UrllibClient, self).__init__(token)
+        self.context = ssl.create_default_context(cafile=cafile)
+
+    def _send_request(
+        self, method, route, data=None, baseurl=None, headers=None
+    ):
+        url = construct_url(baseurl, route)
+        if isinstance(data, (dict, list)):
+            data = json_dumps(data)
+        req_headers = self.headers.copy()
+        if headers is not None:
+            req_headers.update(headers)
+        req = Request(url, data, req_headers, method=method)
+
+        try:
+            res = urlopen(req, context=self.context)
+        except HTTPError as e:
+            res = e
+        res.data = res.read()
+        return res, res.status >= 400
+
+
+def make_cert(directory):
+    cert = os.path.join(directory, "cert.pem")
+    key = os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+         "-days", "1", "-subj", "/CN=127.0.0.1",
+         "-addext", "subjectAltName=IP:127.0.0.1",
+         "-keyout", key, "-out", cert],
+        check=True, capture_output=True,
+    )
+    return cert, key
+
+
+def measure(client, server, channel_data, number):
+    client.api_url = server.url
+    client.ratelimit_handler = RateLimitHandler(global_limit=10 ** 9)
+    channel = get_channel(client, channel_data)
+    client.index.add_channel(channel)
+
+    latencies = []
+    for index in range(number):
+        start = time.perf_counter()
+        channel.send(f"message {index}")
+        latencies.append(time.perf_counter() - start)
+
+    latencies.sort()
+    return (latencies[len(latencies) // 2],
+            latencies[int(len(latencies) * 0.99)],
+            sum(latencies))
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("--number", type=int, default=1000,
+                           help="messages to send per transport")
+    args = argparser.parse_args()
+
+    rng = random.Random(0)
+    channel_data = {"id": snowflake(rng), "type": 1,
+                    "recipients": [make_user(rng)]}
+    message = {
+        "id": snowflake(rng), "channel_id": channel_data["id"],
+        "author": make_user(rng), "content": "",
+        "timestamp": "2021-10-03T12:34:56.789000+00:00",
+        "edited_timestamp": None, "tts": False, "mention_everyone": False,
+        "mentions": [], "mention_roles": [], "attachments": [],
+        "embeds": [], "pinned": False, "type": 0,
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        cert, key = make_cert(directory)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+
+        pooled = DiscordClient("token")
+        pooled.http = urllib3.PoolManager(ca_certs=cert)
+        transports = (
+            ("urllib", UrllibClient("token", cert)),
+            ("urllib3", pooled),
+        )
+
+        results = {}
+        for name, client in transports:
+            server = MockServer(context, message)
+            try:
+                results[name] = measure(
+                    client, server, channel_data, args.number
+                )
+            finally:
+                server.close()
+
+    base = results["urllib"]
+    for name, (p50, p99, total) in results.items():
+        print(f"{name:>8}: p50 {p50 * 1e3:.2f}ms, p99 {p99 * 1e3:.2f}ms, "
+              f"{args.number / total:.0f} messages/s "
+              f"({base[0] / p50:.1f}x p50)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#
+# NicoBot is Nicovideo Player bot for Discord, written from the scratch.
+# This file is part of NicoBot.
+#
+# Copyright (C) 2021 Wonjun Jung (KokoseiJ)
+#
+#    Nicobot is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Measures decode cost per event of each installed JSON backend.
+
+Typical MESSAGE_CREATE and GUILD_CREATE payloads are decoded with
+json_loads, after switching backends with set_json_backend. Encoding cost of
+an IDENTIFY-sized payload is reported as well.
+
+    python benchmarks/bench_json.py [--members 1000] [--number 1000]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import importlib
+
+projpath = os.path.normpath(os.path.join(os.path.abspath(__file__), "../.."))
+sys.path.insert(0, projpath)
+
+from discordapi import codec
+from discordapi.codec import json_loads, json_dumps, set_json_backend
+from gateway_session import make_guild, make_message
+
+
+def timeit(func, arg, number):
+    best = None
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(number):
+            func(arg)
+        elapsed = (time.perf_counter() - start) / number
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("--members", type=int, default=1000,
+                           help="members in GUILD_CREATE")
+    argparser.add_argument("--number", type=int, default=1000,
+                           help="iterations for MESSAGE_CREATE")
+    args = argparser.parse_args()
+
+    rng = random.Random(0)
+    guild = make_guild(rng, args.members)
+    message = {"op": 0, "s": 2, "t": "MESSAGE_CREATE",
+               "d": make_message(rng, guild)}
+    guild = {"op": 0, "s": 1, "t": "GUILD_CREATE", "d": guild}
+    identify = {"op": 2, "d": {
+        "token": "x" * 59, "intents": 32509,
+        "properties": {"$os": "linux", "$browser": "nicobot",
+                       "$device": "nicobot"},
+    }}
+
+    set_json_backend("json")
+    message_data = json_dumps(message)
+    guild_data = json_dumps(guild)
+    print(f"MESSAGE_CREATE: {len(message_data):,} bytes, "
+          f"GUILD_CREATE: {len(guild_data):,} bytes")
+
+    results = {}
+    for name in codec.JSON_BACKENDS:
+        if importlib.util.find_spec(name) is None:
+            print(f"{name:>7}: not installed")
+            continue
+        set_json_backend(name)
+
+        results[name] = (
+            timeit(json_loads, message_data, args.number),
+            timeit(json_loads, guild_data, max(args.number // 100, 1)),
+            timeit(json_dumps, identify, args.number),
+        )
+
+    base = results["json"]
+    for name, (message_time, guild_time, identify_time) in results.items():
+        print(f"{name:>7}: "
+              f"MESSAGE_CREATE {message_time * 1e6:.2f}us "
+              f"({base[0] / message_time:.1f}x), "
+              f"GUILD_CREATE {guild_time * 1e3:.2f}ms "
+              f"({base[1] / guild_time:.1f}x), "
+              f"IDENTIFY dumps {identify_time * 1e6:.2f}us "
+              f"({base[2] / identify_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
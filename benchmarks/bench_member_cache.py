@@ -0,0 +1,89 @@
+#
+# NicoBot is Nicovideo Player bot for Discord, written from the scratch.
+# This file is part of NicoBot.
+#
+# Copyright (C) 2021 Wonjun Jung (KokoseiJ)
+#
+#    Nicobot is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Reports memory used per cached member, with and without compact objects.
+
+Members are received in chunks of 1000 like GUILD_MEMBERS_CHUNK, decoded from
+JSON and stored the way the gateway does, after which the chunk is dropped.
+Memory still allocated afterwards is divided by the number of members.
+
+    python benchmarks/bench_member_cache.py [--counts 10000,100000,1000000]
+"""
+
+import os
+import sys
+import random
+import argparse
+import tracemalloc
+
+projpath = os.path.normpath(os.path.join(os.path.abspath(__file__), "../.."))
+sys.path.insert(0, projpath)
+
+from discordapi import make_member
+from discordapi.codec import json_loads, json_dumps
+from gateway_session import make_member as make_member_payload
+
+CHUNK_SIZE = 1000
+
+
+class FakeClient:
+    def __init__(self, compact):
+        self.compact = compact
+
+
+def measure(count, compact):
+    rng = random.Random(0)
+    client = FakeClient(compact)
+    guild = object()
+    members = {}
+
+    tracemalloc.start()
+    for _ in range(count // CHUNK_SIZE):
+        chunk = json_dumps(
+            [make_member_payload(rng) for _ in range(CHUNK_SIZE)]
+        )
+        payload = json_loads(chunk)
+        members.update(
+            (member["user"]["id"], make_member(client, guild, member))
+            for member in payload
+        )
+        del chunk, payload
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    return size / count
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("--counts", default="10000,100000,1000000",
+                           help="comma separated member counts")
+    args = argparser.parse_args()
+
+    for count in map(int, args.counts.split(",")):
+        regular = measure(count, False)
+        compact = measure(count, True)
+        print(f"{count:>9,} members: regular {regular:,.0f} bytes/member, "
+              f"compact {compact:,.0f} bytes/member "
+              f"({compact / regular * 100:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#
+# NicoBot is Nicovideo Player bot for Discord, written from the scratch.
+# This file is part of NicoBot.
+#
+# Copyright (C) 2021 Wonjun Jung (KokoseiJ)
+#
+#    Nicobot is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+"""Measures peak memory and time of uploading a file with Channel.send.
+
+A file of the given size is sent through send_request to a local server,
+once with the body built in memory by concatenation as before, and once
+with MultipartEncoder streaming it. Peak memory is traced with tracemalloc,
+the server discards the body as it arrives.
+
+    python benchmarks/bench_multipart.py [--size 32] [--repeat 3]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+import tracemalloc
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+projpath = os.path.normpath(os.path.join(os.path.abspath(__file__), "../.."))
+sys.path.insert(0, projpath)
+
+from discordapi import DiscordClient, File, json_dumps
+from discordapi.util import get_formdata
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        left = int(self.headers["Content-Length"])
+        while left:
+            left -= len(self.rfile.read(min(left, 65536)))
+
+        body = b'{"id": "1"}'
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def concat_formdata(data):
+    """get_formdata as it used to be, reading the files in whole."""
+    boundary = f"VOCALOIDIA-{os.urandom(8).hex()}"
+    content_type = f'multipart/form-data;boundary="{boundary}"'
+
+    body = bytes()
+    for key, value in data.items():
+        body += f"--{boundary}\n".encode()
+        body += f'Content-Disposition: form-data; name="{key}"'.encode()
+        if isinstance(value, dict):
+            value = json_dumps(value)
+        elif isinstance(value, File):
+            name = value.get_name()
+            value = value.read()
+            body += f'; filename="{name}"\n'.encode()
+            body += b"Content-Type: application/octet-stream"
+        body += b"\n\n"
+        body += value if isinstance(value, bytes) else value.encode()
+        body += b"\n"
+    body += f"--{boundary}--\n".encode()
+
+    return content_type, body
+
+
+def measure(client, encode, path, repeat):
+    best_time = peak = None
+    for _ in range(repeat):
+        tracemalloc.start()
+        start = time.perf_counter()
+        content_type, body = encode({
+            "file": File(path), "payload_json": {"content": "log"}
+        })
+        client.send_request(
+            "POST", "/channels/1/messages", body,
+            headers={"Content-Type": content_type},
+        )
+        elapsed = time.perf_counter() - start
+        _, traced = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        if best_time is None or elapsed < best_time:
+            best_time = elapsed
+        if peak is None or traced > peak:
+            peak = traced
+    return best_time, peak
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("--size", type=int, default=32,
+                           help="size of the file in MiB")
+    argparser.add_argument("--repeat", type=int, default=3)
+    args = argparser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+
+    client = DiscordClient("token")
+    client.api_url = f"http://127.0.0.1:{server.server_address[1]}/"
+
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "clip.ogg")
+            with open(path, "wb") as f:
+                for _ in range(args.size):
+                    f.write(os.urandom(1 << 20))
+
+            for name, encode in (("concat", concat_formdata),
+                                 ("stream", get_formdata)):
+                elapsed, peak = measure(client, encode, path, args.repeat)
+                print(f"{name:>6}: {elapsed * 1e3:.1f}ms, "
+                      f"peak {peak / (1 << 20):.2f}MiB")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
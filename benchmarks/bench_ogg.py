@@ -0,0 +1,166 @@
+#
+# NicoBot is Nicovideo Player bot for Discord, written from the scratch.
+# This file is part of NicoBot.
+#
+# Copyright (C) 2021 Wonjun Jung (KokoseiJ)
+#
+#    Nicobot is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Compares packets/second of OggParser and OggDemuxer.
+
+Synthetic stream resembling ffmpeg's Opus output(96kbps, 20ms packets, around
+a second per page) is used by default. Pass a path to an .opus file to use it
+instead.
+
+    python benchmarks/bench_ogg.py [file.opus] [--seconds 600]
+                                   [--source buffered|raw|pipe]
+
+"buffered" reads from a regular file object, "raw" reads from an unbuffered
+FileIO which turns every .read call into a syscall, and "pipe" reads the
+stdout of a child process just like FFMPEGAudioSource does.
+"""
+
+import os
+import sys
+import time
+import struct
+import argparse
+import tempfile
+import subprocess
+
+projpath = os.path.normpath(os.path.join(os.path.abspath(__file__), "../.."))
+sys.path.insert(0, projpath)
+
+from discordapi.ogg import HEADER_STRUCT, OggParser, OggDemuxer, ogg_crc
+
+
+def make_page(seg_table, body, seq):
+    header = b"OggS" + HEADER_STRUCT.pack(
+        0, 0, seq * 48000, 1, seq, 0, len(seg_table)
+    )
+    page = bytearray(header + bytes(seg_table) + body)
+    struct.pack_into("<I", page, 22, ogg_crc(page))
+    return bytes(page)
+
+
+def make_stream(seconds, packet_size=240, packets_per_page=50):
+    packet = os.urandom(packet_size)
+    lacing = [255] * (packet_size // 255) + [packet_size % 255]
+    seg_table = lacing * packets_per_page
+    body = packet * packets_per_page
+    return b"".join(make_page(seg_table, body, seq) for seq in range(seconds))
+
+
+class CountingPipe:
+    """Wraps the pipe and counts how many times it has been read from."""
+
+    def __init__(self, pipe):
+        self.pipe = pipe
+        self.calls = 0
+
+    def read(self, size=-1):
+        self.calls += 1
+        return self.pipe.read(size)
+
+    def readinto1(self, view):
+        self.calls += 1
+        return self.pipe.readinto1(view)
+
+
+def count_reads(parser_class, path, source):
+    pipe, proc = open_source(path, source)
+    counter = CountingPipe(pipe)
+
+    for packet in parser_class(counter).packet_iter():
+        if not packet:
+            break
+
+    pipe.close()
+    if proc is not None:
+        proc.wait()
+
+    return counter.calls
+
+
+def open_source(path, source):
+    if source == "pipe":
+        args = [sys.executable, "-c",
+                "import sys, shutil; "
+                f"shutil.copyfileobj(open({path!r}, 'rb'), sys.stdout.buffer)"]
+        proc = subprocess.Popen(args, stdout=subprocess.PIPE)
+        return proc.stdout, proc
+    buffering = 0 if source == "raw" else -1
+    return open(path, "rb", buffering=buffering), None
+
+
+def run(parser_class, path, source):
+    pipe, proc = open_source(path, source)
+    count = 0
+
+    start = time.perf_counter()
+    for packet in parser_class(pipe).packet_iter():
+        if not packet:
+            break
+        count += 1
+    elapsed = time.perf_counter() - start
+
+    pipe.close()
+    if proc is not None:
+        proc.wait()
+
+    return count, elapsed
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("file", nargs="?", help="Ogg Opus file to parse")
+    argparser.add_argument("--seconds", type=int, default=600,
+                           help="length of the synthetic stream")
+    argparser.add_argument("--repeat", type=int, default=5)
+    argparser.add_argument("--source", default="pipe",
+                           choices=("buffered", "raw", "pipe"))
+    args = argparser.parse_args()
+
+    tmp = None
+    path = args.file
+    if path is None:
+        tmp = tempfile.NamedTemporaryFile(suffix=".opus", delete=False)
+        tmp.write(make_stream(args.seconds))
+        tmp.close()
+        path = tmp.name
+
+    try:
+        results = {}
+        for parser_class in (OggParser, OggDemuxer):
+            best = None
+            for _ in range(args.repeat):
+                count, elapsed = run(parser_class, path, args.source)
+                if best is None or elapsed < best:
+                    best = elapsed
+            results[parser_class.__name__] = count / best
+            reads = count_reads(parser_class, path, args.source)
+            print(f"{parser_class.__name__:>12}: {count} packets, "
+                  f"{count / best:,.0f} packets/s, "
+                  f"{reads} read calls ({reads / count:.3f}/packet)")
+
+        ratio = results["OggDemuxer"] / results["OggParser"]
+        print(f"{'speedup':>12}: {ratio:.2f}x")
+    finally:
+        if tmp is not None:
+            os.unlink(tmp.name)
+
+
+if __name__ == "__main__":
+    main()
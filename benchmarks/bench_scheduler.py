@@ -0,0 +1,153 @@
+#
+# NicoBot is Nicovideo Player bot for Discord, written from the scratch.
+# This file is part of NicoBot.
+#
+# Copyright (C) 2021 Wonjun Jung (KokoseiJ)
+#
+#    Nicobot is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Measures send jitter of per-thread AudioPlayers against VoiceScheduler.
+
+Every player plays to a fake voice client which only records when each packet
+was sent. Jitter is how far the interval between two consecutive packets of a
+player is off from 20ms. First few packets of each player are excluded since
+they are skewed by the players being started one by one.
+
+    python benchmarks/bench_scheduler.py [--players 200] [--seconds 5]
+                                         [--warmup 10]
+"""
+
+import os
+import sys
+import time
+import argparse
+from threading import Event
+
+projpath = os.path.normpath(os.path.join(os.path.abspath(__file__), "../.."))
+sys.path.insert(0, projpath)
+
+from discordapi import AudioSource, AudioPlayer, VoiceScheduler
+from discordapi.voice import DiscordVoiceClient
+from discordapi.scheduler import DELAY
+
+
+class FakeVoiceClient(DiscordVoiceClient):
+    def __init__(self):
+        # Skipping websocket initialization on purpose
+        self.ready_to_run = Event()
+        self.ready_to_run.set()
+        self.sent = []
+
+    def speak(self, speaking=1):
+        pass
+
+    def _send_voice(self, data):
+        self.sent.append(time.perf_counter())
+
+    def send_voice_batch(self, frames):
+        now = time.perf_counter()
+        self.sent.extend(now for _ in frames)
+
+
+class FakeSource(AudioSource):
+    def __init__(self, frames):
+        self.frames = frames
+
+    def read(self):
+        if self.frames <= 0:
+            return b""
+        self.frames -= 1
+        return b"\xfc" * 120
+
+
+def percentile(values, pct):
+    index = min(len(values) - 1, int(len(values) * pct / 100))
+    return values[index]
+
+
+def run(players, seconds, warmup, use_scheduler):
+    frames = int(seconds / DELAY)
+    scheduler = VoiceScheduler() if use_scheduler else None
+    if scheduler is not None:
+        scheduler.start()
+
+    done = Event()
+    finished = []
+
+    def callback(player):
+        finished.append(player)
+        if len(finished) == players:
+            done.set()
+
+    clients = []
+    player_list = []
+    for _ in range(players):
+        client = FakeVoiceClient()
+        player = AudioPlayer(client, FakeSource(frames), callback, scheduler)
+        clients.append(client)
+        player_list.append(player)
+
+    cpu_start = time.process_time()
+    for player in player_list:
+        player.play()
+    done.wait(seconds * 10)
+    cpu = time.process_time() - cpu_start
+
+    for player in player_list:
+        player.stop_flag.set()
+    if scheduler is not None:
+        scheduler.stop()
+
+    jitters = []
+    for client in clients:
+        sent = client.sent[warmup:]
+        jitters.extend(
+            abs(after - before - DELAY)
+            for before, after in zip(sent, sent[1:])
+        )
+    jitters.sort()
+
+    return {
+        "packets": len(jitters),
+        "p50": percentile(jitters, 50),
+        "p99": percentile(jitters, 99),
+        "max": jitters[-1],
+        "cpu": cpu,
+    }
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("--players", type=int, default=200)
+    argparser.add_argument("--seconds", type=float, default=5)
+    argparser.add_argument("--warmup", type=int, default=10,
+                           help="packets to exclude per player")
+    args = argparser.parse_args()
+
+    for name, use_scheduler in (("threaded", False), ("scheduler", True)):
+        result = run(
+            args.players, args.seconds, args.warmup, use_scheduler
+        )
+        print(
+            f"{name:>10}: {result['packets']} packets, "
+            f"jitter p50 {result['p50'] * 1000:.2f}ms "
+            f"p99 {result['p99'] * 1000:.2f}ms "
+            f"max {result['max'] * 1000:.2f}ms, "
+            f"cpu {result['cpu']:.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
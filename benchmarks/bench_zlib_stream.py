@@ -0,0 +1,123 @@
+#
+# NicoBot is Nicovideo Player bot for Discord, written from the scratch.
+# This file is part of NicoBot.
+#
+# Copyright (C) 2021 Wonjun Jung (KokoseiJ)
+#
+#    Nicobot is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Compares bytes on the wire and parsing cost with zlib-stream compression.
+
+Every payload of the session is compressed the way the gateway does it- a
+single zlib context for the whole connection, flushed with Z_SYNC_FLUSH after
+each payload. Then the time to parse the session is measured with plain
+json.loads, and with ZlibStreamInflator followed by json.loads.
+
+    python benchmarks/bench_zlib_stream.py [--session recorded.jsonl]
+                                           [--guilds 10] [--members 1000]
+                                           [--events 10000]
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import argparse
+
+projpath = os.path.normpath(os.path.join(os.path.abspath(__file__), "../.."))
+sys.path.insert(0, projpath)
+
+from discordapi.websocket import ZlibStreamInflator
+from gateway_session import make_session, load_session
+
+
+def compress_session(messages):
+    deflator = zlib.compressobj()
+    return [
+        deflator.compress(x) + deflator.flush(zlib.Z_SYNC_FLUSH)
+        for x in messages
+    ]
+
+
+def parse_plain(messages):
+    for data in messages:
+        json.loads(data)
+
+
+def parse_compressed(messages):
+    inflator = ZlibStreamInflator()
+    for data in messages:
+        json.loads(inflator.feed(data))
+
+
+def best_of(func, messages, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.process_time()
+        func(messages)
+        elapsed = time.process_time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("--session", help="recorded session to replay")
+    argparser.add_argument("--guilds", type=int, default=10)
+    argparser.add_argument("--members", type=int, default=1000,
+                           help="members per guild")
+    argparser.add_argument("--events", type=int, default=10000)
+    argparser.add_argument("--repeat", type=int, default=5)
+    args = argparser.parse_args()
+
+    if args.session:
+        session = load_session(args.session)
+    else:
+        session = make_session(args.guilds, args.members, events=args.events)
+
+    plain = [json.dumps(x, separators=(",", ":")).encode() for x in session]
+    compressed = compress_session(plain)
+
+    guild_creates = [i for i, x in enumerate(session)
+                     if x.get("t") == "GUILD_CREATE"]
+
+    def size(messages, indices=None):
+        if indices is None:
+            return sum(len(x) for x in messages)
+        return sum(len(messages[i]) for i in indices)
+
+    print(f"{len(session)} payloads, {len(guild_creates)} GUILD_CREATE")
+    for name, indices in (("total", None), ("GUILD_CREATE", guild_creates)):
+        raw, packed = size(plain, indices), size(compressed, indices)
+        if not raw:
+            continue
+        print(f"{name:>12}: {raw:,} bytes -> {packed:,} bytes "
+              f"({raw / packed:.1f}x smaller)")
+
+    plain_time = best_of(parse_plain, plain, args.repeat)
+    zlib_time = best_of(parse_compressed, compressed, args.repeat)
+
+    count = len(session)
+    print(f"{'json':>12}: {plain_time * 1000:.1f}ms "
+          f"({plain_time / count * 1e6:.1f}us/payload)")
+    print(f"{'zlib+json':>12}: {zlib_time * 1000:.1f}ms "
+          f"({zlib_time / count * 1e6:.1f}us/payload, "
+          f"+{(zlib_time / plain_time - 1) * 100:.0f}% CPU)")
+
+
+if __name__ == "__main__":
+    main()
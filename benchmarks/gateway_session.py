@@ -0,0 +1,207 @@
+#
+# NicoBot is Nicovideo Player bot for Discord, written from the scratch.
+# This file is part of NicoBot.
+#
+# Copyright (C) 2021 Wonjun Jung (KokoseiJ)
+#
+#    Nicobot is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Synthetic gateway sessions shared by the gateway benchmarks.
+
+Payloads mimic the shape of what the gateway sends- A session starts with
+READY and a GUILD_CREATE per guild, followed by a stream of MESSAGE_CREATE,
+PRESENCE_UPDATE and TYPING_START events. A recorded session could be used
+instead, saved as JSON lines of whole gateway payloads.
+"""
+
+import json
+import random
+
+
+def snowflake(rng):
+    return str(rng.randrange(10 ** 17, 10 ** 18))
+
+
+def make_user(rng):
+    return {
+        "id": snowflake(rng),
+        "username": "user%d" % rng.randrange(10 ** 6),
+        "discriminator": "%04d" % rng.randrange(10000),
+        "avatar": "%032x" % rng.getrandbits(128),
+        "public_flags": 0,
+    }
+
+
+def make_member(rng, user=None):
+    return {
+        "user": user or make_user(rng),
+        "roles": [snowflake(rng) for _ in range(rng.randrange(3))],
+        "nick": None,
+        "joined_at": "2021-10-03T12:34:56.789000+00:00",
+        "premium_since": None,
+        "deaf": False,
+        "mute": False,
+        "pending": False,
+        "avatar": None,
+    }
+
+
+def make_channel(rng, guild_id, position):
+    return {
+        "id": snowflake(rng),
+        "type": rng.choice((0, 0, 0, 2, 4)),
+        "guild_id": guild_id,
+        "name": "channel-%d" % position,
+        "position": position,
+        "parent_id": None,
+        "topic": None,
+        "nsfw": False,
+        "rate_limit_per_user": 0,
+        "last_message_id": snowflake(rng),
+        "permission_overwrites": [],
+    }
+
+
+def make_guild(rng, members=1000, channels=50):
+    guild_id = snowflake(rng)
+    member_list = [make_member(rng) for _ in range(members)]
+    return {
+        "id": guild_id,
+        "name": "guild-%s" % guild_id[-4:],
+        "icon": None,
+        "owner_id": member_list[0]["user"]["id"],
+        "region": "japan",
+        "afk_channel_id": None,
+        "afk_timeout": 300,
+        "verification_level": 0,
+        "default_message_notifications": 0,
+        "explicit_content_filter": 0,
+        "roles": [
+            {"id": snowflake(rng), "name": "role%d" % i, "color": 0,
+             "hoist": False, "position": i, "permissions": "104324673",
+             "managed": False, "mentionable": False}
+            for i in range(20)
+        ],
+        "emojis": [],
+        "features": [],
+        "mfa_level": 0,
+        "system_channel_id": None,
+        "joined_at": "2021-10-03T12:34:56.789000+00:00",
+        "large": members > 250,
+        "unavailable": False,
+        "member_count": members,
+        "voice_states": [],
+        "members": member_list,
+        "channels": [make_channel(rng, guild_id, i) for i in range(channels)],
+        "threads": [],
+        "presences": [],
+        "premium_tier": 0,
+        "preferred_locale": "ja",
+    }
+
+
+def make_message(rng, guild, content_size=60):
+    channel = rng.choice(guild["channels"])
+    member = rng.choice(guild["members"])
+    member = dict(member)
+    author = member.pop("user")
+    return {
+        "id": snowflake(rng),
+        "channel_id": channel["id"],
+        "guild_id": guild["id"],
+        "author": author,
+        "member": member,
+        "content": "".join(
+            rng.choice("abcdefghijklmnopqrstuvwxyz ")
+            for _ in range(content_size)
+        ),
+        "timestamp": "2021-10-03T12:34:56.789000+00:00",
+        "edited_timestamp": None,
+        "tts": False,
+        "mention_everyone": False,
+        "mentions": [],
+        "mention_roles": [],
+        "attachments": [],
+        "embeds": [],
+        "pinned": False,
+        "type": 0,
+    }
+
+
+def make_presence(rng, guild):
+    member = rng.choice(guild["members"])
+    return {
+        "user": {"id": member["user"]["id"]},
+        "guild_id": guild["id"],
+        "status": rng.choice(("online", "idle", "dnd")),
+        "activities": [],
+        "client_status": {"desktop": "online"},
+    }
+
+
+def make_typing(rng, guild):
+    return {
+        "channel_id": rng.choice(guild["channels"])["id"],
+        "guild_id": guild["id"],
+        "user_id": rng.choice(guild["members"])["user"]["id"],
+        "timestamp": 1633264496,
+    }
+
+
+def make_session(
+    guilds=10, members=1000, channels=50, events=10000, seed=0
+):
+    """Returns a list of gateway payloads as dicts.
+
+    Events after GUILD_CREATEs are 20% MESSAGE_CREATE, 60% PRESENCE_UPDATE
+    and 20% TYPING_START.
+    """
+    rng = random.Random(seed)
+    guild_list = [make_guild(rng, members, channels) for _ in range(guilds)]
+
+    session = [{
+        "op": 0, "s": 1, "t": "READY", "d": {
+            "v": 9,
+            "user": make_user(rng),
+            "guilds": [{"id": x["id"], "unavailable": True}
+                       for x in guild_list],
+            "session_id": "%032x" % rng.getrandbits(128),
+            "application": {"id": snowflake(rng), "flags": 0},
+        }
+    }]
+    for guild in guild_list:
+        session.append({"op": 0, "t": "GUILD_CREATE", "d": guild})
+
+    for _ in range(events):
+        guild = rng.choice(guild_list)
+        roll = rng.random()
+        if roll < 0.2:
+            event, payload = "MESSAGE_CREATE", make_message(rng, guild)
+        elif roll < 0.8:
+            event, payload = "PRESENCE_UPDATE", make_presence(rng, guild)
+        else:
+            event, payload = "TYPING_START", make_typing(rng, guild)
+        session.append({"op": 0, "t": event, "d": payload})
+
+    for seq, payload in enumerate(session, 1):
+        payload["s"] = seq
+
+    return session
+
+
+def load_session(path):
+    """Loads a recorded session, a JSON payload per line."""
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
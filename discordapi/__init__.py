@@ -3,20 +3,30 @@
 from .slash import *
 from .channel import *
 from .client import *
+from .cluster import *
+from .codec import *
 from .command import *
 from .const import *
 from .dictobject import *
 from .embed import *
+from .encryption import *
+from .etf import *
 from .exceptions import *
 from .file import *
 from .gateway import *
 from .guild import *
+from .index import *
 from .handler import *
 from .member import *
+from .membercache import *
 from .message import *
 from .ogg import *
 from .player import *
 from .ratelimit import *
+from .restcache import *
+from .scheduler import *
+from .session import *
+from .shard import *
 from .user import *
 from .util import *
 from .voice import *
@@ -27,7 +27,6 @@ from .dictobject import DictObject
 from .exceptions import DiscordError
 from .util import clear_postdata, get_formdata
 
-import json
 import base64
 import logging
 from threading import Event
@@ -41,6 +40,9 @@ __all__ = [
     "GuildChannel",
     "GuildTextChannel",
     "GuildVoiceChannel",
+    "CompactChannel",
+    "CompactGuildTextChannel",
+    "CompactGuildVoiceChannel",
 ]
 
 KEYLIST = [
@@ -68,7 +70,7 @@ KEYLIST = [
     "member_count",
     "thread_metadata",
     "member",
-    "default_auto_archive_duration?",
+    "default_auto_archive_duration",
 ]
 
 
@@ -104,6 +106,8 @@ def get_channel(client, data, guild=None):
 
     This function only determines the correct subclass to make instance with.
     Rest of the initialization is done under `__init__` from each classes.
+    If client.compact is True, channels which could be stored in a guild are
+    constructed as their slotted counterparts.
 
     Args:
         client (DiscordClient):
@@ -129,23 +133,31 @@ def get_channel(client, data, guild=None):
         raise ValueError(
             "Malformed data! type is supposed to be int, not %s", type(_type))
 
+    compact = client.compact
+
     if _type == GUILD_TEXT:
-        return GuildTextChannel(client, data, guild)
+        cls = CompactGuildTextChannel if compact else GuildTextChannel
+        return cls(client, data, guild)
     elif _type == DM:
         return DMChannel(client, data)
     elif _type == GUILD_VOICE:
-        return GuildVoiceChannel(client, data, guild)
+        cls = CompactGuildVoiceChannel if compact else GuildVoiceChannel
+        return cls(client, data, guild)
         # Below are used to silence warnings for now
     elif _type == GUILD_CATEGORY:
-        return Channel(client, data)
+        cls = CompactChannel if compact else Channel
+        return cls(client, data)
     elif _type == GROUP_DM:
         return GroupDMChannel(client, data)
     else:
         logger.info(f"Unknown Channel type {_type}")
-        return Channel(client, data)
+        cls = CompactChannel if compact else Channel
+        return cls(client, data)
 
 
 class Channel(DictObject):
+    __slots__ = (*KEYLIST, "client", "_json", "_keylist")
+
     def __init__(self, client, data):
         super(Channel, self).__init__(data, KEYLIST)
 
@@ -433,12 +445,14 @@ class GroupDMChannel(DMChannel):
                 raise RuntimeError(f"icon should be File, not {type(icon)}")
             icon = base64.b64encode(icon.read()).decode()
 
-        postdata = json.dumps({"name": name, "icon": icon})
+        postdata = {"name": name, "icon": icon}
 
         return super(GroupDMChannel, self).modify(postdata)
 
 
 class GuildChannel(Channel):
+    __slots__ = ("guild",)
+
     def __init__(self, client, data, guild=None):
         super(GuildChannel, self).__init__(client, data)
 
@@ -507,6 +521,8 @@ class GuildChannel(Channel):
 
 
 class GuildTextChannel(GuildChannel):
+    __slots__ = ()
+
     def modify(
         self,
         name=EMPTY,
@@ -541,6 +557,8 @@ class GuildTextChannel(GuildChannel):
 
 
 class GuildVoiceChannel(GuildChannel):
+    __slots__ = ()
+
     def modify(
         self,
         name=EMPTY,
@@ -590,3 +608,30 @@ class GuildVoiceChannel(GuildChannel):
             raise RuntimeError("Voice client has not been created!!!")
 
         return client
+
+
+class CompactChannel(Channel):
+    """Channel which doesn't keep the raw dict, for use in caches.
+
+    The raw dict is not kept unless keep_json is set to True.
+    """
+
+    __slots__ = ()
+    lazy = False
+    keep_json = False
+
+
+class CompactGuildTextChannel(GuildTextChannel):
+    """GuildTextChannel which doesn't keep the raw dict."""
+
+    __slots__ = ()
+    lazy = False
+    keep_json = False
+
+
+class CompactGuildVoiceChannel(GuildVoiceChannel):
+    """GuildVoiceChannel which doesn't keep the raw dict."""
+
+    __slots__ = ()
+    lazy = False
+    keep_json = False
@@ -23,25 +23,63 @@ from .user import User
 from .guild import Guild
 from .channel import Channel
 from .gateway import DiscordGateway
-from .util import EMPTY, clear_postdata
+from .util import EMPTY, MultipartEncoder, clear_postdata
 from .ratelimit import RateLimitHandler
+from .membercache import MemberCache, MemberRequester
 from .exceptions import DiscordHTTPError
+from .codec import json_loads, json_dumps
 from .channel import get_channel as _get_channel
-from .const import API_URL, LIB_NAME, LIB_VER, LIB_URL
+from .const import API_URL, GATEWAY_HOST, LIB_NAME, LIB_VER, LIB_URL
 
-import json
 import time
 import base64
 import logging
-from json import JSONDecodeError
+import threading
+from functools import partial
+from types import MappingProxyType
 from urllib.parse import urljoin
-from urllib.error import HTTPError
-from urllib.request import Request, urlopen
+from concurrent.futures import Future, ThreadPoolExecutor
 
-__all__ = ["DiscordClient"]
+import urllib3
+
+__all__ = ["DiscordClient", "make_http_pool"]
 
 logger = logging.getLogger(LIB_NAME)
 
+# Times a request gets retried after hitting a rate limit
+MAX_RETRIES = 5
+
+
+def enable_http2():
+    """Makes urllib3 negotiate HTTP/2 where available.
+
+    This requires urllib3 2.x with the h2 package installed, and applies to
+    every user of urllib3 in the process. Falls back to HTTP/1.1 with a
+    warning if unavailable.
+    """
+    try:
+        from urllib3.http2 import inject_into_urllib3
+
+        inject_into_urllib3()
+    except ImportError:
+        logger.warning("HTTP/2 is unavailable, install h2 to enable it.")
+
+
+def make_http_pool(pool_size=10):
+    """Returns the urllib3 PoolManager DiscordClient sends requests with.
+
+    Args:
+        pool_size:
+            Number of connections kept alive per host.
+    """
+    return urllib3.PoolManager(
+        maxsize=pool_size,
+        retries=urllib3.Retry(
+            total=2, read=False, redirect=False,
+            respect_retry_after_header=False,
+        ),
+    )
+
 
 def construct_url(baseurl, endpoint):
     if endpoint.startswith("/"):
@@ -60,7 +98,43 @@ class DiscordClient(DiscordGateway):
             Activity objects used when sending UPDATE_PRESENCE event- This
             attribute is required as changing status resets the activities.
         ratelimit_handler:
-            handler used to handle rate limit accordingly.
+            RateLimitHandler keeping requests within the rate limits.
+            Requests hitting one anyway are retried after the time told by
+            the response, up to MAX_RETRIES times. Shards of a bot have to
+            share it, as the global limit applies to the bot as a whole.
+        api_url:
+            Base URL of the HTTP API.
+        http:
+            urllib3 PoolManager sending the HTTP requests. Connections are
+            kept alive and reused, up to pool_size per host. Could be shared
+            between clients, or be a ProxyManager to go through a proxy.
+        _owns_http:
+            Whether .http was made by this client, and is closed by
+            close_http.
+        _rest_executor:
+            ThreadPoolExecutor running the requests started by submit and
+            send_request_async, with as many threads as the connections.
+        response_cache:
+            ResponseCache for the responses of GET requests, or None not to
+            cache them. Entries get invalidated by the gateway events and
+            the requests modifying them.
+        compact:
+            If True, members, users and channels stored in the guilds are
+            constructed as their slotted counterparts which don't keep the
+            raw dict, to reduce the memory usage of large caches.
+        member_cache:
+            Callable returning a MemberCache, which gets called for every
+            guild to decide which members to keep in the cache.
+            e.g. functools.partial(LRUMemberCache, 1000)
+        member_requester:
+            MemberRequester used by Guild.get_member to request members
+            missing from the cache.
+        shard_manager:
+            ShardManager this client is a shard of, or None. Gateway
+            commands for a guild are sent through the shard owning it.
+        _fetching:
+            dict mapping the key of fetch_channel and fetch_guild calls in
+            progress to the Future of their results, see _fetch_once.
     """
 
     def __init__(
@@ -70,13 +144,32 @@ class DiscordClient(DiscordGateway):
         event_parser=None,
         intents=32509,
         name="main",
+        compress=False,
+        encoding="json",
+        compact=False,
+        member_cache=MemberCache,
+        shard=None,
+        gateway_url=GATEWAY_HOST,
+        session_store=None,
+        pool_size=10,
+        http2=False,
+        response_cache=None,
+        ratelimit_handler=None,
+        http=None,
     ):
+        # Needed by update_event_filter, called by DiscordGateway.__init__
+        self.response_cache = response_cache
         super(DiscordClient, self).__init__(
             token=token,
             handler=handler,
             event_parser=event_parser,
             intents=intents,
             name=name,
+            compress=compress,
+            encoding=encoding,
+            shard=shard,
+            gateway_url=gateway_url,
+            session_store=session_store,
         )
 
         self.headers = {
@@ -85,34 +178,46 @@ class DiscordClient(DiscordGateway):
             "Content-Type": "application/json",
         }
         self._activities = ()
-        self.ratelimit_handler = RateLimitHandler()
+        if ratelimit_handler is None:
+            ratelimit_handler = RateLimitHandler()
+        self.ratelimit_handler = ratelimit_handler
+        self.api_url = API_URL
+        if http2:
+            enable_http2()
+        self._owns_http = http is None
+        if http is None:
+            http = make_http_pool(pool_size)
+        self.http = http
+        self._rest_executor = ThreadPoolExecutor(
+            max_workers=pool_size, thread_name_prefix=f"{self.name}_rest"
+        )
+        self.compact = compact
+        self.member_cache = member_cache
+        self.member_requester = MemberRequester(self)
+        self._fetching = {}
+        self._fetching_lock = threading.Lock()
 
     def get_guilds(self):
-        return self.guilds.copy()
+        """Returns a read-only view of the guilds, see Guild.get_members."""
+        return MappingProxyType(self.guilds)
 
     def get_guild(self, id_):
-        return self.get_guilds().get(id_)
+        return self.guilds.get(id_)
 
     def get_channels(self):
-        return {
-            x: y
-            for guild in self.get_guilds().values()
-            for x, y in guild.get_channels().items()
-        }
+        """Returns a read-only view of the channels, see Guild.get_members.
+        """
+        return MappingProxyType(self.index.channels)
 
     def get_channel(self, id_):
-        return self.get_channels().get(id_)
+        return self.index.channels.get(id_)
 
     def get_users(self):
-        return {
-            x: y.user
-            for guild in self.get_guilds().values()
-            for x, y in guild.get_members().items()
-            if guild.get_members() is not None
-        }
+        """Returns a read-only view of the users, see Guild.get_members."""
+        return MappingProxyType(self.index.users)
 
     def get_user(self, id_):
-        return self.get_users().get(id_)
+        return self.index.users.get(id_)
 
     def update_presence(
         self, activities=None, status=None, afk=False, since=None
@@ -153,9 +258,22 @@ class DiscordClient(DiscordGateway):
 
         self.send(data)
 
+    def get_shard(self, guild_id):
+        """Returns the client whose connection receives events of the guild.
+        """
+        if self.shard_manager is None:
+            return self
+        return self.shard_manager.get_shard(guild_id)
+
     def update_voice_state(
         self, guild_id, channel_id=None, mute=False, deaf=False
     ):
+        client = self.get_shard(guild_id)
+        if client is not self:
+            return client.update_voice_state(
+                guild_id, channel_id, mute, deaf
+            )
+
         data = self._get_payload(
             self.VOICE_STATE_UPDATE,
             guild_id=guild_id,
@@ -175,6 +293,12 @@ class DiscordClient(DiscordGateway):
         user_ids=EMPTY,
         nonce=EMPTY,
     ):
+        client = self.get_shard(guild_id)
+        if client is not self:
+            return client.request_guild_member(
+                guild_id, query, limit, presences, user_ids, nonce
+            )
+
         data = self._get_payload(
             self.REQUEST_GUILD_MEMBERS,
             guild_id=guild_id,
@@ -206,8 +330,22 @@ class DiscordClient(DiscordGateway):
         return User(self, user_obj)
 
     def fetch_channel(self, id_):
+        """Returns channel object, requested from HTTP API.
+
+        Concurrent calls for the same channel share a single request. The
+        channel is stored in .index if it isn't there yet, so that the
+        following get_channel calls find it.
+        """
+        return self._fetch_once(("channel", id_), self._fetch_channel, id_)
+
+    def _fetch_channel(self, id_):
         channel_obj = self.send_request("GET", f"/channels/{id_}")
-        return _get_channel(self, channel_obj)
+        channel = _get_channel(self, channel_obj)
+
+        if self.get_channel(channel.id) is None:
+            self.index.add_channel(channel)
+
+        return channel
 
     def create_guild(
         self,
@@ -259,12 +397,59 @@ class DiscordClient(DiscordGateway):
         This method sends request to HTTP API to fetch the object. Most of the
         time, this is probably not what you want. Try to find the guild in
         .guilds Attribute by calling `client.guilds.get(guild_id)`.
+
+        Concurrent calls for the same guild share a single request. The guild
+        is stored in .guilds if it isn't there yet, until GUILD_CREATE
+        replaces it with the complete one.
         """
+        return self._fetch_once(
+            ("guild", id_, with_counts), self._fetch_guild, id_, with_counts
+        )
+
+    def _fetch_guild(self, id_, with_counts):
         guild = self.send_request(
             "GET", f"/guilds/{id_}?with_counts={str(with_counts).lower()}"
         )
+        guild = Guild(self, guild)
 
-        return Guild(self, guild)
+        if self.guilds is not None:
+            self._set_guild(guild.id, guild, replace=False)
+
+        return guild
+
+    def _fetch_once(self, key, func, *args):
+        """Calls func, or waits for the call with the same key in progress.
+
+        Returns:
+            Return value of func, or raises what func raised.
+        """
+        with self._fetching_lock:
+            future = self._fetching.get(key)
+            if future is not None:
+                owner = False
+            else:
+                owner = True
+                future = self._fetching[key] = Future()
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = func(*args)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            with self._fetching_lock:
+                del self._fetching[key]
+
+    def get_gateway_bot(self):
+        """Returns the gateway URL, recommended shard count and the limits.
+        """
+        return self.send_request("GET", "/gateway/bot")
 
     def get_guild_preview(self, id_):
         preview = self.send_request("GET", f"/guilds/{id_}/preview")
@@ -278,7 +463,7 @@ class DiscordClient(DiscordGateway):
         data=None,
         expected_code=None,
         raise_at_exc=True,
-        baseurl=API_URL,
+        baseurl=None,
         headers=None,
     ):
         """Sends HTTP API request.
@@ -316,37 +501,101 @@ class DiscordClient(DiscordGateway):
             DiscordHTTPError:
                 Raised when HTTPError is raised, or unexpected code is returned
         """
-        if baseurl is None:
-            baseurl = API_URL
+        cache = self.response_cache
+        if cache is None:
+            return self._request(
+                method, route, data, expected_code, raise_at_exc, baseurl,
+                headers
+            )[0]
+
+        if method != "GET":
+            try:
+                return self._request(
+                    method, route, data, expected_code, raise_at_exc,
+                    baseurl, headers
+                )[0]
+            finally:
+                cache.invalidate_request(method, route)
+
+        if (
+            expected_code is None and raise_at_exc
+            and baseurl is None and headers is None
+        ):
+            return cache.fetch(route, partial(self._request, method, route))
 
-        self.ratelimit_handler.check(route)
+        return self._request(
+            method, route, data, expected_code, raise_at_exc, baseurl, headers
+        )[0]
 
-        res, exc = self._send_request(method, route, data, baseurl, headers)
+    def _request(
+        self,
+        method,
+        route,
+        data=None,
+        expected_code=None,
+        raise_at_exc=True,
+        baseurl=None,
+        headers=None,
+    ):
+        """send_request without the response cache.
 
-        try:
-            code = res.status
-        except AttributeError:
-            code = res.getstatus()
+        Returns:
+            tuple of (resdata, cacheable) where cacheable tells whether the
+            request succeeded and resdata could be cached.
+        """
+        if baseurl is None:
+            baseurl = self.api_url
 
-        rawdata = res.read()
-        if not rawdata:
-            resdata = None
-        else:
+        handler = self.ratelimit_handler
+        for attempt in range(MAX_RETRIES + 1):
+            ticket = handler.acquire(method, route)
             try:
-                resdata = json.loads(rawdata)
-            except JSONDecodeError:
-                logger.error(
-                    "Failed to decode JSON from the gateway. "
-                    f"Content: {rawdata}"
+                res, exc = self._send_request(
+                    method, route, data, baseurl, headers
                 )
-                return None
+            except BaseException:
+                handler.release(method, route, ticket)
+                raise
 
-        logger.debug(f"Received from HTTP API: {resdata}")
-        
-        rl_headers = {key: value for key, value in res.headers.items()
-                      if key.startswith("x-ratelimit")}
+            code = res.status
+            rawdata = res.data
 
-        self.ratelimit_handler.update(route, rl_headers)
+            res_headers = {
+                key.lower(): value for key, value in res.headers.items()
+            }
+
+            resdata = None
+            decode_failed = False
+            if rawdata:
+                try:
+                    resdata = json_loads(rawdata)
+                except ValueError:
+                    decode_failed = True
+
+            body = None
+            if code == 429:
+                body = resdata if isinstance(resdata, dict) else {
+                    "retry_after": float(res_headers.get("retry-after", 1))
+                }
+            retry_after = handler.release(
+                method, route, ticket, res_headers, body
+            )
+
+            if code != 429 or attempt == MAX_RETRIES:
+                break
+            logger.warning(
+                f"Rate limit encountered at {route}, "
+                f"retrying after {retry_after:.2f}s."
+            )
+
+        if decode_failed:
+            logger.error(
+                "Failed to decode JSON from the gateway. "
+                f"Content: {rawdata}"
+            )
+            return None, False
+
+        logger.debug(f"Received from HTTP API: {resdata}")
 
         if code == 429:
             logger.error("Rate Limit encountered at %s !", route)
@@ -355,13 +604,58 @@ class DiscordClient(DiscordGateway):
         ):
             raise DiscordHTTPError(resdata["code"], resdata["message"], res)
 
-        return resdata
+        return resdata, 200 <= code < 300
+
+    def update_event_filter(self):
+        super(DiscordClient, self).update_event_filter()
+        if self.wanted_events is not None and self.response_cache is not None:
+            self.wanted_events |= self.response_cache.events
+
+    def _handle_event(self, event, payload):
+        if self.response_cache is not None:
+            try:
+                self.response_cache.handle_event(event, payload)
+            except Exception:
+                logger.exception(f"Failed to invalidate cache by {event}.")
+        super(DiscordClient, self)._handle_event(event, payload)
+
+    def submit(self, func, *args, **kwargs):
+        """Runs a blocking call in the background, returns a Future of it.
+
+        This is meant for REST calls- e.g. Channel.send, which then run
+        concurrently with the caller and each other. Calls beyond pool_size
+        wait in the queue for a thread instead of starting a new one.
+
+        e.g. client.submit(channel.send, embed=embed)
+
+        Returns:
+            concurrent.futures.Future resolving to the return value of func,
+            or raising what func raised.
+        """
+        return self._rest_executor.submit(func, *args, **kwargs)
+
+    def close_http(self):
+        """Shuts down the threads of submit, and .http if it's not shared.
+        """
+        self._rest_executor.shutdown(wait=False)
+        if self._owns_http:
+            self.http.clear()
+
+    def send_request_async(self, *args, **kwargs):
+        """send_request which returns a Future instead of blocking.
+
+        Takes the same arguments as send_request, refer to submit.
+        """
+        return self.submit(self.send_request, *args, **kwargs)
 
     def _send_request(
         self, method, route, data=None, baseurl=API_URL, headers=None
     ):
         """Returns Response object directly.
 
+        Requests are sent through .http, which keeps the connections alive
+        and reuses them.
+
         Args:
             method:
                 HTTP method to use- e.g. GET, POST, DELETE, etc...
@@ -379,31 +673,27 @@ class DiscordClient(DiscordGateway):
                 Content-Type is not application/json.
 
         Returns:
-            A tuple of (Response, exc) where exc determines whether an
-            exception was occured or not.
-            If HTTPError was thrown, Response object would be a catched
-            exception, but there's no difference in its functionality.
+            A tuple of (Response, exc) where Response is an urllib3
+            HTTPResponse with its content preloaded, and exc determines
+            whether the status indicates an error.
         """
-        url = construct_url(API_URL, route)
+        url = construct_url(baseurl, route)
 
-        if isinstance(data, dict):
-            data = json.dumps(data)
+        if isinstance(data, (dict, list)):
+            data = json_dumps(data)
         if isinstance(data, str):
             data = data.encode()
 
         req_headers = self.headers.copy()
         if headers is not None:
             req_headers.update(headers)
+        if isinstance(data, MultipartEncoder):
+            # Rewound as it could have been read by the previous attempt
+            data.seek(0)
+            req_headers["Content-Length"] = str(len(data))
 
         logger.info("Sending %s requests to %s", method, url)
 
-        req = Request(url, data, req_headers, method=method)
-
-        exc = False
-        try:
-            res = urlopen(req)
-        except HTTPError as e:
-            exc = True
-            res = e
+        res = self.http.request(method, url, body=data, headers=req_headers)
 
-        return res, exc
+        return res, res.status >= 400
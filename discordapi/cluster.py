@@ -0,0 +1,579 @@
+#
+# NicoBot is Nicovideo Player bot for Discord, written from the scratch.
+# This file is part of NicoBot.
+#
+# Copyright (C) 2021 Wonjun Jung (KokoseiJ)
+#
+#    Nicobot is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+from .client import DiscordClient
+from .exceptions import ClusterError
+from .shard import ShardManager, IdentifyLimiter, get_shard_id
+from .const import LIB_NAME
+
+import os
+import time
+import asyncio
+import logging
+import multiprocessing
+from functools import partial
+from itertools import count
+from threading import Thread, Lock, Event
+from concurrent.futures import Future, ThreadPoolExecutor
+
+__all__ = ["Cluster", "ClusterWorker", "IPCConnection"]
+
+logger = logging.getLogger(LIB_NAME)
+
+REQUEST_TIMEOUT = 10
+STOP_TIMEOUT = 10
+COMMAND_WORKERS = 4
+
+
+class IPCConnection:
+    """Sends requests over a multiprocessing Connection, and serves them.
+
+    Messages are tuples pickled by the Connection. A request is
+    ("request", nonce, command, args), and it gets answered with
+    ("response", nonce, error, value) where error is None, or the
+    description of the exception raised while serving the request.
+
+    Attributes:
+        conn:
+            multiprocessing Connection to the other process.
+        on_request:
+            Function called with (command, args) from the reader thread. Its
+            return value is sent back, or its result if it's a Future. It
+            should return quickly, since requests are read one by one.
+        on_close:
+            Function called without arguments after the connection closes,
+            or None.
+        _pending:
+            dict of Futures waiting for the response, per nonce.
+        _nonce:
+            itertools.count generating nonces.
+        _lock:
+            Lock for sending from multiple threads.
+        _thread:
+            Thread reading the connection.
+    """
+
+    def __init__(self, conn, on_request, on_close=None, name="ipc"):
+        self.conn = conn
+        self.on_request = on_request
+        self.on_close = on_close
+
+        self._pending = {}
+        self._nonce = count()
+        self._lock = Lock()
+        self._thread = Thread(target=self._run, name=name, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def request(self, command, *args):
+        """Sends the request, returns a Future resolving to the response.
+
+        The Future raises ClusterError if the request failed on the other
+        side, or the connection has been closed.
+        """
+        future = Future()
+        nonce = next(self._nonce)
+        self._pending[nonce] = future
+        try:
+            self._send(("request", nonce, command, args))
+        except (OSError, ValueError) as e:
+            self._pending.pop(nonce, None)
+            future.set_exception(ClusterError(f"Connection closed: {e}"))
+        except Exception as e:
+            # Arguments which can't be pickled
+            self._pending.pop(nonce, None)
+            future.set_exception(ClusterError(
+                f"Failed to send {command}: {type(e).__name__}: {e}"
+            ))
+        return future
+
+    def _send(self, message):
+        with self._lock:
+            self.conn.send(message)
+
+    def _respond(self, nonce, error, value=None):
+        try:
+            self._send(("response", nonce, error, value))
+        except (OSError, ValueError):
+            logger.warning(f"Failed to respond to IPC request {nonce}.")
+        except Exception as e:
+            # The value can't be pickled, nothing has been sent yet
+            logger.exception(f"Failed to send the response to {nonce}.")
+            if error is None:
+                self._respond(nonce, f"{type(e).__name__}: {e}")
+
+    def _respond_future(self, nonce, future):
+        try:
+            value = future.result()
+        except Exception as e:
+            self._respond(nonce, f"{type(e).__name__}: {e}")
+        else:
+            self._respond(nonce, None, value)
+
+    def _serve(self, nonce, command, args):
+        try:
+            value = self.on_request(command, args)
+        except Exception as e:
+            logger.exception(f"Exception occured while serving {command}.")
+            self._respond(nonce, f"{type(e).__name__}: {e}")
+            return
+
+        if isinstance(value, Future):
+            value.add_done_callback(
+                lambda future: self._respond_future(nonce, future)
+            )
+        else:
+            self._respond(nonce, None, value)
+
+    def _run(self):
+        while True:
+            try:
+                message = self.conn.recv()
+            except (EOFError, OSError):
+                break
+
+            if message[0] == "request":
+                self._serve(*message[1:])
+            elif message[0] == "response":
+                _, nonce, error, value = message
+                future = self._pending.pop(nonce, None)
+                if future is None:
+                    continue
+                if error is None:
+                    future.set_result(value)
+                else:
+                    future.set_exception(ClusterError(error))
+
+        # Other threads could be adding requests meanwhile
+        for nonce in list(self._pending):
+            future = self._pending.pop(nonce, None)
+            if future is not None:
+                future.set_exception(ClusterError("Connection closed"))
+
+        if self.on_close is not None:
+            self.on_close()
+
+    def close(self):
+        self.conn.close()
+
+
+def guild_payload(guild):
+    """Returns the guild as a dict, without members and presences.
+
+    Channels are listed by their current id, name and type.
+    """
+    exclude = ("members", "presences", "voice_states", "channels")
+    data = {
+        key: value for key, value in guild._json.items()
+        if key not in exclude
+    }
+    data["channels"] = [
+        {"id": channel.id, "name": channel.name, "type": channel.type}
+        for channel in guild.channels.values()
+    ]
+    return data
+
+
+def command_get_guild(worker, guild_id):
+    guild = worker.manager.get_guild(guild_id)
+    if not guild:
+        return None
+    return guild_payload(guild)
+
+
+def command_update_voice_state(worker, guild_id, *args):
+    worker.manager.update_voice_state(guild_id, *args)
+
+
+def command_request_guild_member(worker, guild_id, *args):
+    worker.manager.request_guild_member(guild_id, *args)
+
+
+def command_voice(worker, guild_id, method, *args):
+    client = worker.manager.get_shard(guild_id).voice_clients.get(guild_id)
+    if client is None:
+        raise ClusterError(f"No voice client in {guild_id}")
+    if method.startswith("_"):
+        raise ClusterError(f"Can't call private method {method}")
+    return getattr(client, method)(*args)
+
+
+COMMANDS = {
+    "get_guild": command_get_guild,
+    "update_voice_state": command_update_voice_state,
+    "request_guild_member": command_request_guild_member,
+    "voice": command_voice,
+}
+
+
+class ClusterShardManager(ShardManager):
+    """ShardManager asking the parent process before sending IDENTIFY.
+
+    Identify buckets are shared by every shard of the bot, so they're kept
+    by the Cluster instead of each process.
+    """
+
+    def __init__(self, worker, *args, **kwargs):
+        super(ClusterShardManager, self).__init__(*args, **kwargs)
+        self.worker = worker
+
+    async def wait_identify(self, shard_id):
+        future = self.worker.ipc.request("identify", shard_id)
+        await asyncio.sleep(await asyncio.wrap_future(future))
+
+
+class ClusterWorker:
+    """Runs a part of the shards in a worker process of a Cluster.
+
+    Commands for a guild are run by the process owning its shard, which
+    might be this one or another- .call sends them over to the right
+    process through the parent. Commands are functions receiving the worker
+    and the guild id as their first arguments. Arguments and return values
+    have to be picklable.
+
+    Attributes:
+        cluster_id:
+            Index of this worker.
+        clusters:
+            dict mapping every shard id to the id of the cluster running it.
+        manager:
+            ClusterShardManager running the shards of this worker.
+        commands:
+            dict of the commands per name, see COMMANDS for the defaults.
+        ipc:
+            IPCConnection to the parent process.
+        stop_flag:
+            Event which gets set when the worker should stop.
+        _executor:
+            ThreadPoolExecutor running commands requested by other processes.
+    """
+
+    def __init__(self, conn, cluster_id, clusters, manager):
+        """
+        Args:
+            conn:
+                multiprocessing Connection to the parent process.
+            cluster_id:
+                same as .cluster_id attribute.
+            clusters:
+                same as .clusters attribute.
+            manager:
+                dict of the keyword arguments for ClusterShardManager.
+        """
+        self.cluster_id = cluster_id
+        self.clusters = clusters
+        self.manager = ClusterShardManager(self, **manager)
+        self.commands = dict(COMMANDS)
+        self.ipc = IPCConnection(
+            conn, self._on_request, self._on_close,
+            name=f"cluster_{cluster_id}_ipc"
+        )
+        self.stop_flag = Event()
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=COMMAND_WORKERS,
+            thread_name_prefix=f"cluster_{cluster_id}_command"
+        )
+
+    def register(self, name):
+        """Decorator registering a command under the name."""
+        def decorator(func):
+            self.commands[name] = func
+            return func
+
+        return decorator
+
+    def owns(self, guild_id):
+        shard_id = get_shard_id(guild_id, self.manager.shard_count)
+        return self.clusters[shard_id] == self.cluster_id
+
+    def call(self, guild_id, command, *args, timeout=REQUEST_TIMEOUT):
+        """Runs the command in the process owning the guild.
+
+        Raises:
+            ClusterError:
+                if the command failed, or the process couldn't be reached.
+            concurrent.futures.TimeoutError:
+                if it didn't finish within timeout seconds.
+        """
+        if self.owns(guild_id):
+            return self._call(guild_id, command, args)
+
+        future = self.ipc.request("route", guild_id, command, args)
+        return future.result(timeout)
+
+    def _call(self, guild_id, command, args):
+        func = self.commands.get(command)
+        if func is None:
+            raise ClusterError(f"Unknown command {command}")
+        return func(self, guild_id, *args)
+
+    def get_guild(self, guild_id):
+        """Returns the guild as a dict, see guild_payload."""
+        return self.call(guild_id, "get_guild")
+
+    def update_voice_state(self, guild_id, *args):
+        return self.call(guild_id, "update_voice_state", *args)
+
+    def request_guild_member(self, guild_id, *args):
+        return self.call(guild_id, "request_guild_member", *args)
+
+    def voice(self, guild_id, method, *args):
+        """Calls the method of the DiscordVoiceClient of the guild."""
+        return self.call(guild_id, "voice", method, *args)
+
+    def _on_request(self, command, args):
+        if command == "call":
+            return self._executor.submit(self._call, *args)
+        elif command == "is_ready":
+            return self.manager.is_ready()
+        elif command == "stop":
+            self.stop_flag.set()
+            return None
+        raise ClusterError(f"Unknown request {command}")
+
+    def _on_close(self):
+        if not self.stop_flag.is_set():
+            logger.warning("Lost connection to the cluster, stopping.")
+            self.stop_flag.set()
+
+    def run(self):
+        self.ipc.start()
+        self.manager.start()
+        self.stop_flag.wait()
+
+        self.manager.stop()
+        self.manager.join(STOP_TIMEOUT)
+        self._executor.shutdown(wait=False)
+        self.ipc.close()
+
+
+def run_worker(conn, cluster_id, clusters, manager, setup):
+    worker = ClusterWorker(conn, cluster_id, clusters, manager)
+    if setup is not None:
+        setup(worker)
+    worker.run()
+
+
+class Cluster:
+    """Spreads the shards over worker processes.
+
+    A process can only use a single core, which limits how many shards it
+    could run- parsing, encoding voice and encrypting it are CPU-bound. The
+    cluster starts a process per cluster_count, each running a contiguous
+    range of the shards with a ClusterShardManager.
+
+    The parent process routes commands between the workers, and keeps the
+    identify buckets. Commands for a guild, such as fetching it or joining a
+    voice channel, are sent to the process owning the shard of the guild.
+
+    Attributes:
+        token:
+            Token of the bot.
+        cluster_count:
+            Number of worker processes.
+        shard_count:
+            Total number of shards. Fetched from /gateway/bot on .start if
+            None.
+        max_concurrency:
+            Number of identify buckets. Fetched from /gateway/bot on .start
+            if None.
+        setup:
+            Function called with the ClusterWorker in every worker process
+            before the shards start, e.g. to register commands. It has to be
+            picklable, so defined at the top level of a module.
+        clusters:
+            dict mapping every shard id to the id of the cluster running it.
+        processes:
+            list of the worker processes.
+        identify_limiter:
+            IdentifyLimiter shared by every shard.
+        kwargs:
+            Keyword arguments for ShardManager, e.g. client and handler.
+        _ipc:
+            list of IPCConnection to the workers.
+        _context:
+            multiprocessing context used to start the workers.
+    """
+
+    def __init__(
+        self,
+        token,
+        cluster_count=None,
+        shard_count=None,
+        max_concurrency=None,
+        setup=None,
+        client=DiscordClient,
+        **kwargs,
+    ):
+        self.token = token
+        self.cluster_count = cluster_count or os.cpu_count()
+        self.shard_count = shard_count
+        self.max_concurrency = max_concurrency
+        self.setup = setup
+        self.clusters = {}
+        self.processes = []
+        self.identify_limiter = None
+        self.kwargs = {**kwargs, "client": client}
+
+        self._ipc = []
+        # Forking would copy the event loop thread as not running
+        self._context = multiprocessing.get_context("spawn")
+
+    def start(self):
+        """Starts the worker processes and returns."""
+        if self.processes:
+            raise RuntimeError("Cluster can only be started once")
+
+        if self.shard_count is None or self.max_concurrency is None:
+            info = self._fetch_gateway()
+            if self.shard_count is None:
+                self.shard_count = info["shards"]
+            if self.max_concurrency is None:
+                limit = info["session_start_limit"]
+                self.max_concurrency = limit["max_concurrency"]
+
+        self.identify_limiter = IdentifyLimiter(self.max_concurrency)
+
+        cluster_count = min(self.cluster_count, self.shard_count)
+        per_cluster, extra = divmod(self.shard_count, cluster_count)
+        ranges = []
+        start = 0
+        for cluster_id in range(cluster_count):
+            end = start + per_cluster + (cluster_id < extra)
+            ranges.append(range(start, end))
+            for shard_id in range(start, end):
+                self.clusters[shard_id] = cluster_id
+            start = end
+
+        logger.info(
+            f"Starting {self.shard_count} shards in {cluster_count} processes"
+        )
+
+        for cluster_id, shard_ids in enumerate(ranges):
+            parent_conn, child_conn = self._context.Pipe()
+            manager = {
+                **self.kwargs,
+                "token": self.token,
+                "shard_count": self.shard_count,
+                "shard_ids": shard_ids,
+                "max_concurrency": self.max_concurrency,
+            }
+            process = self._context.Process(
+                target=run_worker,
+                args=(child_conn, cluster_id, self.clusters, manager,
+                      self.setup),
+                name=f"cluster_{cluster_id}",
+            )
+            process.start()
+            child_conn.close()
+
+            ipc = IPCConnection(
+                parent_conn, partial(self._on_request, cluster_id),
+                name=f"cluster_{cluster_id}_ipc",
+            )
+            ipc.start()
+            self.processes.append(process)
+            self._ipc.append(ipc)
+
+    def _fetch_gateway(self):
+        kwargs = {
+            key: value for key, value in self.kwargs.items()
+            if key not in ("client", "handler")
+        }
+        client = self.kwargs["client"](self.token, **kwargs, name="gateway")
+        try:
+            return client.get_gateway_bot()
+        finally:
+            client.close_http()
+
+    def _on_request(self, cluster_id, command, args):
+        if command == "identify":
+            shard_id, = args
+            return self.identify_limiter.reserve(shard_id)
+        elif command == "route":
+            guild_id, command, args = args
+            return self._get_ipc(guild_id).request(
+                "call", guild_id, command, args
+            )
+        raise ClusterError(f"Unknown request {command}")
+
+    def _get_ipc(self, guild_id):
+        shard_id = get_shard_id(guild_id, self.shard_count)
+        return self._ipc[self.clusters[shard_id]]
+
+    def call(self, guild_id, command, *args, timeout=REQUEST_TIMEOUT):
+        """Runs the command in the process owning the guild.
+
+        See ClusterWorker.call.
+        """
+        future = self._get_ipc(guild_id).request(
+            "call", guild_id, command, args
+        )
+        return future.result(timeout)
+
+    def get_guild(self, guild_id):
+        """Returns the guild as a dict, see guild_payload."""
+        return self.call(guild_id, "get_guild")
+
+    def update_voice_state(self, guild_id, *args):
+        return self.call(guild_id, "update_voice_state", *args)
+
+    def request_guild_member(self, guild_id, *args):
+        return self.call(guild_id, "request_guild_member", *args)
+
+    def voice(self, guild_id, method, *args):
+        """Calls the method of the DiscordVoiceClient of the guild."""
+        return self.call(guild_id, "voice", method, *args)
+
+    def is_ready(self, timeout=REQUEST_TIMEOUT):
+        """Returns whether every shard of every worker is ready."""
+        futures = [ipc.request("is_ready") for ipc in self._ipc]
+        return bool(futures) and all(x.result(timeout) for x in futures)
+
+    def wait_ready(self, timeout=None):
+        """Waits until every shard is ready. Returns False on timeout."""
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+        while not self.is_ready():
+            if timeout is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.1)
+        return True
+
+    def stop(self):
+        for ipc in self._ipc:
+            ipc.request("stop")
+
+    def join(self, timeout=None):
+        """Waits until every worker exits. Returns False on timeout."""
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+        for process in self.processes:
+            if timeout is not None:
+                timeout = max(deadline - time.monotonic(), 0)
+            process.join(timeout)
+            if process.is_alive():
+                return False
+
+        for ipc in self._ipc:
+            ipc.close()
+        return True
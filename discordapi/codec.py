@@ -0,0 +1,144 @@
+#
+# NicoBot is Nicovideo Player bot for Discord, written from the scratch.
+# This file is part of NicoBot.
+#
+# Copyright (C) 2021 Wonjun Jung (KokoseiJ)
+#
+#    Nicobot is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+from .const import LIB_NAME
+
+import os
+import re
+import json
+import logging
+
+__all__ = [
+    "json_loads", "json_dumps", "set_json_backend", "get_json_backend",
+    "peek_event"
+]
+
+logger = logging.getLogger(LIB_NAME)
+
+# In the order of preference
+JSON_BACKENDS = ("orjson", "ujson", "json")
+
+# Fields of a DISPATCH payload preceding "d", in the order the gateway sends
+_PEEK = re.compile(rb'\{"t":"([A-Z_]+)","s":(\d+),"op":0,')
+
+_backend = None
+_loads = None
+_dumps = None
+
+
+def _load_backend(name):
+    if name == "orjson":
+        import orjson
+
+        return orjson.loads, orjson.dumps
+
+    elif name == "ujson":
+        import ujson
+
+        def dumps(obj):
+            return ujson.dumps(obj, ensure_ascii=False).encode()
+
+        return ujson.loads, dumps
+
+    elif name == "json":
+        encode = json.JSONEncoder(
+            ensure_ascii=False, separators=(",", ":")
+        ).encode
+
+        def dumps(obj):
+            return encode(obj).encode()
+
+        return json.loads, dumps
+
+    raise ValueError(f"Unknown JSON backend '{name}'")
+
+
+def set_json_backend(name=None):
+    """Sets the JSON library used throughout the library.
+
+    Args:
+        name:
+            One of "orjson", "ujson" or "json". If None, the first one in
+            that order which is installed gets used.
+
+    Raises:
+        ImportError:
+            if the backend is not installed.
+    """
+    global _backend, _loads, _dumps
+
+    if name is None:
+        for name in JSON_BACKENDS:
+            try:
+                _loads, _dumps = _load_backend(name)
+                break
+            except ImportError:
+                continue
+    else:
+        _loads, _dumps = _load_backend(name)
+
+    _backend = name
+    logger.debug(f"Using {name} as JSON backend.")
+
+
+def get_json_backend():
+    """Returns the name of the JSON library in use."""
+    return _backend
+
+
+def json_loads(data):
+    """Decodes JSON from str or bytes.
+
+    Raises:
+        ValueError:
+            if the data is not a valid JSON.
+    """
+    return _loads(data)
+
+
+def json_dumps(obj):
+    """Encodes obj to compact JSON, as UTF-8 bytes."""
+    return _dumps(obj)
+
+
+def peek_event(data):
+    """Reads the event name and the sequence of a raw DISPATCH payload.
+
+    Only the head of the payload is looked at, so the cost doesn't depend on
+    the size of the payload. It has to start with the fields in the order
+    the gateway sends them- "t", "s", "op", then "d".
+
+    Args:
+        data:
+            Raw JSON payload as bytes.
+
+    Returns:
+        tuple of (event, seq), or None if the payload is not a DISPATCH or
+        doesn't start with those fields.
+    """
+    match = _PEEK.match(data)
+    if match is None:
+        return None
+
+    return match.group(1).decode(), int(match.group(2))
+
+
+# NICOBOT_JSON environment variable overrides the automatic choice
+set_json_backend(os.environ.get("NICOBOT_JSON") or None)
@@ -21,7 +21,9 @@
 from .const import LIB_URL
 from .embed import Embed
 from .gateway import DiscordGateway
-from .handler import MethodEventHandler, ThreadedMethodEventHandler
+from .handler import (
+    MethodEventHandler, ThreadedMethodEventHandler, PooledEventHandlerMixin
+)
 
 from types import GeneratorType
 
@@ -140,17 +142,30 @@ class CommandEventHandler(MethodEventHandler):
             return
         msg = message.content[len(self.prefix) :]
 
+        # Each message is sent while the command goes on to the next one,
+        # but only after the previous one to keep them in order.
+        sent = None
         try:
             gen = self.manager.execute_cmd(msg, message)
             if not gen:
                 return
-            for content in gen:
-                if not content:
-                    continue
-                if isinstance(content, Embed):
-                    message.channel.send(embed=content)
-                else:
-                    message.channel.send(content=content)
+            try:
+                for content in gen:
+                    if not content:
+                        continue
+                    if sent is not None:
+                        sent.result()
+                    if isinstance(content, Embed):
+                        sent = message.client.submit(
+                            message.channel.send, embed=content
+                        )
+                    else:
+                        sent = message.client.submit(
+                            message.channel.send, content=content
+                        )
+            finally:
+                if sent is not None:
+                    sent.result()
         except CommandError as e:
             content = e.message
             message.channel.send(content=content)
@@ -161,6 +176,14 @@ class CommandEventHandler(MethodEventHandler):
 
 
 class ThreadedCommandEventHandler(
-    CommandEventHandler, ThreadedMethodEventHandler
+    PooledEventHandlerMixin, CommandEventHandler, ThreadedMethodEventHandler
 ):
-    pass
+    """CommandEventHandler which runs handlers off the gateway thread.
+
+    A new thread is started for every event, or the handlers run on pool if
+    it's given- refer to WorkerPool for the details.
+    """
+
+    def __init__(self, manager, prefix, pool=None):
+        super(ThreadedCommandEventHandler, self).__init__(manager, prefix)
+        self.pool = pool
@@ -37,7 +37,8 @@ LIB_VER = f"git.{commit}" if commit else "a20211003"
 LIB_URL = "https://github.com/KokoseiJ/NicoBot"
 
 GATEWAY_VER = 9
-GATEWAY_URL = f"wss://gateway.discord.gg/?v={GATEWAY_VER}&encoding=json"
+GATEWAY_HOST = "wss://gateway.discord.gg/"
+GATEWAY_URL = f"{GATEWAY_HOST}?v={GATEWAY_VER}&encoding=json"
 
 API_VER = 9
 API_URL = f"https://discord.com/api/v{API_VER}/"
@@ -21,14 +21,49 @@
 __all__ = ["DictObject"]
 
 
+def _unset(obj, name):
+    try:
+        delattr(obj, name)
+    except AttributeError:
+        pass
+
+
 class DictObject:
     """Object which automatically sets the attribute based on a dict object.
 
     Attributes:
+        lazy:
+            Class attribute. If True, attributes are resolved from the dict
+            when they are first accessed instead of on construction, and
+            cached afterwards. Set it on DictObject to apply to every
+            object, or on a subclass to apply only to that class.
+        keep_json:
+            Class attribute. If False, _json is set to None after the
+            construction so that the dict could be freed. This requires
+            eager construction.
+        RESOLVERS:
+            Class attribute mapping attribute names to functions which
+            compute the value of the attribute from the instance, such as
+            wrapping a nested dict. Keys in keylist found here get resolved
+            by the function instead of being set as-is. They are run in
+            order on construction, so the ones depending on others should
+            come after them.
+        EXPORTERS:
+            Class attribute mapping attribute names to functions which
+            convert the resolved value back to its raw form for .to_dict,
+            called with the instance and the value.
         _json:
             The original dict object in which the class was constructed from.
     """
 
+    # Subclasses not declaring __slots__ get __dict__ as usual
+    __slots__ = ()
+    lazy = False
+    keep_json = True
+    RESOLVERS = {}
+    EXPORTERS = {}
+    _keylist = None
+
     def __init__(self, data, keylist=[]):
         """Constructs the class from the data.
 
@@ -38,14 +73,84 @@ class DictObject:
         overwrite the existing keys when running __init__ in already
         initialized instance.
         """
+        resolvers = self.RESOLVERS
+        lazy = self.lazy and self.keep_json
+        reinit = getattr(self, "_keylist", None) is not None
+
+        if reinit:
+            # Keep values for the keys data doesn't have
+            for key in keylist:
+                if data.get(key) is None:
+                    getattr(self, key)
+                elif lazy:
+                    _unset(self, key)
+            if lazy:
+                for name in resolvers:
+                    if name not in keylist:
+                        _unset(self, name)
+
         self._json = data
+        self._keylist = keylist
+
+        if lazy:
+            return
 
         for key in keylist:
+            if key in resolvers:
+                continue
             value = data.get(key)
-            if value is not None:
+            if value is not None or not reinit:
                 setattr(self, key, value)
-            elif getattr(self, key, None) is None:
-                setattr(self, key, None)
+
+        for name, resolver in resolvers.items():
+            if reinit and name in keylist and data.get(name) is None:
+                continue
+            setattr(self, name, resolver(self))
+
+        if not self.keep_json:
+            self._json = None
+
+    def __getattr__(self, name):
+        # Only called when the attribute is not set yet
+        if name.startswith("_"):
+            raise AttributeError(name)
+        keylist = self._keylist
+        if keylist is None:
+            raise AttributeError(name)
+
+        resolver = self.RESOLVERS.get(name)
+        if resolver is not None:
+            value = resolver(self)
+        elif name in keylist:
+            value = self._json.get(name)
+        else:
+            raise AttributeError(
+                f"'{self.__class__.__name__}' object has no attribute '{name}'"
+            )
+
+        setattr(self, name, value)
+        return value
+
+    def to_dict(self):
+        """Returns the attributes in keylist as a dict, in the raw form.
+
+        Unlike _json, this reflects updates made to the object and works
+        without the raw dict being kept. Attributes which are None are left
+        out.
+        """
+        exporters = self.EXPORTERS
+        data = {}
+        for key in self._keylist:
+            value = getattr(self, key)
+            if value is None:
+                continue
+            exporter = exporters.get(key)
+            if exporter is not None:
+                value = exporter(self, value)
+                if value is None:
+                    continue
+            data[key] = value
+        return data
 
     def _get_str(self, class_, id_, repr_=None):
         if repr_ is not None:
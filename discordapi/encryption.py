@@ -0,0 +1,224 @@
+#
+# NicoBot is Nicovideo Player bot for Discord, written from the scratch.
+# This file is part of NicoBot.
+#
+# Copyright (C) 2021 Wonjun Jung (KokoseiJ)
+#
+#    Nicobot is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+from .const import LIB_NAME
+
+import os
+import struct
+import logging
+
+__all__ = [
+    "VoiceEncryption",
+    "XSalsa20Poly1305",
+    "XSalsa20Poly1305Suffix",
+    "XSalsa20Poly1305Lite",
+    "ENCRYPTION_MODES",
+    "PREFERRED_MODES",
+]
+
+logger = logging.getLogger(LIB_NAME)
+
+HEADER_SIZE = 12
+MAC_SIZE = 16
+NONCE_SIZE = 24
+
+LITE_NONCE_STRUCT = struct.Struct(">I")
+
+try:
+    import nacl.secret
+except ImportError:
+    nacl = None
+
+try:
+    # Lets us encrypt directly into the buffer instead of allocating
+    from nacl._sodium import ffi, lib as sodium
+
+    SODIUM_AVAILABLE = True
+except ImportError:
+    SODIUM_AVAILABLE = False
+
+
+class VoiceEncryption:
+    """Base class for voice packet encryption modes.
+
+    Packets are built in place, in the buffer owned by the voice client. The
+    client writes the RTP header at given offset, then calls .encrypt which
+    writes the rest of the packet right after the header.
+
+    To add a new mode, inherit this class, set .mode to the name Discord uses
+    and implement .encrypt. then add it to ENCRYPTION_MODES.
+
+    Attributes:
+        mode:
+            Name of the mode, as used in SELECT_PROTOCOL.
+        overhead:
+            Maximum amount of bytes added to the payload, excluding header.
+        buffer:
+            bytearray in which the packets are built.
+        view:
+            memoryview of the buffer.
+        nonce:
+            bytearray of the nonce to encrypt with, reused for every packet.
+        _sodium_args:
+            tuple of cffi pointers to buffer, nonce and key. None if libsodium
+            is not directly available, in which case SecretBox is used.
+    """
+
+    mode = None
+    overhead = MAC_SIZE
+
+    def __init__(self, secret_key, buffer):
+        """
+        Args:
+            secret_key:
+                bytes of the secret key received in SESSION_DESCRIPTION.
+            buffer:
+                same as .buffer attribute
+        """
+        self.buffer = buffer
+        self.view = memoryview(buffer)
+        self.nonce = bytearray(NONCE_SIZE)
+
+        if SODIUM_AVAILABLE:
+            self._secret_box = None
+            self._sodium_args = (
+                ffi.from_buffer(buffer),
+                ffi.from_buffer(self.nonce),
+                ffi.from_buffer(secret_key),
+            )
+        else:
+            self._secret_box = nacl.secret.SecretBox(secret_key)
+            self._sodium_args = None
+
+    def encrypt(self, offset, data):
+        """Encrypts data and writes it after the header located at offset.
+
+        This method should be implemented by the inherited class.
+
+        Args:
+            offset:
+                Index of the buffer where the packet starts.
+            data:
+                bytes-like object of Opus frame to encrypt.
+
+        Returns:
+            Length of the whole packet including header, or 0 if the packet
+            could not be encrypted.
+        """
+        raise NotImplementedError()
+
+    def _seal(self, offset, data):
+        """Writes MAC and ciphertext of data at offset, using .nonce.
+
+        Returns:
+            Amount of bytes written.
+        """
+        if not isinstance(data, bytes):
+            data = bytes(data)
+
+        if self._sodium_args is not None:
+            buf_ptr, nonce_ptr, key_ptr = self._sodium_args
+            sodium.crypto_secretbox_easy(
+                buf_ptr + offset, data, len(data), nonce_ptr, key_ptr
+            )
+        else:
+            enc = self._secret_box.encrypt(data, bytes(self.nonce))
+            self.buffer[offset:offset + len(enc.ciphertext)] = enc.ciphertext
+
+        return MAC_SIZE + len(data)
+
+
+class XSalsa20Poly1305(VoiceEncryption):
+    """Uses the RTP header padded with zeros as a nonce."""
+
+    mode = "xsalsa20_poly1305"
+
+    def encrypt(self, offset, data):
+        self.nonce[:HEADER_SIZE] = self.view[offset:offset + HEADER_SIZE]
+        body = offset + HEADER_SIZE
+        return HEADER_SIZE + self._seal(body, data)
+
+
+class XSalsa20Poly1305Suffix(VoiceEncryption):
+    """Uses 24 random bytes as a nonce, appended to the packet."""
+
+    mode = "xsalsa20_poly1305_suffix"
+    overhead = MAC_SIZE + NONCE_SIZE
+
+    def encrypt(self, offset, data):
+        if self._sodium_args is not None:
+            sodium.randombytes(self._sodium_args[1], NONCE_SIZE)
+        else:
+            self.nonce[:] = os.urandom(NONCE_SIZE)
+
+        end = offset + HEADER_SIZE
+        end += self._seal(end, data)
+        self.buffer[end:end + NONCE_SIZE] = self.nonce
+
+        return end + NONCE_SIZE - offset
+
+
+class XSalsa20Poly1305Lite(VoiceEncryption):
+    """Uses incrementing 4 bytes integer as a nonce, appended to the packet.
+
+    Nonce must never be reused with the same key, so this refuses to encrypt
+    once the counter runs out. Voice client reconnects to receive a new key
+    when that happens.
+
+    Attributes:
+        counter:
+            Integer to be used as the next nonce.
+    """
+
+    mode = "xsalsa20_poly1305_lite"
+    overhead = MAC_SIZE + LITE_NONCE_STRUCT.size
+
+    def __init__(self, secret_key, buffer):
+        super(XSalsa20Poly1305Lite, self).__init__(secret_key, buffer)
+        self.counter = 0
+
+    def encrypt(self, offset, data):
+        counter = self.counter
+        if counter > 0xFFFFFFFF:
+            return 0
+        self.counter = counter + 1
+
+        LITE_NONCE_STRUCT.pack_into(self.nonce, 0, counter)
+
+        end = offset + HEADER_SIZE
+        end += self._seal(end, data)
+        LITE_NONCE_STRUCT.pack_into(self.buffer, end, counter)
+
+        return end + LITE_NONCE_STRUCT.size - offset
+
+
+ENCRYPTION_MODES = {
+    cls.mode: cls
+    for cls in (XSalsa20Poly1305, XSalsa20Poly1305Suffix, XSalsa20Poly1305Lite)
+}
+
+# Plain mode uses the RTP header as a nonce, which repeats once the timestamp
+# wraps around- about 25 hours of audio. Lite mode only repeats after 2^32
+# packets and costs 4 bytes per packet, so it's preferred.
+PREFERRED_MODES = (
+    "xsalsa20_poly1305_lite",
+    "xsalsa20_poly1305_suffix",
+    "xsalsa20_poly1305",
+)
@@ -0,0 +1,259 @@
+#
+# NicoBot is Nicovideo Player bot for Discord, written from the scratch.
+# This file is part of NicoBot.
+#
+# Copyright (C) 2021 Wonjun Jung (KokoseiJ)
+#
+#    Nicobot is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+from .const import LIB_NAME
+
+import zlib
+import struct
+import logging
+
+__all__ = ["etf_pack", "etf_unpack"]
+
+logger = logging.getLogger(LIB_NAME)
+
+try:
+    import erlpack
+except ImportError:
+    erlpack = None
+
+VERSION = 131
+
+NEW_FLOAT_EXT = 70
+COMPRESSED = 80
+SMALL_INTEGER_EXT = 97
+INTEGER_EXT = 98
+FLOAT_EXT = 99
+ATOM_EXT = 100
+SMALL_TUPLE_EXT = 104
+LARGE_TUPLE_EXT = 105
+NIL_EXT = 106
+STRING_EXT = 107
+LIST_EXT = 108
+BINARY_EXT = 109
+SMALL_BIG_EXT = 110
+LARGE_BIG_EXT = 111
+MAP_EXT = 116
+SMALL_ATOM_EXT = 115
+ATOM_UTF8_EXT = 118
+SMALL_ATOM_UTF8_EXT = 119
+
+# Integers from this value are treated as snowflakes. Millisecond timestamps
+# stay below it for the next few thousand years.
+SNOWFLAKE_MIN = 1 << 48
+
+_U16 = struct.Struct(">H").unpack_from
+_U32 = struct.Struct(">I").unpack_from
+_I32 = struct.Struct(">i").unpack_from
+_F64 = struct.Struct(">d").unpack_from
+
+_ATOMS = {b"nil": None, b"true": True, b"false": False}
+_MISSING = object()
+
+
+def _atom(name):
+    value = _ATOMS.get(name, _MISSING)
+    if value is _MISSING:
+        return name.decode()
+    return value
+
+
+def _big(data, pos, size):
+    value = int.from_bytes(data[pos + 1:pos + 1 + size], "little")
+    if data[pos]:
+        value = -value
+    elif value >= SNOWFLAKE_MIN:
+        value = str(value)
+    return value
+
+
+def _decode(data, pos):
+    """Decodes a term at pos, returns the value and the position after it."""
+    tag = data[pos]
+    pos += 1
+
+    if tag == BINARY_EXT:
+        size, = _U32(data, pos)
+        pos += 4
+        return data[pos:pos + size].decode(), pos + size
+
+    elif tag == MAP_EXT:
+        size, = _U32(data, pos)
+        pos += 4
+        result = {}
+        for _ in range(size):
+            key, pos = _decode(data, pos)
+            result[key], pos = _decode(data, pos)
+        return result, pos
+
+    elif tag == SMALL_INTEGER_EXT:
+        return data[pos], pos + 1
+
+    elif tag == SMALL_ATOM_UTF8_EXT or tag == SMALL_ATOM_EXT:
+        size = data[pos]
+        pos += 1
+        return _atom(data[pos:pos + size]), pos + size
+
+    elif tag == ATOM_EXT or tag == ATOM_UTF8_EXT:
+        size, = _U16(data, pos)
+        pos += 2
+        return _atom(data[pos:pos + size]), pos + size
+
+    elif tag == LIST_EXT:
+        size, = _U32(data, pos)
+        pos += 4
+        result = []
+        for _ in range(size):
+            value, pos = _decode(data, pos)
+            result.append(value)
+        # Tail of a proper list is NIL_EXT
+        if data[pos] == NIL_EXT:
+            pos += 1
+        else:
+            _, pos = _decode(data, pos)
+        return result, pos
+
+    elif tag == NIL_EXT:
+        return [], pos
+
+    elif tag == INTEGER_EXT:
+        return _I32(data, pos)[0], pos + 4
+
+    elif tag == SMALL_BIG_EXT:
+        size = data[pos]
+        return _big(data, pos + 1, size), pos + 2 + size
+
+    elif tag == LARGE_BIG_EXT:
+        size, = _U32(data, pos)
+        return _big(data, pos + 4, size), pos + 5 + size
+
+    elif tag == NEW_FLOAT_EXT:
+        return _F64(data, pos)[0], pos + 8
+
+    elif tag == STRING_EXT:
+        # Erlang sends short lists of small integers as strings
+        size, = _U16(data, pos)
+        pos += 2
+        return list(data[pos:pos + size]), pos + size
+
+    elif tag == SMALL_TUPLE_EXT or tag == LARGE_TUPLE_EXT:
+        if tag == SMALL_TUPLE_EXT:
+            size = data[pos]
+            pos += 1
+        else:
+            size, = _U32(data, pos)
+            pos += 4
+        result = []
+        for _ in range(size):
+            value, pos = _decode(data, pos)
+            result.append(value)
+        return result, pos
+
+    elif tag == FLOAT_EXT:
+        return float(data[pos:pos + 31].split(b"\x00", 1)[0]), pos + 31
+
+    raise ValueError(f"Unsupported ETF tag {tag}")
+
+
+def etf_unpack(data):
+    """Decodes ETF encoded bytes into the same shape as JSON payloads.
+
+    Binaries and atoms become str, nil/true/false atoms become None/True/False
+    and tuples become lists. Snowflakes, which the gateway sends as integers,
+    become str just like in JSON payloads.
+
+    This is pure Python- erlpack's decoder returns bytes for binaries, and
+    converting its output costs more than decoding it here.
+
+    Raises:
+        ValueError:
+            if the data is malformed.
+    """
+    try:
+        if data[0] != VERSION:
+            raise ValueError("Malformed data! Invalid ETF version")
+
+        if data[1] == COMPRESSED:
+            size, = _U32(data, 2)
+            data = zlib.decompress(data[6:])
+            if len(data) != size:
+                raise ValueError("Malformed data! Size mismatch")
+            value, _ = _decode(data, 0)
+        else:
+            value, _ = _decode(data, 1)
+    except (IndexError, struct.error, zlib.error) as e:
+        raise ValueError(f"Malformed data! {e}") from e
+
+    return value
+
+
+def _encode(obj, buf):
+    if obj is None:
+        buf += b"s\x03nil"
+    elif obj is True:
+        buf += b"s\x04true"
+    elif obj is False:
+        buf += b"s\x05false"
+    elif isinstance(obj, str):
+        obj = obj.encode()
+        buf += struct.pack(">BI", BINARY_EXT, len(obj))
+        buf += obj
+    elif isinstance(obj, int):
+        if 0 <= obj < 256:
+            buf += struct.pack(">BB", SMALL_INTEGER_EXT, obj)
+        elif -(1 << 31) <= obj < (1 << 31):
+            buf += struct.pack(">Bi", INTEGER_EXT, obj)
+        else:
+            value = abs(obj)
+            size = (value.bit_length() + 7) // 8
+            if size > 255:
+                raise ValueError("Integer is too big to encode")
+            buf += struct.pack(">BBB", SMALL_BIG_EXT, size, obj < 0)
+            buf += value.to_bytes(size, "little")
+    elif isinstance(obj, float):
+        buf += struct.pack(">Bd", NEW_FLOAT_EXT, obj)
+    elif isinstance(obj, dict):
+        buf += struct.pack(">BI", MAP_EXT, len(obj))
+        for key, value in obj.items():
+            _encode(key, buf)
+            _encode(value, buf)
+    elif isinstance(obj, (list, tuple)):
+        if obj:
+            buf += struct.pack(">BI", LIST_EXT, len(obj))
+            for value in obj:
+                _encode(value, buf)
+        buf.append(NIL_EXT)
+    elif isinstance(obj, (bytes, bytearray, memoryview)):
+        buf += struct.pack(">BI", BINARY_EXT, len(obj))
+        buf += obj
+    else:
+        raise TypeError(f"Cannot encode {type(obj).__name__} to ETF")
+
+
+def etf_pack(obj):
+    """Encodes obj to ETF, with erlpack if available.
+
+    str gets encoded as binaries, which the gateway accepts in place of atoms.
+    """
+    if erlpack is not None:
+        return erlpack.pack(obj)
+
+    buf = bytearray((VERSION,))
+    _encode(obj, buf)
+    return bytes(buf)
@@ -18,7 +18,7 @@
 #    along with this program.  If not, see <https://www.gnu.org/licenses/>.
 #
 
-__all__ = ["DiscordError", "DiscordHTTPError"]
+__all__ = ["DiscordError", "DiscordHTTPError", "ClusterError"]
 
 
 class DiscordError(Exception):
@@ -46,3 +46,9 @@ class DiscordHTTPError(DiscordError):
         self.response = response
 
         self.args = (f"{code}: {message}",)
+
+
+class ClusterError(DiscordError):
+    """Exception to be thrown when a command to another process fails."""
+
+    pass
@@ -18,6 +18,7 @@
 #    along with this program.  If not, see <https://www.gnu.org/licenses/>.
 #
 
+import os
 from io import BytesIO
 from os.path import split, abspath, exists, isdir
 
@@ -199,6 +200,26 @@ class File:
 
         return self.fileobj.read(*args, **kwargs)
 
+    def seek(self, *args, **kwargs):
+        self._prep_read()
+
+        return self.fileobj.seek(*args, **kwargs)
+
+    def tell(self):
+        self._prep_read()
+
+        return self.fileobj.tell()
+
+    def get_size(self):
+        """Returns the size of the content left to read, without reading it."""
+        self._prep_read()
+
+        position = self.fileobj.tell()
+        end = self.fileobj.seek(0, os.SEEK_END)
+        self.fileobj.seek(position)
+
+        return end - position
+
     def _prep_read(self):
         if self.fileobj is None:
             if self.path is None:
@@ -19,30 +19,57 @@
 #
 
 from .guild import Guild
+from .index import EntityIndex
 from .user import BotUser
-from .member import Member
+from .member import make_member
 from .message import Message
 from .util import filter_dict
+from .codec import json_loads, peek_event
 from .channel import get_channel
 from .voice import DiscordVoiceClient
-from .websocket import WebSocketThread
-from .const import LIB_NAME, GATEWAY_URL, VOICE_VER
+from .websocket import AsyncWebSocketClient
+from .const import LIB_NAME, GATEWAY_HOST, GATEWAY_VER, VOICE_VER
 from .handler import EventHandler, GeneratorEventHandler
 
 import sys
 import time
 import logging
-from threading import Event
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 __all__ = []
 
 logger = logging.getLogger(LIB_NAME)
 
 
-class DiscordGateway(WebSocketThread):
+class DiscordGateway(AsyncWebSocketClient):
     """Gateway Class which defines websocket behaviour and handles events.
 
     Event related operations are done within this class.
+
+    The connection itself runs on the event loop, while DISPATCH events are
+    parsed and passed to the handler in a single dispatch thread, in the order
+    they were received. This way a slow handler can't delay heartbeats, or
+    the voice connections sharing the event loop.
+
+    Passing compress=True requests zlib-stream transport compression, which
+    shrinks large payloads such as GUILD_CREATE several times over, at the
+    cost of decompressing them. encoding="etf" makes the gateway send
+    payloads in Erlang Term Format instead of JSON.
+
+    Events which neither the handler consumes nor the event parser needs to
+    keep the state up to date are dropped before being parsed. With JSON
+    encoding, they skip decoding as well- the event name is peeked from the
+    raw payload. See EventHandler.events.
+
+    shard is a tuple of (shard_id, shard_count), sent with IDENTIFY to
+    receive the events of a portion of the guilds. See ShardManager.
+    gateway_url replaces the URL of the gateway, e.g. to connect to a local
+    gateway for testing.
+
+    With a SessionStore given as session_store, the session and the guilds
+    get saved on .stop, and restored on .start to RESUME the session instead
+    of starting a new one.
     """
 
     DISPATCH = 0
@@ -57,6 +84,9 @@ class DiscordGateway(WebSocketThread):
     HELLO = 10
     HEARTBEAT_ACK = 11
 
+    # Closing with 1000 or 1001 ends the session, which can't be resumed
+    RESUMABLE_CLOSE = 4000
+
     def __init__(
         self,
         token,
@@ -64,10 +94,20 @@ class DiscordGateway(WebSocketThread):
         event_parser=None,
         intents=32509,
         name="main",
+        compress=False,
+        encoding="json",
+        shard=None,
+        gateway_url=GATEWAY_HOST,
+        session_store=None,
     ):
         # 32509 is an intent value that omits flags which require verification
+        query = f"?v={GATEWAY_VER}&encoding={encoding}"
+        if compress:
+            query += "&compress=zlib-stream"
+
         super(DiscordGateway, self).__init__(
-            GATEWAY_URL, self._dispatcher, name
+            gateway_url + query, self._dispatcher, name, compress=compress,
+            encoding=encoding
         )
 
         if handler is None:
@@ -75,35 +115,87 @@ class DiscordGateway(WebSocketThread):
         if event_parser is None:
             event_parser = GatewayEventParser
 
-        self.set_handler(handler)
+        self.wanted_events = None
         self.event_parser = event_parser(self)
+        self.set_handler(handler)
+        if encoding == "json":
+            self._decode = self._decode_json
 
         self.token = token
         self.intents = intents
+        self.shard = shard
+        self.shard_manager = None
+        self.session_store = session_store
+        self.resume_gateway_url = None
+        self._query = query
 
         self.seq = 0
-        self.heartbeat_interval = None
-        self.is_heartbeat_ready = Event()
-        self.heartbeat_ack_received = Event()
         self.is_reconnect = False
         self.voice_clients = {}
         self.voice_queue = {}
 
         self.user = None
         self.guilds = None
+        self._guilds_lock = threading.Lock()
+        self.index = EntityIndex()
         self.session_id = None
         self.application = None
 
+        self._dispatch_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix=f"{self.name}_dispatch"
+        )
+        self._dispatch_ident = None
+
     def set_ready(
         self, user=None, guilds=None, session_id=None, application=None
     ):
         if None not in [user, guilds, session_id, application]:
             self.user = BotUser(self, user)
             self.guilds = {obj["id"]: False for obj in guilds}
+            self.index.clear()
             self.session_id = session_id
             self.application = application
         self.ready_to_run.set()
 
+    def start(self):
+        if self.session_store is not None:
+            try:
+                self.session_store.restore(self)
+            except Exception:
+                logger.exception("Failed to restore the session.")
+        super(DiscordGateway, self).start()
+
+    def stop(self, status=None):
+        if status is None:
+            if self.session_store is not None:
+                status = self.RESUMABLE_CLOSE
+            else:
+                status = 1000
+        super(DiscordGateway, self).stop(status)
+
+    def get_url(self):
+        if self.is_reconnect and self.resume_gateway_url:
+            return self.resume_gateway_url + self._query
+        return self.url
+
+    def save_session(self):
+        try:
+            self.session_store.save(self)
+        except Exception:
+            logger.exception("Failed to save the session.")
+
+    def _set_guild(self, id_, guild, replace=True):
+        """Sets the guild of id_, returns whether it was set.
+
+        If replace is False, the guild is set only if it's not cached yet.
+        """
+        # Updated in place under the lock, see DiscordClient.get_guilds
+        with self._guilds_lock:
+            if not replace and self.guilds.get(id_):
+                return False
+            self.guilds[id_] = guild
+            return True
+
     def set_handler(self, handler):
         if isinstance(handler, EventHandler):
             self.handler = handler
@@ -113,9 +205,22 @@ class DiscordGateway(WebSocketThread):
             raise TypeError("Inappropriate EventHandler object.")
 
         self.handler.set_client(self)
+        self.update_event_filter()
 
-    def init_connection(self):
+    def update_event_filter(self):
+        """Updates the set of events to be parsed from the handler."""
+        events = self.handler.get_events()
+        if events is None:
+            self.wanted_events = None
+        else:
+            self.wanted_events = (
+                frozenset(events) | self.event_parser.STATE_EVENTS
+            )
+
+    async def init_connection(self):
         if not self.is_reconnect:
+            if self.shard_manager is not None:
+                await self.shard_manager.wait_identify(self.shard[0])
             self.send_identify()
             self.is_reconnect = True
         else:
@@ -141,6 +246,9 @@ class DiscordGateway(WebSocketThread):
             },
         )
 
+        if self.shard is not None:
+            data["d"]["shard"] = list(self.shard)
+
         if activities:
             data.update(
                 {
@@ -164,35 +272,6 @@ class DiscordGateway(WebSocketThread):
         )
         self.send(data)
 
-    def do_heartbeat(self):
-        ready_flag = self.is_heartbeat_ready
-        stop_flag = self.heartbeat_thread.stop_flag
-        ack_flag = self.heartbeat_ack_received
-
-        ready_flag.wait()
-
-        wait_time = self.heartbeat_interval
-
-        while not stop_flag.is_set():
-            ready_flag.wait()
-            self.send_heartbeat()
-            sendtime = time.time()
-            logger.debug("Sending heartbeat...")
-
-            deadline = sendtime + wait_time
-
-            if not ack_flag.wait(max(deadline - time.time(), 0)):
-                logger.error("Warning! No HEARTBEAT_ACK received within time!")
-                ready_flag.clear()
-                self.reconnect()
-
-            if stop_flag.wait(max(deadline - time.time(), 0)):
-                break
-
-            self.heartbeat_ack_received.clear()
-
-        logger.info("Terminating heartbeat thread...")
-
     def send_heartbeat(self):
         data = self._get_payload(
             self.HEARTBEAT, d=self.seq if self.seq else None
@@ -203,14 +282,25 @@ class DiscordGateway(WebSocketThread):
         return {"op": op, "d": data if d is None else d}
 
     def cleanup(self):
-        self.is_heartbeat_ready.clear()
-        self.heartbeat_ack_received.set()
-
         if self.stop_flag.is_set():
             logger.info("Triggering voice client shutdown...")
             for client in self.voice_clients.values():
                 if client is not None:
                     client.stop()
+            if self.session_store is not None:
+                # After the events already received, for the guilds to match
+                self._dispatch_executor.submit(self.save_session)
+            self._dispatch_executor.shutdown(wait=False)
+
+    def _decode_json(self, data):
+        wanted = self.wanted_events
+        if wanted is not None:
+            peeked = peek_event(data)
+            if peeked is not None and peeked[0] not in wanted:
+                event, seq = peeked
+                return {"op": self.DISPATCH, "s": seq, "t": event, "d": None}
+
+        return json_loads(data)
 
     def _dispatcher(self, data):
         op = data["op"]
@@ -220,8 +310,11 @@ class DiscordGateway(WebSocketThread):
 
         if op == self.DISPATCH:
             self.seq = seq
-            obj = self.event_parser._handle(event, payload)
-            self.handler.handle(event, obj)
+            wanted = self.wanted_events
+            if wanted is None or event in wanted:
+                self._dispatch_executor.submit(
+                    self._handle_event, event, payload
+                )
 
         elif op == self.INVALID_SESSION or op == self.RECONNECT:
             self.is_reconnect = payload
@@ -230,12 +323,23 @@ class DiscordGateway(WebSocketThread):
         elif op == self.HELLO:
             if not self.is_reconnect and self.seq != 0:
                 self.seq = 0
-            self.heartbeat_interval = payload["heartbeat_interval"] / 1000
-            self.is_heartbeat_ready.set()
+            self.start_heartbeat(payload["heartbeat_interval"] / 1000)
 
         elif op == self.HEARTBEAT_ACK:
             logger.debug("Received Heartbeat ACK!")
-            self.heartbeat_ack_received.set()
+            self.ack_heartbeat()
+
+    def in_dispatch_thread(self):
+        """Returns whether the current thread is the one handling events."""
+        return threading.get_ident() == self._dispatch_ident
+
+    def _handle_event(self, event, payload):
+        self._dispatch_ident = threading.get_ident()
+        try:
+            obj = self.event_parser._handle(event, payload)
+            self.handler.handle(event, obj)
+        except Exception:
+            logger.exception(f"Exception occured while handling {event}.")
 
     def __str__(self):
         class_name = self.__class__.__name__
@@ -254,6 +358,27 @@ class DiscordGateway(WebSocketThread):
 
 
 class GatewayEventParser:
+    # Events which update the state, parsed even if no handler consumes them
+    STATE_EVENTS = frozenset((
+        "READY",
+        "RESUMED",
+        "CHANNEL_CREATE",
+        "CHANNEL_UPDATE",
+        "CHANNEL_DELETE",
+        "CHANNEL_PINS_UPDATE",
+        "GUILD_CREATE",
+        "GUILD_UPDATE",
+        "GUILD_DELETE",
+        "GUILD_BAN_ADD",
+        "GUILD_EMOJIS_UPDATE",
+        "GUILD_MEMBER_ADD",
+        "GUILD_MEMBER_REMOVE",
+        "GUILD_MEMBER_UPDATE",
+        "GUILD_MEMBERS_CHUNK",
+        "VOICE_SERVER_UPDATE",
+        "VOICE_STATE_UPDATE",
+    ))
+
     def __init__(self, client=None):
         self.client = None
         if client:
@@ -283,6 +408,7 @@ class GatewayEventParser:
         return value
 
     def on_ready(self, payload):
+        self.client.resume_gateway_url = payload.get("resume_gateway_url")
         self.client.set_ready(
             payload["user"],
             payload["guilds"],
@@ -303,7 +429,8 @@ class GatewayEventParser:
         guild = self.client.guilds.get(guild_id)
         id_ = obj.id
 
-        guild.channels.update({id_: obj})
+        guild._update_channels({id_: obj})
+        self.client.index.add_channel(obj)
 
         return obj
 
@@ -320,8 +447,8 @@ class GatewayEventParser:
         guild = self.client.guilds.get(guild_id)
         id_ = obj.id
 
-        if guild.channels.get(id_) is not None:
-            del guild.channels[id_]
+        guild._remove_channel(id_)
+        self.client.index.remove_channel(obj)
 
         return obj
 
@@ -337,7 +464,11 @@ class GatewayEventParser:
 
     def on_guild_create(self, payload):
         obj = Guild(self.client, payload)
-        self.client.guilds.update({obj.id: obj})
+        old = self.client.guilds.get(obj.id)
+        if old:
+            self.client.index.remove_guild(old)
+        self.client._set_guild(obj.id, obj)
+        self.client.index.add_guild(obj)
 
         voice_states = payload.get("voice_states")
 
@@ -362,7 +493,10 @@ class GatewayEventParser:
         return self.on_guild_create(payload)
 
     def on_guild_delete(self, payload):
-        self.client.guilds.update({payload['id']: False})
+        old = self.client.guilds.get(payload['id'])
+        if old:
+            self.client.index.remove_guild(old)
+        self.client._set_guild(payload['id'], False)
 
     def on_guild_ban_add(self, payload):
         guild = self.client.guilds.get(payload.get("guild_id"))
@@ -370,9 +504,7 @@ class GatewayEventParser:
             return
 
         user_id = payload.get("user").get("id")
-        member = guild.members.get(user_id)
-        if member is not None:
-            del guild.members[user_id]
+        guild._remove_member(user_id, self.client.index)
 
     def on_guild_emojis_update(self, payload):
         guild = self.client.guilds.get(payload.get("guild_id"))
@@ -387,9 +519,9 @@ class GatewayEventParser:
             return
 
         del payload["guild_id"]
-        obj = Member(self.client, guild, payload)
+        obj = make_member(self.client, guild, payload)
 
-        guild.members.update({obj.id: obj})
+        guild._update_members({obj.user.id: obj}, self.client.index)
 
         return obj
 
@@ -398,7 +530,9 @@ class GatewayEventParser:
         if not guild:
             return
 
-        del guild.members[payload.get("user").get("id")]
+        guild._remove_member(
+            payload.get("user").get("id"), self.client.index
+        )
 
     def on_guild_member_update(self, payload):
         guild = self.client.guilds.get(payload.get("guild_id"))
@@ -408,7 +542,15 @@ class GatewayEventParser:
         user_id = payload.get("user").get("id")
         del payload["guild_id"]
         member = guild.members.get(user_id)
+        if member is None:
+            member = make_member(self.client, guild, payload)
+            guild._update_members({user_id: member}, self.client.index)
+            return
+
+        self.client.index.remove_member(member)
         member.__init__(self.client, guild, payload)
+        self.client.index.add_member(member)
+        guild.member_cache.added([user_id])
 
     def on_guild_members_chunk(self, payload):
         guild = self.client.guilds.get(payload.get("guild_id"))
@@ -417,10 +559,11 @@ class GatewayEventParser:
 
         memberobjs = payload.get("members")
         members = {
-            member["user"]["id"]: Member(self.client, guild, member)
+            member["user"]["id"]: make_member(self.client, guild, member)
             for member in memberobjs
         }
-        guild.members.update(members)
+        self.client.member_requester.on_chunk(payload, members)
+        guild._update_members(members, self.client.index)
 
     def on_message_create(self, payload):
         if payload.get("author") is None:
@@ -482,9 +625,16 @@ class GatewayEventParser:
             else:
                 channel = None
 
-            guild.voice_states.update(
-                {payload["member"]["user"]["id"]: channel}
-            )
+            user_id = payload["member"]["user"]["id"]
+            guild.voice_states.update({user_id: channel})
+
+            # Member in the voice states of GUILD_CREATE is only an id
+            member = payload["member"]
+            if channel is None:
+                guild._update_members({}, self.client.index)
+            elif "joined_at" in member and user_id not in guild.members:
+                member = make_member(self.client, guild, member)
+                guild._update_members({user_id: member}, self.client.index)
 
     def on_presence_update(self, payload):
         # Silencing frequent warning
@@ -20,22 +20,30 @@
 
 from .file import File
 from .user import User
-from .const import EMPTY
-from .member import Member
+from .const import EMPTY, LIB_NAME
+from .member import Member, make_member
 from .channel import get_channel
 from .util import clear_postdata
 from .dictobject import DictObject
 from .exceptions import DiscordHTTPError
 
 import base64
+import logging
+import threading
+from types import MappingProxyType
+from concurrent import futures
 
 __all__ = ["Guild"]
 
+logger = logging.getLogger(LIB_NAME)
+
+MEMBER_REQUEST_TIMEOUT = 10
+
 KEYLIST = [
     "id",
     "name",
     "icon",
-    "icon_hash?",
+    "icon_hash",
     "splash",
     "discovery_splash",
     "owner",
@@ -95,15 +103,8 @@ class Guild(DictObject):
     def __init__(self, client, data):
         super(Guild, self).__init__(data, KEYLIST)
         self.client = client
-
-        self.members = (
-            {
-                member["user"]["id"]: Member(client, self, member)
-                for member in self.members
-            }
-            if self.members is not None
-            else None
-        )
+        self.member_cache = client.member_cache()
+        self._members_lock = threading.Lock()
 
         self.channels = (
             {
@@ -114,17 +115,129 @@ class Guild(DictObject):
             else None
         )
 
-        self.voice_states = dict()
+        # Filled before members, for the member cache to know who's in voice
+        self.voice_states = {
+            state["user_id"]: self.channels.get(state["channel_id"])
+            for state in self.voice_states or ()
+            if self.channels is not None
+        }
+
+        if self.members is not None:
+            members = {
+                member["user"]["id"]: make_member(client, self, member)
+                for member in self.members
+            }
+            self.members = {}
+            self._update_members(members)
+
+    def _export_channels(self, channels):
+        return [channel.to_dict() for channel in channels.values()]
+
+    def _export_members(self, members):
+        return [member.to_dict() for member in members.values()]
+
+    def _export_voice_states(self, voice_states):
+        return [
+            {"user_id": user_id, "channel_id": channel.id}
+            for user_id, channel in voice_states.items()
+            if channel is not None
+        ]
+
+    def _export_presences(self, presences):
+        # Outdated as soon as they're received
+        return None
+
+    EXPORTERS = {
+        "channels": _export_channels,
+        "members": _export_members,
+        "voice_states": _export_voice_states,
+        "presences": _export_presences,
+    }
 
     def get_channels(self):
-        return self.channels.copy()
+        """Returns a read-only view of the channels.
+
+        .channels is never modified in place but replaced with an updated
+        copy, so the view stays unchanged and is safe to iterate while the
+        gateway thread updates the guild.
+        """
+        return MappingProxyType(self.channels)
 
     def get_channel(self, id_):
-        return self.get_channels().get(id_)
+        return self.channels.get(id_)
 
     def get_members(self):
-        if self.members is not None:
-            return self.members.copy()
+        """Returns a read-only view of the members.
+
+        .members is updated in place, as copying it for every member event
+        would be too slow for large guilds, so the view reflects the updates.
+        Iterate .copy() of the view rather than the view itself outside the
+        gateway thread, as members could be added while iterating.
+        """
+        if self.members is None:
+            return None
+        return MappingProxyType(self.members)
+
+    def _update_channels(self, channels):
+        self.channels = {**self.channels, **channels}
+
+    def _remove_channel(self, id_):
+        channels = self.channels.copy()
+        channel = channels.pop(id_, None)
+        self.channels = channels
+        return channel
+
+    def _update_members(self, members, index=None):
+        """Stores members admitted by .member_cache, then evicts members.
+
+        Args:
+            members:
+                dict mapping user id to Member.
+            index:
+                EntityIndex to be updated accordingly, if given.
+        """
+        cache = self.member_cache
+
+        with self._members_lock:
+            admitted = {
+                user_id: member for user_id, member in members.items()
+                if cache.admit(self, member)
+            }
+            replaced = [
+                self.members[user_id] for user_id in admitted
+                if user_id in self.members
+            ]
+            if admitted:
+                self.members.update(admitted)
+                cache.added(admitted)
+
+            evicted = [
+                self.members.pop(user_id)
+                for user_id in cache.evict(self, self.members)
+                if user_id in self.members
+            ]
+            if evicted:
+                cache.removed([member.user.id for member in evicted])
+
+        if index is not None:
+            for member in replaced:
+                index.remove_member(member)
+            for member in admitted.values():
+                index.add_member(member)
+            for member in evicted:
+                index.remove_member(member)
+
+    def _remove_member(self, id_, index=None):
+        with self._members_lock:
+            member = self.members.pop(id_, None)
+        if member is None:
+            return None
+
+        self.member_cache.removed([id_])
+
+        if index is not None:
+            index.remove_member(member)
+        return member
 
     def get_preview(self):
         return self.client.get_guild_preiew(self.id)
@@ -238,7 +351,36 @@ class Guild(DictObject):
     def modify_channel_positions(self, params={}):
         self._send_request("PATCH", "/channels", params)
 
-    def get_member(self, user):
+    def get_member(self, user, timeout=MEMBER_REQUEST_TIMEOUT):
+        """Returns the member from the cache, requesting it if missing.
+
+        Members missing from the cache are requested through the gateway,
+        batched with other lookups. HTTP request is used instead if it
+        couldn't be done, or didn't get answered within timeout.
+
+        Returns:
+            Member, or None if the user is not in the guild.
+        """
+        if isinstance(user, User):
+            user = user.id
+
+        member = self.members.get(user) if self.members else None
+        if member is not None and self.member_cache.accessed(user):
+            return member
+
+        requester = self.client.member_requester
+        if requester.can_request():
+            future = requester.request(self.id, user)
+            try:
+                return future.result(timeout)
+            # Not the builtin TimeoutError before Python 3.11
+            except futures.TimeoutError:
+                logger.warning("Member request for <%s> timed out! "
+                               "sending HTTP request...", user)
+
+        return self.fetch_member(user)
+
+    def fetch_member(self, user):
         if isinstance(user, User):
             user = user.id
         member = self._send_request("GET", f"/members/{user}")
@@ -18,23 +18,85 @@
 #    along with this program.  If not, see <https://www.gnu.org/licenses/>.
 #
 
-from queue import Queue
-from threading import Thread
+from .guild import Guild
+from .const import LIB_NAME
+
+import time
+import logging
+from itertools import count
+from queue import Queue, Full
+from threading import Thread, Lock
 
 __all__ = [
     "EventHandler", "GeneratorEventHandler", "MethodEventHandler",
     "DecoratorEventHandler", "ThreadedMethodEventHandler",
-    "ThreadedDecoratorEventHandler"
+    "ThreadedDecoratorEventHandler", "WorkerPool", "PooledEventHandlerMixin",
+    "PooledMethodEventHandler", "PooledDecoratorEventHandler"
 ]
 
+logger = logging.getLogger(LIB_NAME)
+
+OVERFLOW_DROP = "drop"
+OVERFLOW_BLOCK = "block"
+OVERFLOW_SHED = "shed"
+
+# Events which are fine to lose when the queue is full, with OVERFLOW_SHED
+SHEDDABLE_EVENTS = frozenset((
+    "TYPING_START",
+    "PRESENCE_UPDATE",
+    "MESSAGE_REACTION_ADD",
+    "MESSAGE_REACTION_REMOVE",
+    "MESSAGE_REACTION_REMOVE_ALL",
+    "MESSAGE_REACTION_REMOVE_EMOJI",
+    "INTEGRATION_UPDATE",
+))
+
+
+def get_guild_id(obj):
+    """Returns the id of the guild an event object belongs to, or None."""
+    if isinstance(obj, dict):
+        return obj.get("guild_id")
+    if isinstance(obj, Guild):
+        return obj.id
+
+    guild_id = getattr(obj, "guild_id", None)
+    if guild_id is None:
+        guild_id = getattr(getattr(obj, "guild", None), "id", None)
+    return guild_id
+
+
+def dispatches_methods(handle):
+    """Marks handle as only calling the .on_{event} methods of the handler.
+
+    Handlers derive the events they consume from the methods only if their
+    handle is marked, so that subclasses overriding handle to consume events
+    in some other way keep receiving every event.
+    """
+    handle.dispatches_methods = True
+    return handle
+
+
+def get_method_events(handler):
+    """Returns the names of the events handler has .on_{event} methods for."""
+    return frozenset(
+        name[3:].upper() for name in dir(handler) if name.startswith("on_")
+    )
+
 
 class EventHandler:
     """Base client for EventHandler.
 
     Attributes:
         self.client
+        events:
+            set of event names this handler consumes, or None to receive
+            every event. Events nobody consumes are dropped by the gateway
+            without being parsed, unless the gateway needs them itself to
+            keep its state up to date.
     """
 
+    events = None
+
     def __init__(self, client=None):
         self.client = None
         if client is not None:
@@ -74,6 +136,14 @@ class EventHandler:
         """
         raise NotImplementedError()
 
+    def get_events(self):
+        """Returns the set of events this handler consumes, or None for all.
+
+        Returns .events by default. Call .client.update_event_filter when the
+        result changes after the handler has been set.
+        """
+        return self.events
+
 
 class GeneratorEventHandler(EventHandler):
     """Handler to be used within terminal, or with a simple bot.
@@ -142,12 +212,24 @@ class MethodEventHandler(EventHandler):
     inherit this method or assign functions as attributes to use this.
     """
 
+    @dispatches_methods
     def handle(self, event, obj):
         method_name = f"on_{event.lower()}"
         handler = getattr(self, method_name, None)
         if handler is not None:
             handler(obj)
 
+    def get_events(self):
+        """Returns the events with .on_{event} defined, unless .events is set.
+
+        Returns None if .handle is overridden without dispatches_methods.
+        """
+        if self.events is not None:
+            return self.events
+        if not getattr(self.handle, "dispatches_methods", False):
+            return None
+        return get_method_events(self)
+
 
 class DecoratorEventHandler(EventHandler):
     """Handler to assign functions per events with decorator.
@@ -164,16 +246,21 @@ class DecoratorEventHandler(EventHandler):
     Other than decorator, This handler behaves similar to MethodEventHandler.
     """
 
+    @dispatches_methods
     def handle(self, event, obj):
         method_name = f"on_{event.lower()}"
         handler = getattr(self, method_name, None)
         if handler is not None:
             handler(obj, self)
 
+    get_events = MethodEventHandler.get_events
+
     def on(self, event):
         def decorator(func):
             method_name = f"on_{event.lower()}"
             setattr(self, method_name, func)
+            if self.client is not None:
+                self.client.update_event_filter()
             return func
 
         return decorator
@@ -192,6 +279,7 @@ class ThreadedMethodEventHandler(MethodEventHandler):
     implementing your own handler with appropriate safety measures in place.
     """
 
+    @dispatches_methods
     def handle(self, event, obj):
         method_name = f"on_{event.lower()}"
         handler = getattr(self, method_name, None)
@@ -206,8 +294,212 @@ class ThreadedDecoratorEventHandler(DecoratorEventHandler):
     too.
     """
 
+    @dispatches_methods
     def handle(self, event, obj):
         method_name = f"on_{event.lower()}"
         handler = getattr(self, method_name, None)
         if handler is not None:
             Thread(target=handler, args=(obj, self)).start()
+
+
+class WorkerPool:
+    """Runs event handlers on a fixed number of worker threads.
+
+    Every worker has its own queue, and events are assigned to a worker by
+    their guild id. Thus events from the same guild run in the order they
+    arrived, while events from different guilds run in parallel. Events
+    without a guild are spread over the workers in turn.
+
+    Attributes:
+        workers:
+            list of the worker threads.
+        overflow:
+            What to do when the queue of the worker is full. One of "drop",
+            which drops the event, "block", which blocks the gateway until
+            there's a room in the queue, or "shed", which drops the event if
+            it's in sheddable and blocks otherwise.
+        sheddable:
+            Set of event names to be dropped with "shed" overflow policy.
+        handled:
+            Number of events handled.
+        dropped:
+            Number of events dropped due to the full queue.
+        _queues:
+            list of the queues per worker.
+        _lock:
+            Lock for updating the metrics.
+    """
+
+    def __init__(
+        self,
+        workers=4,
+        maxsize=1000,
+        overflow=OVERFLOW_BLOCK,
+        sheddable=SHEDDABLE_EVENTS,
+        name="handler",
+    ):
+        """
+        Args:
+            workers:
+                Number of worker threads.
+            maxsize:
+                Maximum number of events queued per worker.
+            overflow:
+                same as .overflow attribute.
+            sheddable:
+                same as .sheddable attribute.
+            name:
+                Prefix for the name of the worker threads.
+        """
+        if overflow not in (OVERFLOW_DROP, OVERFLOW_BLOCK, OVERFLOW_SHED):
+            raise ValueError(f"Unknown overflow policy '{overflow}'")
+
+        self.overflow = overflow
+        self.sheddable = sheddable
+
+        self.handled = 0
+        self.dropped = 0
+        self._wait_total = 0
+        self._latency_total = 0
+        self._latency_max = 0
+        self._lock = Lock()
+        self._next = count()
+
+        self._queues = [Queue(maxsize) for _ in range(workers)]
+        self.workers = [
+            Thread(target=self._worker, args=(queue,),
+                   name=f"{name}_{index}", daemon=True)
+            for index, queue in enumerate(self._queues)
+        ]
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, event, obj, func, *args):
+        """Queues func(*args) to be run on the worker for obj's guild.
+
+        Returns:
+            False if the event has been dropped, True otherwise.
+        """
+        guild_id = get_guild_id(obj)
+        if guild_id is None:
+            index = next(self._next)
+        else:
+            index = hash(guild_id)
+        queue = self._queues[index % len(self._queues)]
+
+        item = (event, func, args, time.perf_counter())
+        block = self.overflow == OVERFLOW_BLOCK or (
+            self.overflow == OVERFLOW_SHED and event not in self.sheddable
+        )
+        try:
+            queue.put(item, block)
+        except Full:
+            with self._lock:
+                self.dropped += 1
+            logger.warning(f"Handler queue is full, dropping {event}.")
+            return False
+
+        return True
+
+    def stop(self):
+        """Stops the workers after they finish the queued events."""
+        for queue in self._queues:
+            queue.put(None)
+
+    def join(self, timeout=None):
+        for worker in self.workers:
+            worker.join(timeout)
+
+    def queue_depth(self):
+        """Returns the number of events waiting in each worker's queue."""
+        return [queue.qsize() for queue in self._queues]
+
+    def metrics(self):
+        """Returns a dict of queue depth, counters and latencies in seconds.
+
+        wait is the time events spent in the queue, and latency is the time
+        handlers took to run.
+        """
+        with self._lock:
+            handled = self.handled
+            return {
+                "queue_depth": sum(self.queue_depth()),
+                "handled": handled,
+                "dropped": self.dropped,
+                "wait_avg": self._wait_total / handled if handled else 0,
+                "latency_avg":
+                    self._latency_total / handled if handled else 0,
+                "latency_max": self._latency_max,
+            }
+
+    def _worker(self, queue):
+        while True:
+            item = queue.get()
+            if item is None:
+                return
+
+            event, func, args, queued = item
+            start = time.perf_counter()
+            try:
+                func(*args)
+            except Exception:
+                logger.exception(f"Exception occured while handling {event}.")
+            end = time.perf_counter()
+
+            with self._lock:
+                self.handled += 1
+                self._wait_total += start - queued
+                self._latency_total += end - start
+                if end - start > self._latency_max:
+                    self._latency_max = end - start
+
+
+class PooledEventHandlerMixin:
+    """Mixin which runs the handlers on .pool instead of the calling thread.
+
+    Falls back to the next handle in the MRO if .pool is None. Override
+    _get_args to change the arguments the handlers are called with.
+    """
+
+    def _get_args(self, obj):
+        return (obj,)
+
+    @dispatches_methods
+    def handle(self, event, obj):
+        if self.pool is None:
+            return super(PooledEventHandlerMixin, self).handle(event, obj)
+
+        method_name = f"on_{event.lower()}"
+        handler = getattr(self, method_name, None)
+        if handler is not None:
+            self.pool.submit(event, obj, handler, *self._get_args(obj))
+
+
+class PooledMethodEventHandler(PooledEventHandlerMixin, MethodEventHandler):
+    """Handler running methods on a WorkerPool.
+
+    Unlike ThreadedMethodEventHandler, the number of threads is fixed, and
+    events from the same guild are handled in order. Refer to WorkerPool for
+    the details.
+
+    Attributes:
+        pool:
+            WorkerPool to run the handlers on.
+    """
+
+    def __init__(self, client=None, pool=None):
+        super(PooledMethodEventHandler, self).__init__(client)
+        self.pool = pool if pool is not None else WorkerPool()
+
+
+class PooledDecoratorEventHandler(
+    PooledEventHandlerMixin, DecoratorEventHandler
+):
+    """Same as PooledMethodEventHandler, but decorator version."""
+
+    def __init__(self, client=None, pool=None):
+        super(PooledDecoratorEventHandler, self).__init__(client)
+        self.pool = pool if pool is not None else WorkerPool()
+
+    def _get_args(self, obj):
+        return (obj, self)
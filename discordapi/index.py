@@ -0,0 +1,91 @@
+#
+# NicoBot is Nicovideo Player bot for Discord, written from the scratch.
+# This file is part of NicoBot.
+#
+# Copyright (C) 2021 Wonjun Jung (KokoseiJ)
+#
+#    Nicobot is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+__all__ = ["EntityIndex"]
+
+
+class EntityIndex:
+    """Maps ids to the channels and users cached in every guild.
+
+    GatewayEventParser keeps this up to date as guilds, channels and members
+    get created, updated and removed, so that looking up an object by its id
+    doesn't require going through every guild.
+
+    Attributes:
+        channels:
+            dict mapping channel id to the channel object.
+        users:
+            dict mapping user id to the user object. A user in several guilds
+            stays in here until it gets removed from all of them.
+        _user_refs:
+            dict mapping user id to the number of guilds the user is in.
+    """
+
+    def __init__(self):
+        self.channels = {}
+        self.users = {}
+        self._user_refs = {}
+
+    def clear(self):
+        self.channels.clear()
+        self.users.clear()
+        self._user_refs.clear()
+
+    def add_guild(self, guild):
+        if guild.channels:
+            for channel in guild.channels.values():
+                self.add_channel(channel)
+        if guild.members:
+            for member in guild.members.values():
+                self.add_member(member)
+
+    def remove_guild(self, guild):
+        if guild.channels:
+            for channel in guild.channels.values():
+                self.remove_channel(channel)
+        if guild.members:
+            for member in guild.members.values():
+                self.remove_member(member)
+
+    def add_channel(self, channel):
+        self.channels[channel.id] = channel
+
+    def remove_channel(self, channel):
+        self.channels.pop(channel.id, None)
+
+    def add_member(self, member):
+        user = member.user
+        if user is None:
+            return
+
+        self.users[user.id] = user
+        self._user_refs[user.id] = self._user_refs.get(user.id, 0) + 1
+
+    def remove_member(self, member):
+        user = member.user
+        if user is None:
+            return
+
+        refs = self._user_refs.get(user.id, 0) - 1
+        if refs > 0:
+            self._user_refs[user.id] = refs
+        else:
+            self._user_refs.pop(user.id, None)
+            self.users.pop(user.id, None)
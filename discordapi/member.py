@@ -18,11 +18,11 @@
 #    along with this program.  If not, see <https://www.gnu.org/licenses/>.
 #
 
-from .user import User
+from .user import User, CompactUser
 from .const import EMPTY
 from .dictobject import DictObject
 
-__all__ = ["Member"]
+__all__ = ["make_member", "Member", "CompactMember"]
 
 KEYLIST = [
     "user",
@@ -37,14 +37,34 @@ KEYLIST = [
 ]
 
 
+def make_member(client, guild, data):
+    """Returns a member object to be stored in the cache.
+
+    CompactMember is used if client.compact is True, Member otherwise.
+    """
+    if client.compact:
+        return CompactMember(client, guild, data)
+    return Member(client, guild, data)
+
+
 class Member(DictObject):
+    __slots__ = (*KEYLIST, "client", "guild", "_json", "_keylist")
+
     def __init__(self, client, guild, data):
-        super(Member, self).__init__(data, KEYLIST)
         self.client = client
         self.guild = guild
+        super(Member, self).__init__(data, KEYLIST)
+
+    def _resolve_user(self):
+        user = self._json.get("user")
+        if user is not None:
+            return User(self.client, user)
 
-        if self.user is not None:
-            self.user = User(client, self.user)
+    def _export_user(self, user):
+        return user.to_dict()
+
+    RESOLVERS = {"user": _resolve_user}
+    EXPORTERS = {"user": _export_user}
 
     def modify(
         self, nick=EMPTY, roles=EMPTY, mute=EMPTY, deaf=EMPTY, channel_id=EMPTY
@@ -69,3 +89,22 @@ class Member(DictObject):
         tag = self.user.discriminator
         username_full = f"{username}#{tag}"
         return self._get_str(class_name, self.user.id, username_full)
+
+
+class CompactMember(Member):
+    """Member which doesn't keep the raw dict, for use in caches.
+
+    The raw dict is not kept unless keep_json is set to True, and the user
+    is constructed as CompactUser.
+    """
+
+    __slots__ = ()
+    lazy = False
+    keep_json = False
+
+    def _resolve_user(self):
+        user = self._json.get("user")
+        if user is not None:
+            return CompactUser(self.client, user)
+
+    RESOLVERS = {"user": _resolve_user}
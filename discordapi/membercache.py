@@ -0,0 +1,265 @@
+#
+# NicoBot is Nicovideo Player bot for Discord, written from the scratch.
+# This file is part of NicoBot.
+#
+# Copyright (C) 2021 Wonjun Jung (KokoseiJ)
+#
+#    Nicobot is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+from .const import LIB_NAME
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+__all__ = [
+    "MemberCache", "LRUMemberCache", "TTLMemberCache", "VoiceMemberCache",
+    "MemberRequester"
+]
+
+logger = logging.getLogger(LIB_NAME)
+
+GUILD_MEMBERS_INTENT = 1 << 1
+# REQUEST_GUILD_MEMBERS accepts up to 100 user ids at once
+MAX_USER_IDS = 100
+BATCH_DELAY = 0.05
+REQUEST_EXPIRE = 60
+
+
+class MemberCache:
+    """Policy deciding which members a guild keeps in .members.
+
+    An instance is created per guild, by calling the member_cache argument
+    of DiscordClient. This base class keeps every member, and the subclasses
+    override the methods below to bound the cache.
+    Methods are called from the gateway dispatch thread, except .accessed
+    which gets called from whichever thread looking up the member.
+    """
+
+    def admit(self, guild, member):
+        """Returns whether member should be stored."""
+        return True
+
+    def added(self, user_ids):
+        """Called with the ids of members which got stored or updated."""
+        pass
+
+    def removed(self, user_ids):
+        """Called with the ids of members which got removed."""
+        pass
+
+    def accessed(self, user_id):
+        """Called on cache hit. Returns False if the member is stale."""
+        return True
+
+    def evict(self, guild, members):
+        """Returns ids to be removed from members, the updated dict."""
+        return ()
+
+
+class LRUMemberCache(MemberCache):
+    """Keeps up to maxsize members, evicting the least recently used one."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._order = OrderedDict()
+        self._lock = threading.Lock()
+
+    def added(self, user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._order[user_id] = None
+                self._order.move_to_end(user_id)
+
+    def removed(self, user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._order.pop(user_id, None)
+
+    def accessed(self, user_id):
+        with self._lock:
+            if user_id in self._order:
+                self._order.move_to_end(user_id)
+        return True
+
+    def evict(self, guild, members):
+        with self._lock:
+            count = len(self._order) - self.maxsize
+            return [self._order.popitem(last=False)[0]
+                    for _ in range(max(count, 0))]
+
+
+class TTLMemberCache(MemberCache):
+    """Keeps members for ttl seconds since they were stored or updated."""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        # Insertion ordered, thus the oldest one comes first
+        self._stored = {}
+        self._lock = threading.Lock()
+
+    def added(self, user_ids):
+        now = time.monotonic()
+        with self._lock:
+            for user_id in user_ids:
+                self._stored.pop(user_id, None)
+                self._stored[user_id] = now
+
+    def removed(self, user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._stored.pop(user_id, None)
+
+    def accessed(self, user_id):
+        stored = self._stored.get(user_id)
+        return stored is not None and time.monotonic() - stored < self.ttl
+
+    def evict(self, guild, members):
+        deadline = time.monotonic() - self.ttl
+        expired = []
+        with self._lock:
+            for user_id, stored in self._stored.items():
+                if stored >= deadline:
+                    break
+                expired.append(user_id)
+            for user_id in expired:
+                del self._stored[user_id]
+        return expired
+
+
+class VoiceMemberCache(MemberCache):
+    """Keeps only the members connected to a voice channel."""
+
+    def admit(self, guild, member):
+        return guild.voice_states.get(member.user.id) is not None
+
+    def evict(self, guild, members):
+        voice_states = guild.voice_states
+        return [user_id for user_id in members
+                if voice_states.get(user_id) is None]
+
+
+class MemberRequester:
+    """Requests members missing from the cache through the gateway.
+
+    Lookups made within BATCH_DELAY seconds for the same guild are sent as a
+    single REQUEST_GUILD_MEMBERS, and GUILD_MEMBERS_CHUNK events answering it
+    are matched by the nonce.
+
+    Attributes:
+        client:
+            DiscordClient to send the request through.
+        _batches:
+            dict mapping guild id to the dict of user id and Future, waiting
+            to be sent.
+        _pending:
+            dict mapping nonce to the time it was sent and the dict of user id
+            and Future, waiting for the response.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self._batches = {}
+        self._pending = {}
+        self._nonce = 0
+        self._lock = threading.Lock()
+
+    def can_request(self):
+        """Returns whether a request could be answered.
+
+        Requesting by user ids requires GUILD_MEMBERS intent, and the answer
+        never arrives if the request is made from the dispatch thread since
+        it is the thread handling the answer.
+        """
+        client = self.client
+        return (
+            client.is_ready()
+            and client.intents & GUILD_MEMBERS_INTENT
+            and not client.in_dispatch_thread()
+        )
+
+    def request(self, guild_id, user_id):
+        """Returns a Future which resolves into Member, or None if not found.
+        """
+        with self._lock:
+            batch = self._batches.get(guild_id)
+            if batch is None:
+                batch = self._batches[guild_id] = {}
+                self.client._call(
+                    self.client.loop.call_later,
+                    BATCH_DELAY, self._flush, guild_id
+                )
+
+            future = batch.get(user_id)
+            if future is None:
+                future = batch[user_id] = Future()
+            if len(batch) < MAX_USER_IDS:
+                return future
+
+        self._flush(guild_id)
+        return future
+
+    def _flush(self, guild_id):
+        now = time.monotonic()
+        with self._lock:
+            batch = self._batches.pop(guild_id, None)
+            if not batch:
+                return
+
+            for nonce, (sent, _) in list(self._pending.items()):
+                if now - sent > REQUEST_EXPIRE:
+                    del self._pending[nonce]
+
+            self._nonce += 1
+            nonce = str(self._nonce)
+            self._pending[nonce] = (now, batch)
+
+        logger.debug(f"Requesting {len(batch)} members of {guild_id}")
+        self.client.request_guild_member(
+            guild_id, user_ids=list(batch), nonce=nonce
+        )
+
+    def on_chunk(self, payload, members):
+        """Resolves the lookups answered by a GUILD_MEMBERS_CHUNK event.
+
+        Args:
+            payload:
+                dict of the event.
+            members:
+                dict mapping user id to the Member constructed from the event.
+        """
+        nonce = payload.get("nonce")
+        if nonce is None:
+            return
+
+        last = payload.get("chunk_index", 0) + 1 >= payload.get(
+            "chunk_count", 1)
+        with self._lock:
+            entry = self._pending.get(nonce)
+            if entry is None:
+                return
+            batch = entry[1]
+            if last:
+                del self._pending[nonce]
+
+        for user_id, member in members.items():
+            future = batch.pop(user_id, None)
+            if future is not None:
+                future.set_result(member)
+        if last:
+            for future in batch.values():
+                future.set_result(None)
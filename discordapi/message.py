@@ -66,49 +66,62 @@ logger = logging.getLogger(LIB_NAME)
 
 class Message(DictObject):
     def __init__(self, client, data):
-        super(Message, self).__init__(data, KEYLIST)
         self.client = client
+        super(Message, self).__init__(data, KEYLIST)
 
-        if self.channel_id:
-            self.channel = client.get_channel(self.channel_id)
-            if self.channel is None:
-                logger.warning("Failed to locally retrieve channel <%s>! "
-                               "sending HTTP request...", self.channel_id)
-                self.channel = client.fetch_channel(self.channel_id)
-                if self.channel is None:
-                    raise DiscordError("Failed to retrieve channel "
-                                       f"<{self.channel_id}>")
-
-        if self.guild_id:
-            self.guild = client.get_guild(self.guild_id)
-            if self.guild is None:
-                logger.error("Failed to retrieve guild <%s>! ",
-                             self.guild_id)
-        else:
-            self.guild = None
-
-        if self.channel_id:
-            if self.guild is not None:
-                self.channel = self.guild.get_channel(self.channel_id)
-            else:
-                self.channel = client.get_channel(self.channel_id)
-            if self.channel is None:
-                logger.warning("Failed to locally retrieve channel <%s>! "
-                               "sending HTTP request...", self.channel_id)
-                self.channel = client.fetch_channel(self.channel_id)
-                if self.channel is None:
-                    raise DiscordError("Failed to retrieve channel "
-                                       f"<{self.channel_id}>")
-
-        if self.author is not None:
-            self.author = User(client, self.author)
-        if self.member is not None:
-            self.member = Member(client, self.guild, self.member)
-            self.member.user = self.author
-        if self.mentions is not None:
-            self.mentions = [User(client, user) for user in self.mentions]
-        if self.referenced_message is not None:
-            self.referenced_message = Message(client, self.referenced_message)
+    def _resolve_guild(self):
+        if not self.guild_id:
+            return None
+
+        guild = self.client.get_guild(self.guild_id)
+        if guild is None:
+            logger.error("Failed to retrieve guild <%s>! ", self.guild_id)
+        return guild
+
+    def _resolve_channel(self):
+        if not self.channel_id:
+            return None
+
+        channel = self.client.get_channel(self.channel_id)
+        if channel is None:
+            logger.warning("Failed to locally retrieve channel <%s>! "
+                           "sending HTTP request...", self.channel_id)
+            channel = self.client.fetch_channel(self.channel_id)
+            if channel is None:
+                raise DiscordError("Failed to retrieve channel "
+                                   f"<{self.channel_id}>")
+        return channel
+
+    def _resolve_author(self):
+        author = self._json.get("author")
+        if author is not None:
+            return User(self.client, author)
+
+    def _resolve_member(self):
+        member = self._json.get("member")
+        if member is not None:
+            member = Member(self.client, self.guild, member)
+            member.user = self.author
+        return member
+
+    def _resolve_mentions(self):
+        mentions = self._json.get("mentions")
+        if mentions is not None:
+            return [User(self.client, user) for user in mentions]
+
+    def _resolve_referenced_message(self):
+        message = self._json.get("referenced_message")
+        if message is not None:
+            return Message(self.client, message)
+
+    RESOLVERS = {
+        "guild": _resolve_guild,
+        "channel": _resolve_channel,
+        "author": _resolve_author,
+        "member": _resolve_member,
+        "mentions": _resolve_mentions,
+        "referenced_message": _resolve_referenced_message,
+    }
 
     def crosspost(self):
         self.channel.crosspost(self)
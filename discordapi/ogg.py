@@ -18,12 +18,49 @@
 #    along with this program.  If not, see <https://www.gnu.org/licenses/>.
 #
 
+from .const import LIB_NAME
+
+import zlib
 import struct
+import logging
+from itertools import accumulate
 
 __all__ = []
 
+logger = logging.getLogger(LIB_NAME)
+
 HEADER_STRUCT = struct.Struct("<BBQIIIB")
 
+CONTINUED = 0x01
+MAX_PAGE_SIZE = 4 + HEADER_STRUCT.size + 255 + 255 * 255
+CHECKSUM_OFFSET = 22
+
+_BITREVERSE = bytes(int(f"{x:08b}"[::-1], 2) for x in range(256))
+
+
+def ogg_crc(page):
+    """Calculates the Ogg page checksum of the given page.
+
+    Ogg uses the non-reflected CRC32 with polynomial 0x04c11db7, zero initial
+    value and no final XOR. zlib only implements the reflected variant, so the
+    bytes are bit-reversed beforehand and the result is bit-reversed back.
+    Passing 0xFFFFFFFF as a starting value cancels out zlib's initial XOR,
+    which keeps the whole calculation in C.
+
+    The checksum field of the page is treated as zero, as the spec requires.
+
+    Args:
+        page:
+            bytes-like object containing the whole page including the magic.
+
+    Returns:
+        Checksum as an integer.
+    """
+    data = bytearray(page).translate(_BITREVERSE)
+    data[CHECKSUM_OFFSET:CHECKSUM_OFFSET + 4] = bytes(4)
+    crc = zlib.crc32(data, 0xFFFFFFFF) ^ 0xFFFFFFFF
+    return int(f"{crc:032b}"[::-1], 2)
+
 
 class OggParser:
     """Yields packet from the Ogg filestream.
@@ -79,3 +116,221 @@ class OggParser:
                 packet = self.pipe.read(packet_size)
                 packet_size = 0
             yield packet
+
+
+class OggDemuxer:
+    """Yields packets from the Ogg filestream with as few copies as possible.
+
+    Unlike OggParser, this class reads the stream in large chunks into a
+    single reusable buffer and yields packets as memoryview slices of it,
+    rather than calling .read for every header, segment table and packet.
+    Packets spanning multiple pages are reassembled, and the checksum of every
+    page is verified- pages with mismatching checksum are dropped.
+
+    Yielded memoryview is only valid until the next packet is requested, since
+    the buffer gets overwritten afterwards. Convert it with bytes() if you have
+    to keep it around.
+
+    Attributes:
+        pipe:
+            Object with .readinto or .read method, same as OggParser.pipe.
+            .readinto1 is preferred if it exists so that a pipe doesn't block
+            until the whole buffer gets filled.
+        verify_crc:
+            bool indicating whether to verify the checksum of the pages.
+        crc_errors:
+            Integer tracking how many pages have been dropped so far due to
+            checksum mismatch.
+        _buf:
+            bytearray used as a buffer. its size never changes.
+        _view:
+            memoryview of _buf, used to slice out packets without copying.
+        _start:
+            Index of _buf where unconsumed data starts.
+        _end:
+            Index of _buf where unconsumed data ends.
+        _partial:
+            bytearray holding the packet continuing to the next page, or None.
+    """
+
+    def __init__(self, pipe, bufsize=1 << 17, verify_crc=True):
+        """
+        Args:
+            pipe:
+                same as .pipe attribute
+            bufsize:
+                Size of the buffer. it will be raised to the maximum size of
+                the Ogg page if it's smaller than that.
+            verify_crc:
+                same as .verify_crc attribute
+        """
+        self.pipe = pipe
+        self.verify_crc = verify_crc
+        self.crc_errors = 0
+
+        self._buf = bytearray(max(bufsize, MAX_PAGE_SIZE))
+        self._view = memoryview(self._buf)
+        self._start = 0
+        self._end = 0
+        self._partial = None
+
+        readinto = getattr(pipe, "readinto1", None)
+        if readinto is None:
+            readinto = getattr(pipe, "readinto", None)
+        self._readinto = readinto
+
+    def packet_iter(self):
+        """Yields packets, followed by b"" once the stream ends."""
+        while True:
+            page = self._next_page()
+            if page is None:
+                yield b""
+                return
+
+            flag, seg_table, offset, page_end = page
+            yield from self._page_packets(flag, seg_table, offset)
+            self._start = page_end
+
+    def _page_packets(self, flag, seg_table, offset):
+        """Returns an iterator of packets in the page located in the buffer."""
+        view = self._view
+        partial = self._partial
+        self._partial = None
+
+        if partial is None and not flag & CONTINUED and 255 not in seg_table:
+            # Every packet fits in a single segment, which is the usual case
+            # for Opus. Slice them out without looping in Python.
+            ends = list(accumulate(seg_table, initial=offset))
+            return map(view.__getitem__, map(slice, ends, ends[1:]))
+
+        if flag & CONTINUED:
+            # Continuation of a packet we never saw gets thrown away
+            drop_first = partial is None
+        else:
+            drop_first = False
+            if partial is not None:
+                logger.warning("Continued page expected, dropping packet.")
+                partial = None
+
+        packets = []
+        packet_start = offset
+
+        for table_value in seg_table:
+            offset += table_value
+            if table_value == 255:
+                continue
+
+            if drop_first:
+                drop_first = False
+            elif partial is not None:
+                partial += view[packet_start:offset]
+                packets.append(memoryview(partial))
+                partial = None
+            else:
+                packets.append(view[packet_start:offset])
+
+            packet_start = offset
+
+        # Last packet continues to the next page
+        if seg_table and seg_table[-1] == 255 and not drop_first:
+            if partial is None:
+                partial = bytearray()
+            partial += view[packet_start:offset]
+            self._partial = partial
+
+        return packets
+
+    def _next_page(self):
+        """Locates the next valid page in the buffer, reading if needed.
+
+        Returns:
+            None if the stream has ended, or a tuple of
+            (flag, segment table, body offset, page end).
+
+        Raises:
+            ValueError:
+                Raised if the page doesn't start with the Ogg magic.
+        """
+        header_size = 4 + HEADER_STRUCT.size
+
+        while True:
+            if not self._fill(header_size):
+                return None
+
+            start = self._start
+            if self._view[start:start + 4] != b"OggS":
+                raise ValueError("Invalid Ogg Header")
+
+            (
+                version,
+                flag,
+                granule_pos,
+                serial,
+                page_seq,
+                checksum,
+                page_seg,
+            ) = HEADER_STRUCT.unpack_from(self._buf, start + 4)
+
+            if not self._fill(header_size + page_seg):
+                return None
+            start = self._start
+            table_start = start + header_size
+            seg_table = self._buf[table_start:table_start + page_seg]
+
+            page_size = header_size + page_seg + sum(seg_table)
+            if not self._fill(page_size):
+                return None
+            start = self._start
+            page_end = start + page_size
+
+            if self.verify_crc:
+                crc = ogg_crc(self._view[start:page_end])
+                if crc != checksum:
+                    logger.warning(
+                        "Ogg page %d checksum mismatch, dropping page.",
+                        page_seq,
+                    )
+                    self.crc_errors += 1
+                    self._partial = None
+                    self._start = page_end
+                    continue
+
+            return flag, seg_table, start + header_size + page_seg, page_end
+
+    def _fill(self, size):
+        """Makes sure that at least size bytes are available in the buffer.
+
+        Unconsumed data gets moved to the beginning of the buffer if the
+        remaining space is not enough, which means that previously yielded
+        slices are not valid anymore after calling this method.
+
+        Returns:
+            bool indicating if the requested amount of data is available.
+            False means that the stream has ended.
+        """
+        if self._end - self._start >= size:
+            return True
+
+        if self._start + size > len(self._buf):
+            remaining = self._end - self._start
+            # Copied out first, as source and destination could overlap
+            tail = self._view[self._start:self._end].tobytes()
+            self._view[:remaining] = tail
+            self._start = 0
+            self._end = remaining
+
+        while self._end - self._start < size:
+            read = self._read(self._view[self._end:])
+            if not read:
+                return False
+            self._end += read
+
+        return True
+
+    def _read(self, view):
+        if self._readinto is not None:
+            return self._readinto(view)
+
+        data = self.pipe.read(len(view))
+        view[:len(data)] = data
+        return len(data)
@@ -18,19 +18,22 @@
 #    along with this program.  If not, see <https://www.gnu.org/licenses/>.
 #
 
-from .ogg import OggParser
+from .ogg import OggDemuxer
 from .util import StoppableThread
 from .voice import DiscordVoiceClient
+from .scheduler import VoiceScheduler, DELAY
 
 import time
 import logging
 import subprocess
-from threading import Event, Lock
+from collections import deque
+from threading import Thread, Event, Lock, Condition
 from subprocess import PIPE, DEVNULL
 
 __all__ = [
     "AudioSource",
     "FFMPEGAudioSource",
+    "PrefetchAudioSource",
     "AudioPlayer",
     "SingleAudioPlayer",
     "QueuedAudioPlayer",
@@ -38,8 +41,6 @@ __all__ = [
 
 SILENCE = b"\xf8\xff\xfe"
 
-DELAY = 20 / 1000
-
 logger = logging.getLogger("nicobot")
 
 
@@ -129,7 +130,7 @@ class FFMPEGAudioSource(AudioSource):
         self.gen = None
 
     def prepare(self):
-        """Starts FFMPEG process and initializes Ogg parser."""
+        """Starts FFMPEG process and initializes Ogg demuxer."""
         args = (
             [self.FFMPEG]
             + self.inputargs
@@ -139,12 +140,13 @@ class FFMPEGAudioSource(AudioSource):
         )
 
         self.proc = subprocess.Popen(args, stdout=PIPE, stderr=DEVNULL)
-        self.parser = OggParser(self.proc.stdout)
+        self.parser = OggDemuxer(self.proc.stdout)
         self.gen = self.parser.packet_iter()
 
     def read(self):
         try:
-            return next(self.gen)
+            # Packet is a view to the demuxer's buffer, which gets reused
+            return bytes(next(self.gen))
         except StopIteration:
             return None
 
@@ -152,6 +154,152 @@ class FFMPEGAudioSource(AudioSource):
         self.proc.kill()
 
 
+class PrefetchAudioSource(AudioSource):
+    """AudioSource that reads ahead from another source on a separate thread.
+
+    Reading from the source inline in the send loop means that any stall in
+    the source(e.g. ffmpeg waiting for the network) turns into a late packet.
+    This class wraps the source and keeps a bounded buffer of frames filled by
+    a producer thread, so that .read never blocks- when the buffer is empty,
+    it returns a frame of silence instead and counts it as an underrun.
+
+    Attributes not defined in this class are looked up from the wrapped
+    source, so it could be used in place of the source itself.
+
+    Attributes:
+        source:
+            AudioSource being wrapped.
+        maxlen:
+            Maximum amount of frames to be buffered.
+        prefill:
+            Amount of frames to buffer in .prepare before playing.
+        underruns:
+            Integer tracking how many times .read found the buffer empty.
+        overruns:
+            Integer tracking how many times the producer found the buffer full
+            and had to wait.
+        _buffer:
+            deque of prefetched frames.
+        _cond:
+            Condition used to wake up the producer and prefill waiters.
+        _finished:
+            bool indicating if the source has finished.
+        _thread:
+            StoppableThread running the producer.
+    """
+
+    def __init__(self, source, seconds=2, prefill=0.2):
+        """
+        Args:
+            source:
+                same as .source attribute
+            seconds:
+                Length of the audio to be buffered, in seconds.
+            prefill:
+                Length of the audio to buffer before playing, in seconds.
+        """
+        if not isinstance(source, AudioSource):
+            raise TypeError("Invalid Source Object.")
+
+        self.source = source
+        self.maxlen = max(1, int(seconds / DELAY))
+        self.prefill = min(self.maxlen, int(prefill / DELAY))
+
+        self.underruns = 0
+        self.overruns = 0
+
+        self._buffer = deque()
+        self._cond = Condition()
+        self._finished = False
+        self._thread = None
+
+    def __getattr__(self, name):
+        if name == "source":
+            raise AttributeError(name)
+        return getattr(self.source, name)
+
+    def prepare(self):
+        """Prepares the source, starts the producer and waits for prefill."""
+        self.source.prepare()
+
+        self._buffer.clear()
+        self._finished = False
+        self._thread = StoppableThread(
+            target=self._produce, name="prefetch_producer"
+        )
+        self._thread.start()
+
+        with self._cond:
+            self._cond.wait_for(
+                lambda: len(self._buffer) >= self.prefill or self._finished,
+                timeout=5,
+            )
+
+    def read(self):
+        try:
+            data = self._buffer.popleft()
+        except IndexError:
+            with self._cond:
+                finished = self._finished
+            if not finished:
+                self.underruns += 1
+                return SILENCE
+            # The last frame could have been appended before finishing
+            try:
+                data = self._buffer.popleft()
+            except IndexError:
+                return b""
+
+        with self._cond:
+            self._cond.notify_all()
+
+        return data
+
+    def buffered(self):
+        """Returns the amount of frames currently buffered."""
+        return len(self._buffer)
+
+    def cleanup(self):
+        if self._thread is not None:
+            self._thread.stop()
+            with self._cond:
+                self._cond.notify_all()
+
+        # Killing the source also unblocks the producer waiting on .read
+        self.source.cleanup()
+
+        if self._thread is not None:
+            self._thread.join(1)
+            self._thread = None
+        self._buffer.clear()
+
+    def _produce(self):
+        stop_flag = self._thread.stop_flag
+        buffer = self._buffer
+
+        try:
+            while not stop_flag.is_set():
+                data = self.source.read()
+                if not data:
+                    break
+
+                with self._cond:
+                    if len(buffer) >= self.maxlen:
+                        self.overruns += 1
+                        self._cond.wait_for(
+                            lambda: len(buffer) < self.maxlen
+                            or stop_flag.is_set()
+                        )
+                    buffer.append(data)
+                    self._cond.notify_all()
+        except Exception:
+            logger.exception("Exception occured while prefetching the source.")
+        finally:
+            with self._cond:
+                self._finished = True
+                self._cond.notify_all()
+
+
 class AudioPlayer(StoppableThread):
     """Player to play AudioSource to given VoiceClient.
 
@@ -162,6 +310,9 @@ class AudioPlayer(StoppableThread):
     This player inherits StoppableThread, will run on a separate thread, and is
     able to be stopped by calling .stop method.
 
+    If VoiceScheduler is set, the player won't start its own thread- the
+    scheduler will poll the player for packets and pace them instead.
+
     Attributes:
         client:
             DiscordVoiceClient to play to.
@@ -169,6 +320,8 @@ class AudioPlayer(StoppableThread):
             Source to play with.
         callback:
             Function to be called after the source finishes.
+        scheduler:
+            VoiceScheduler to send packets with, or None to use own thread.
         _resumed:
             Event indicating if the player has been paused or not.
         _ready:
@@ -176,6 +329,9 @@ class AudioPlayer(StoppableThread):
         _sent_silence:
             bool indicating if the five frame of silence has been played after
             the player pauses playing.
+        _silence_frames:
+            Integer tracking how many frames of silence have been played by
+            the scheduler after the player pauses playing.
         loop:
             Integer tracking how many packets have been sent so far, to
             determine when to send the next packet.
@@ -184,7 +340,9 @@ class AudioPlayer(StoppableThread):
             when to send the next packet.
     """
 
-    def __init__(self, client=None, source=None, callback=None):
+    def __init__(
+        self, client=None, source=None, callback=None, scheduler=None
+    ):
         """Initializes player.
 
         Args:
@@ -195,11 +353,14 @@ class AudioPlayer(StoppableThread):
             callback:
                 A function to be called after the song finishes playing. this
                 function receives a single argument which is player object.
+            scheduler:
+                VoiceScheduler to send packets with.
         """
         super(AudioPlayer, self).__init__()
         self.client = None
         self.source = None
         self.callback = None
+        self.scheduler = None
         self._spoken = False
 
         self._lock = Lock()
@@ -207,6 +368,7 @@ class AudioPlayer(StoppableThread):
         self._resumed = Event()
         self._ready = Event()
         self._sent_silence = False
+        self._silence_frames = 0
 
         self.loop = 0
         self.start_time = 0
@@ -217,6 +379,8 @@ class AudioPlayer(StoppableThread):
             self.set_source(source)
         if callback is not None:
             self.set_callback(callback)
+        if scheduler is not None:
+            self.set_scheduler(scheduler)
 
     def set_client(self, client):
         """Sets client. Also checks if client is in the right type."""
@@ -239,6 +403,13 @@ class AudioPlayer(StoppableThread):
         else:
             raise TypeError("Invalid callback object.")
 
+    def set_scheduler(self, scheduler):
+        """Sets scheduler. Also checks if scheduler is in the right type."""
+        if isinstance(scheduler, VoiceScheduler):
+            self.scheduler = scheduler
+        else:
+            raise TypeError("Invalid scheduler object.")
+
     def play(self, source=None):
         """Starts playing the source.
 
@@ -261,8 +432,7 @@ class AudioPlayer(StoppableThread):
             self._prepare_play()
             self._ready.set()
 
-            if not self.is_alive():
-                self.start()
+            self._start_sending()
 
     def stop(self):
         with self._lock:
@@ -278,11 +448,21 @@ class AudioPlayer(StoppableThread):
         with self._lock:
             self._prepare_play()
             self._resumed.set()
+            if self.scheduler is not None and self._ready.is_set():
+                self.scheduler.add(self)
+
+    def _start_sending(self):
+        """Starts the thread, or hands the player over to the scheduler."""
+        if self.scheduler is not None:
+            self.scheduler.add(self)
+        elif not self.is_alive():
+            self.start()
 
     def _prepare_play(self):
         """Initializes needed attributes to start playing."""
         self.loop = 0
         self._sent_silence = False
+        self._silence_frames = 0
         self._spoken = False
         self.start_time = None
         self._resumed.set()
@@ -336,6 +516,58 @@ class AudioPlayer(StoppableThread):
         delay = max(0, wait_until - time.perf_counter())
         time.sleep(delay)
 
+    def _poll(self):
+        """Returns the next packet to be sent by the scheduler.
+
+        This is the non-blocking counterpart of .run method, which gets called
+        by the VoiceScheduler every 20ms.
+
+        Returns:
+            Packet to be sent, or None if the player has nothing to send. The
+            scheduler stops polling the player when None is returned, so the
+            player has to add itself back to the scheduler when needed.
+        """
+        if self.stop_flag.is_set() or not self._ready.is_set():
+            return None
+
+        if not self._resumed.is_set():
+            if self._sent_silence:
+                return None
+            # Sends 5 frame of silence as indicated in docs
+            self._silence_frames += 1
+            if self._silence_frames >= 5:
+                self._sent_silence = True
+            return self._get_packet(SILENCE)
+
+        if not self.client.is_ready():
+            self._prepare_play()
+            self.scheduler.add(self, time.perf_counter() + 1)
+            return None
+
+        data = self.source.read()
+
+        if not data:
+            # Callback or preparing the next source could take a while
+            Thread(
+                target=self._finish_scheduled, name=f"{self.name}_finish"
+            ).start()
+            return None
+
+        return self._get_packet(data)
+
+    def _get_packet(self, data):
+        if not self._spoken:
+            self.client.speak(1)
+            self._spoken = True
+            self.start_time = time.perf_counter()
+        self.loop += 1
+        return data
+
+    def _finish_scheduled(self):
+        self._source_is_finished()
+        if self._ready.is_set():
+            self._start_sending()
+
     def _source_is_finished(self):
         self.client.speak(0)
         self._ready.clear()
@@ -360,8 +592,12 @@ class QueuedAudioPlayer(AudioPlayer):
     called again to resume playing.
     """
 
-    def __init__(self, client=None, source=None, callback=None):
-        super(QueuedAudioPlayer, self).__init__(client, source, callback)
+    def __init__(
+        self, client=None, source=None, callback=None, scheduler=None
+    ):
+        super(QueuedAudioPlayer, self).__init__(
+            client, source, callback, scheduler
+        )
         self.queue = []
 
     def set_source(self, source):
@@ -397,8 +633,7 @@ class QueuedAudioPlayer(AudioPlayer):
             self._prepare_play()
             self._ready.set()
 
-            if not self.is_alive():
-                self.start()
+            self._start_sending()
 
     def _source_is_finished(self):
         super()._source_is_finished()
@@ -20,73 +20,321 @@
 
 from .const import LIB_NAME
 
+import re
 import time
 import logging
+from collections import deque
+from threading import Condition, Lock
 
-__all__ = ["RateLimitHandler"]
+__all__ = ["RateLimitHandler", "RateLimitBucket", "GlobalRateLimit"]
 
 logger = logging.getLogger(LIB_NAME)
 
+GLOBAL_LIMIT = 50
+GLOBAL_PERIOD = 1
+
+# Limits are counted separately for each of these ids in the route
+_MAJOR_PARAM = re.compile(r"^/(?:channels|guilds|webhooks)/\d+")
+_ID = re.compile(r"/\d+")
+
+
+class RateLimitBucket:
+    """Tokens of a rate limit bucket, for a value of the major parameter.
+
+    Requests take a token in the order they arrived, waiting for the reset
+    when there's none left. Until the first response tells the limit, a
+    single request is let through at a time.
+
+    Every refill starts a new window. Responses to requests sent in an
+    earlier window are only used to count the request as done, as their
+    headers describe a window that has already passed.
+
+    Attributes:
+        limit:
+            Number of requests allowed in a window, or None if unknown.
+        remaining:
+            Number of requests which could still be sent in this window.
+        reset_at:
+            time.monotonic() value at which the window resets, or None if
+            unknown.
+        inflight:
+            Number of requests sent without a response yet.
+        window:
+            Number of the current window.
+        _waiters:
+            deque of the requests waiting for a token, in the order they
+            arrived.
+        _cond:
+            Condition for waiting on the tokens.
+    """
 
-class RateLimitHandler:
     def __init__(self):
-        self.bucket_map = {}
-        self.limit_list = {}
-        self.global_limit = None
-        # Locks are removed since most of the major python implements have
-        # thread-safe dict implementation.
+        self.limit = None
+        self.remaining = 1
+        self.reset_at = None
+        self.inflight = 0
+        self.window = 0
 
-    def register_bucket(self, route, bucket):
-        route = self.uniformize_route(route)
-        self.bucket_map.update({route: bucket})
+        self._waiters = deque()
+        self._cond = Condition(Lock())
 
-    def uniformize_route(self, route):
-        return route if route.startswith("/") else f"/{route}"
+    def _get_wait(self):
+        # 0 to go now, None to wait for a response, seconds otherwise
+        now = time.monotonic()
+        if self.reset_at is not None and now >= self.reset_at:
+            self.reset_at = None
+            self.window += 1
+            if self.limit is not None:
+                # Requests still in flight might be counted in this window
+                self.remaining = max(self.limit - self.inflight, 0)
 
-    def get_route(self, route):
-        route = self.uniformize_route(route)
-        if route in self.bucket_map:
-            return self.bucket_map.get(route)
+        if self.limit is None:
+            return 0 if self.inflight == 0 else None
+        if self.remaining > 0:
+            return 0
+        if self.reset_at is None:
+            return None
+        return self.reset_at - now
 
-    def update(self, route, data):
-        bucket = data.get("x-ratelimit-bucket")
+    def acquire(self):
+        """Waits for a token and takes it.
 
-        if bucket is not None:
-            self.register_bucket(route, bucket)
+        Returns:
+            The window the token was taken in, to be passed to .release.
+        """
+        with self._cond:
+            ticket = object()
+            self._waiters.append(ticket)
+            try:
+                while True:
+                    wait = None
+                    if self._waiters[0] is ticket:
+                        wait = self._get_wait()
+                        if wait == 0:
+                            break
+                    self._cond.wait(wait)
+            finally:
+                self._waiters.remove(ticket)
 
-        self.limit_list.update({bucket: data})
+            self.inflight += 1
+            self.remaining -= 1
+            self._cond.notify_all()
+            return self.window
 
-        if data.get("x-ratelimit-global"):
-            self.global_limit = float(data.get("x-ratelimit-reset"))
-            logger.warning(
-                "You're globally rate limited until %d!", self.global_limit)
+    def release(self, window, headers=None, retry_after=None):
+        """Counts the request as done, updating the limit from the response.
 
-    def check_global(self):
-        if self.global_limit:
-            self.wait_until(self.global_limit)
-            self.global_limit = None
+        Args:
+            window:
+                Window returned by .acquire.
+            headers:
+                dict of the response headers with lowercased names, or None
+                if no response has been received.
+            retry_after:
+                Seconds to wait as told by a 429 response, or None.
+        """
+        with self._cond:
+            self.inflight -= 1
+            now = time.monotonic()
 
-    def get_data(self, route):
-        data = self.limit_list.get(route)
+            if retry_after is not None:
+                self.remaining = 0
+                reset_at = now + retry_after
+                if self.reset_at is None or reset_at > self.reset_at:
+                    self.reset_at = reset_at
 
-        if data and time.time() > float(data.get("x-ratelimit-reset")):
-            self.limit_list.update({route: None})
-            return None
+            elif (
+                headers and "x-ratelimit-limit" in headers
+                and window == self.window
+            ):
+                limit = int(headers["x-ratelimit-limit"])
+                remaining = int(headers["x-ratelimit-remaining"])
+                reset_at = now + float(headers["x-ratelimit-reset-after"])
+
+                # Other requests in flight may not be counted in remaining
+                remaining = max(remaining - self.inflight, 0)
+                if self.limit is None:
+                    self.remaining = remaining
+                else:
+                    self.remaining = min(self.remaining, remaining)
+                self.limit = limit
+                if self.reset_at is None or reset_at > self.reset_at:
+                    self.reset_at = reset_at
+
+            elif self.limit is None:
+                # No limit on this route, or the request failed
+                self.remaining = max(self.remaining, 1)
+
+            self._cond.notify_all()
+
+
+class GlobalRateLimit:
+    """Limits the number of requests per period across every route.
+
+    A request takes up its slot from when it's sent until period seconds
+    after its response arrives. Since the response arrives after the
+    request has been counted by the server, no more than limit requests
+    reach the server in any period.
+
+    Attributes:
+        limit:
+            Number of requests allowed in a period.
+        period:
+            Length of the period in seconds.
+        inflight:
+            Number of requests sent without a response yet.
+        paused_until:
+            time.monotonic() value until which every request waits, after a
+            global rate limit has been hit.
+        _done:
+            deque of the times at which slots of done requests get freed.
+        _cond:
+            Condition for waiting on the slots.
+    """
+
+    def __init__(self, limit=GLOBAL_LIMIT, period=GLOBAL_PERIOD):
+        self.limit = limit
+        self.period = period
+        self.inflight = 0
+        self.paused_until = None
+
+        self._done = deque()
+        self._cond = Condition(Lock())
+
+    def acquire(self):
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                while self._done and self._done[0] <= now:
+                    self._done.popleft()
+
+                if self.paused_until is not None and now < self.paused_until:
+                    wait = self.paused_until - now
+                elif self.inflight + len(self._done) < self.limit:
+                    break
+                elif self._done:
+                    wait = self._done[0] - now
+                else:
+                    wait = None
+                self._cond.wait(wait)
+
+            self.inflight += 1
+
+    def release(self):
+        with self._cond:
+            self.inflight -= 1
+            self._done.append(time.monotonic() + self.period)
+            self._cond.notify()
+
+    def pause(self, seconds):
+        """Stops every request for seconds, after a global 429."""
+        with self._cond:
+            self.paused_until = time.monotonic() + seconds
+            logger.warning(f"Globally rate limited for {seconds:.2f}s!")
+
+
+class RateLimitHandler:
+    """Keeps requests within the rate limits, before they are hit.
+
+    Routes are mapped to their bucket as told by X-RateLimit-Bucket, and
+    each bucket is tracked separately per major parameter- the channel,
+    guild or webhook id the route starts with. Until a bucket is known, the
+    route itself is used as one.
+
+    Call .acquire before sending a request, and .release with its response.
+
+    Attributes:
+        global_limit:
+            GlobalRateLimit shared by every request.
+        bucket_map:
+            dict mapping a route to its bucket.
+        buckets:
+            dict of RateLimitBucket per (bucket, major parameter).
+        _lock:
+            Lock for creating the buckets.
+    """
+
+    def __init__(self, global_limit=GLOBAL_LIMIT, global_period=GLOBAL_PERIOD):
+        self.global_limit = GlobalRateLimit(global_limit, global_period)
+        self.bucket_map = {}
+        self.buckets = {}
+        self._lock = Lock()
+
+    @staticmethod
+    def split_route(method, route):
+        """Returns the route without ids, and the major parameter of it."""
+        path = route.partition("?")[0]
+        if not path.startswith("/"):
+            path = f"/{path}"
+
+        match = _MAJOR_PARAM.match(path)
+        major = match.group() if match is not None else None
+        return f"{method} {_ID.sub('/{id}', path)}", major
+
+    def get_bucket(self, method, route):
+        route, major = self.split_route(method, route)
+        key = (self.bucket_map.get(route, route), major)
+
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            with self._lock:
+                bucket = self.buckets.setdefault(key, RateLimitBucket())
+        return bucket
+
+    def acquire(self, method, route):
+        """Waits until the request could be sent without hitting a limit.
+
+        Returns:
+            Ticket to be passed to .release.
+        """
+        bucket = self.get_bucket(method, route)
+        window = bucket.acquire()
+        self.global_limit.acquire()
+        return bucket, window
+
+    def release(self, method, route, ticket, headers=None, body=None):
+        """Updates the limits from the response of the request.
 
-        return data
+        Args:
+            method:
+                HTTP method of the request.
+            route:
+                Route of the request.
+            ticket:
+                Ticket returned by .acquire.
+            headers:
+                dict of the response headers with lowercased names, or None
+                if the request failed without a response.
+            body:
+                Decoded body of the response if it was 429, for the
+                retry_after in it.
 
-    def check(self, route):
-        self.check_global()
+        Returns:
+            Seconds to wait before retrying if the response was 429, None
+            otherwise.
+        """
+        bucket, window = ticket
+        self.global_limit.release()
 
-        route = self.get_route(route)
-        data = self.get_data(route)
+        headers = headers or {}
+        retry_after = None
+        if body is not None:
+            retry_after = float(body.get("retry_after", 1))
+            if body.get("global") or headers.get("x-ratelimit-global"):
+                self.global_limit.pause(retry_after)
+                bucket.release(window, headers)
+                return retry_after
 
-        if data and data.get("x-ratelimit-remaining") == "0":
-            reset_time = float(data.get("x-ratelimit-reset"))
-            logger.warning(
-                "You're rate limited in %s until %f!", route, reset_time)
-            self.wait_until(reset_time)
-            self.limit_list.update({route: None})
+        name = headers.get("x-ratelimit-bucket")
+        if name is not None:
+            route, _ = self.split_route(method, route)
+            if self.bucket_map.get(route) != name:
+                # Carry the state over to the bucket for every major
+                with self._lock:
+                    self.bucket_map[route] = name
+                    for (key, major), state in list(self.buckets.items()):
+                        if key == route:
+                            self.buckets.setdefault((name, major), state)
 
-    def wait_until(self, until):
-        time.sleep(max(until - time.time(), 0))
+        bucket.release(window, headers, retry_after)
+        return retry_after
@@ -0,0 +1,314 @@
+#
+# NicoBot is Nicovideo Player bot for Discord, written from the scratch.
+# This file is part of NicoBot.
+#
+# Copyright (C) 2021 Wonjun Jung (KokoseiJ)
+#
+#    Nicobot is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+from .const import LIB_NAME
+from .handler import get_method_events
+from .ratelimit import RateLimitHandler
+from .exceptions import DiscordHTTPError
+from .codec import json_loads, json_dumps
+
+import re
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+__all__ = ["ResponseCache"]
+
+logger = logging.getLogger(LIB_NAME)
+
+_TRAILING_ID = re.compile(r"/\d+$")
+
+
+class ResponseCache:
+    """Caches the responses of GET requests to the HTTP API.
+
+    Responses are kept per route for the TTL of the route, 404s as well for
+    negative_ttl. Concurrent requests to the same route are sent only once,
+    with the others waiting for its response.
+
+    Responses are kept encoded, and every caller gets a newly decoded copy,
+    so callers modifying the response don't change it for the others.
+
+    Entries are invalidated by the gateway events changing them- refer to
+    the on_{event} methods, and by the requests modifying them, which
+    invalidate everything under the major parameter of the route. e.g. PATCH
+    /guilds/1/roles/2 invalidates every cached route under /guilds/1.
+
+    Attributes:
+        ttls:
+            dict of route templates and their TTL in seconds, where ids in
+            the route are replaced to {id}- e.g. "/guilds/{id}/roles".
+            The TTL applies to the routes under the template as well,
+            unless they have one of their own. Routes with the TTL of 0
+            aren't cached.
+        default_ttl:
+            TTL of the routes missing in ttls.
+        negative_ttl:
+            TTL of 404 responses.
+        maxsize:
+            Number of the responses to keep, least recently used ones get
+            evicted first.
+        events:
+            set of events invalidating the entries, the gateway keeps
+            dispatching them even if no handler consumes them.
+        _entries:
+            OrderedDict mapping route to tuple of (expires, data, error) in
+            the order of use, where data is the encoded response.
+        _inflight:
+            dict mapping route to the Future of the encoded response of the
+            request being sent.
+        _stale:
+            set of the routes in _inflight invalidated while being sent.
+        _lock:
+            Lock for the attributes above.
+    """
+
+    # Messages and their reactions change without an event consuming them,
+    # unless handled
+    DEFAULT_TTLS = {
+        "/channels/{id}/messages": 0,
+        "/channels/{id}/pins": 0,
+        "/gateway/bot": 0,
+    }
+
+    def __init__(
+        self, ttls=None, default_ttl=60, negative_ttl=10, maxsize=1024
+    ):
+        self.ttls = dict(self.DEFAULT_TTLS)
+        if ttls is not None:
+            self.ttls.update(ttls)
+        self.default_ttl = default_ttl
+        self.negative_ttl = negative_ttl
+        self.maxsize = maxsize
+        self.events = get_method_events(self)
+
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._stale = set()
+        self._lock = threading.Lock()
+
+    def get_ttl(self, route):
+        template = RateLimitHandler.split_route("GET", route)[0][4:]
+        while template:
+            ttl = self.ttls.get(template)
+            if ttl is not None:
+                return ttl
+            template = template.rpartition("/")[0]
+        return self.default_ttl
+
+    def fetch(self, route, request):
+        """Returns the cached response of route, or requests it.
+
+        Args:
+            route:
+                API route of the GET request- e.g. /guilds/1/roles.
+            request:
+                Callable sending the request, returning tuple of (value,
+                cacheable) where cacheable tells if the value is a
+                successful response. DiscordHTTPError with 404 gets cached.
+
+        Raises:
+            DiscordHTTPError:
+                if request raised it, or a cached 404.
+        """
+        if not route.startswith("/"):
+            route = f"/{route}"
+
+        ttl = self.get_ttl(route)
+        if ttl <= 0:
+            return request()[0]
+
+        with self._lock:
+            entry = self._entries.get(route)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(route)
+                else:
+                    del self._entries[route]
+                    entry = None
+
+            if entry is None:
+                future = self._inflight.get(route)
+                if future is not None:
+                    owner = False
+                else:
+                    owner = True
+                    future = self._inflight[route] = Future()
+
+        if entry is not None:
+            _, data, error = entry
+            if error is not None:
+                raise error
+            return json_loads(data)
+
+        if not owner:
+            return json_loads(future.result())
+
+        try:
+            value, cacheable = request()
+        except DiscordHTTPError as e:
+            if getattr(e.response, "status", None) == 404:
+                self._store(route, self.negative_ttl, None, e)
+            else:
+                self._store(route, 0)
+            future.set_exception(e)
+            raise
+        except BaseException as e:
+            self._store(route, 0)
+            future.set_exception(e)
+            raise
+
+        data = json_dumps(value)
+        self._store(route, ttl if cacheable else 0, data)
+        future.set_result(data)
+        return value
+
+    def _store(self, route, ttl, data=None, error=None):
+        with self._lock:
+            del self._inflight[route]
+            if route in self._stale:
+                self._stale.discard(route)
+                return
+            if ttl <= 0:
+                return
+
+            self._entries[route] = (time.monotonic() + ttl, data, error)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, route, children=True):
+        """Drops the cached responses of route.
+
+        Args:
+            route:
+                API route without the query string- e.g. /guilds/1. Every
+                query string of it is invalidated.
+            children:
+                Whether to invalidate the routes under route as well- e.g.
+                /guilds/1/roles for /guilds/1.
+        """
+        prefixes = (f"{route}?", f"{route}/") if children else (f"{route}?",)
+
+        with self._lock:
+            routes = [
+                key for key in self._entries
+                if key == route or key.startswith(prefixes)
+            ]
+            for key in routes:
+                del self._entries[key]
+
+            self._stale.update(
+                key for key in self._inflight
+                if key == route or key.startswith(prefixes)
+            )
+
+        if routes:
+            logger.debug(f"Invalidated {len(routes)} responses of {route}.")
+
+    def invalidate_request(self, method, route):
+        """Invalidates what a request other than GET could have modified."""
+        path = route.partition("?")[0]
+        if not path.startswith("/"):
+            path = f"/{path}"
+
+        major = RateLimitHandler.split_route(method, path)[1]
+        if major is None:
+            major = _TRAILING_ID.sub("", path)
+        self.invalidate(major)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._stale.update(self._inflight)
+
+    def handle_event(self, event, payload):
+        """Invalidates the responses changed by the gateway event."""
+        handler = getattr(self, f"on_{event.lower()}", None)
+        if handler is not None and payload is not None:
+            handler(payload)
+
+    def on_guild_update(self, payload):
+        self.invalidate(f"/guilds/{payload['id']}", children=False)
+
+    def on_guild_delete(self, payload):
+        self.invalidate(f"/guilds/{payload['id']}")
+
+    def on_guild_role_create(self, payload):
+        self.invalidate(f"/guilds/{payload['guild_id']}/roles")
+
+    def on_guild_role_update(self, payload):
+        self.on_guild_role_create(payload)
+
+    def on_guild_role_delete(self, payload):
+        self.on_guild_role_create(payload)
+
+    def on_guild_emojis_update(self, payload):
+        self.invalidate(f"/guilds/{payload['guild_id']}/emojis")
+
+    def on_guild_ban_add(self, payload):
+        self.invalidate(f"/guilds/{payload['guild_id']}/bans")
+
+    def on_guild_ban_remove(self, payload):
+        self.on_guild_ban_add(payload)
+
+    def on_guild_member_add(self, payload):
+        guild_id = payload["guild_id"]
+        self.invalidate(f"/guilds/{guild_id}/members", children=False)
+        self.invalidate(
+            f"/guilds/{guild_id}/members/{payload['user']['id']}"
+        )
+
+    def on_guild_member_update(self, payload):
+        self.on_guild_member_add(payload)
+
+    def on_guild_member_remove(self, payload):
+        self.on_guild_member_add(payload)
+
+    def on_channel_create(self, payload):
+        guild_id = payload.get("guild_id")
+        if guild_id is not None:
+            self.invalidate(f"/guilds/{guild_id}/channels")
+
+    def on_channel_update(self, payload):
+        self.on_channel_create(payload)
+        self.invalidate(f"/channels/{payload['id']}", children=False)
+
+    def on_channel_delete(self, payload):
+        self.on_channel_create(payload)
+        self.invalidate(f"/channels/{payload['id']}")
+
+    def on_invite_create(self, payload):
+        self.invalidate(f"/channels/{payload['channel_id']}/invites")
+        guild_id = payload.get("guild_id")
+        if guild_id is not None:
+            self.invalidate(f"/guilds/{guild_id}/invites")
+
+    def on_invite_delete(self, payload):
+        self.on_invite_create(payload)
+
+    def on_webhooks_update(self, payload):
+        self.invalidate(f"/channels/{payload['channel_id']}/webhooks")
+        self.invalidate(f"/guilds/{payload['guild_id']}/webhooks")
+
+    def on_user_update(self, payload):
+        self.invalidate("/users/@me", children=False)
+        self.invalidate(f"/users/{payload['id']}", children=False)
@@ -0,0 +1,206 @@
+#
+# NicoBot is Nicovideo Player bot for Discord, written from the scratch.
+# This file is part of NicoBot.
+#
+# Copyright (C) 2021 Wonjun Jung (KokoseiJ)
+#
+#    Nicobot is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+from .const import LIB_NAME
+from .util import StoppableThread
+
+import time
+import heapq
+import logging
+from itertools import count
+from threading import Condition
+
+__all__ = ["VoiceScheduler"]
+
+logger = logging.getLogger(LIB_NAME)
+
+DELAY = 20 / 1000
+
+# Frames a player can fall behind before it stops catching up
+MAX_LAG_FRAMES = 5
+
+
+class VoiceScheduler(StoppableThread):
+    """Single thread pacing voice packets of every player assigned to it.
+
+    By default, every AudioPlayer runs on its own thread and sleeps between
+    frames by itself. With hundreds of players that means hundreds of threads
+    waking up 50 times a second, fighting over the GIL. Players with this
+    scheduler set don't start their own thread- instead, this thread keeps a
+    heap of players ordered by when their next packet is due, asks the player
+    for a packet when it's time and sends it to the player's voice client.
+
+    Since every player shares this thread, AudioSource.read should not block.
+    If your source might block(e.g. reading from ffmpeg), wrap it with
+    PrefetchAudioSource.
+
+    You can create multiple schedulers and spread players over them if a
+    single thread can't keep up.
+
+    Attributes:
+        late_threshold:
+            Seconds a packet can be sent later than its deadline before it is
+            counted as late.
+        ticks:
+            Integer tracking how many packets have been sent so far.
+        late:
+            Integer tracking how many packets have been sent later than
+            late_threshold.
+        max_jitter:
+            Largest delay between the deadline and the actual send so far.
+        total_jitter:
+            Sum of the delay between the deadline and the actual send, to
+            calculate the average.
+        _heap:
+            heap of (deadline, sequence, player) tuples.
+        _scheduled:
+            dict mapping players to the sequence of their valid heap entry.
+            Entries not matching this are stale, and get ignored.
+        _cond:
+            Condition used to wake the thread up when a player is added.
+    """
+
+    def __init__(self, name="voice_scheduler", late_threshold=DELAY / 4):
+        super(VoiceScheduler, self).__init__(name=name)
+        self.late_threshold = late_threshold
+
+        self._heap = []
+        self._scheduled = {}
+        self._counter = count()
+        self._cond = Condition()
+
+        self.reset_stats()
+
+    def add(self, player, when=None):
+        """Schedules the player to be polled at given time.
+
+        It does nothing if the player is already scheduled.
+
+        Args:
+            player:
+                AudioPlayer to schedule.
+            when:
+                time.perf_counter value to poll the player at. It defaults to
+                the current time.
+        """
+        with self._cond:
+            if player in self._scheduled:
+                return
+            if when is None:
+                when = time.perf_counter()
+
+            seq = next(self._counter)
+            self._scheduled[player] = seq
+            heapq.heappush(self._heap, (when, seq, player))
+            self._cond.notify()
+
+    def remove(self, player):
+        """Removes the player from the scheduler if it's scheduled."""
+        with self._cond:
+            self._scheduled.pop(player, None)
+
+    def get_stats(self):
+        """Returns the jitter statistics as a dict."""
+        ticks = self.ticks
+        return {
+            "players": len(self._scheduled),
+            "ticks": ticks,
+            "late": self.late,
+            "max_jitter": self.max_jitter,
+            "mean_jitter": self.total_jitter / ticks if ticks else 0,
+        }
+
+    def reset_stats(self):
+        self.ticks = 0
+        self.late = 0
+        self.max_jitter = 0
+        self.total_jitter = 0
+
+    def stop(self):
+        super(VoiceScheduler, self).stop()
+        with self._cond:
+            self._cond.notify()
+
+    def run(self):
+        while not self.stop_flag.is_set():
+            with self._cond:
+                if not self._heap:
+                    self._cond.wait(1)
+                    continue
+
+                when, seq, player = self._heap[0]
+                delay = when - time.perf_counter()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+
+                heapq.heappop(self._heap)
+                if self._scheduled.get(player) != seq:
+                    continue
+                del self._scheduled[player]
+
+            self._tick(player, when)
+
+        logger.info("Stopping voice scheduler...")
+
+    def _tick(self, player, when):
+        now = time.perf_counter()
+        # Frames we're behind get sent together, in a single burst
+        frames = 1 + min(int((now - when) / DELAY), MAX_LAG_FRAMES)
+
+        packets = []
+        idle = False
+        try:
+            for _ in range(frames):
+                packet = player._poll()
+                if packet is None:
+                    idle = True
+                    break
+                packets.append(packet)
+        except Exception:
+            logger.exception("Exception occured while polling the player.")
+            return
+
+        if packets:
+            try:
+                if len(packets) == 1:
+                    player.client._send_voice(packets[0])
+                else:
+                    player.client.send_voice_batch(packets)
+            except Exception:
+                logger.exception("Exception occured while sending voice data.")
+
+            jitter = now - when
+            self.ticks += len(packets)
+            self.total_jitter += jitter
+            if jitter > self.max_jitter:
+                self.max_jitter = jitter
+            if jitter > self.late_threshold:
+                self.late += 1
+
+        # Player is idle, it will add itself back when it needs to
+        if idle:
+            return
+
+        next_when = when + DELAY * len(packets)
+        if now - next_when > DELAY * MAX_LAG_FRAMES:
+            # Bursting every missed frame would only make things worse
+            next_when = now
+        self.add(player, next_when)
@@ -0,0 +1,166 @@
+#
+# NicoBot is Nicovideo Player bot for Discord, written from the scratch.
+# This file is part of NicoBot.
+#
+# Copyright (C) 2021 Wonjun Jung (KokoseiJ)
+#
+#    Nicobot is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+from .user import BotUser
+from .const import LIB_NAME
+from .codec import json_loads, json_dumps
+
+import os
+import time
+import logging
+
+__all__ = ["SessionStore"]
+
+logger = logging.getLogger(LIB_NAME)
+
+SNAPSHOT_VERSION = 1
+
+
+class SessionStore:
+    """Saves the session of a client to a file, to resume it after restart.
+
+    The session id, the sequence and the gateway URL for resuming are saved
+    along with the guilds, including their channels and members. A new
+    process restores them on start and sends RESUME instead of IDENTIFY,
+    so the guilds don't have to be sent again. If the session has expired
+    by then, the gateway asks to IDENTIFY and the guilds get replaced.
+
+    The file is removed once it has been loaded by the client it was saved
+    from, since the session moves on from there.
+
+    Attributes:
+        path:
+            Path of the file. "{shard}" in it is replaced with the shard id,
+            to keep the sessions of the shards in separate files.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def get_path(self, client):
+        """Returns the path of the file for the client.
+
+        Raises:
+            ValueError:
+                if the client is a shard but the path lacks "{shard}", in
+                which case the shards would overwrite each other's file.
+        """
+        if client.shard is None:
+            return self.path.replace("{shard}", "0")
+
+        if "{shard}" not in self.path:
+            raise ValueError(
+                f"Session path of shards should contain {{shard}}: "
+                f"{self.path}"
+            )
+        return self.path.replace("{shard}", str(client.shard[0]))
+
+    def save(self, client):
+        """Saves the session of the client, if it has one."""
+        if client.session_id is None or client.user is None:
+            return
+
+        guilds = [
+            guild.to_dict() if guild else {"id": id_, "unavailable": True}
+            for id_, guild in client.guilds.items()
+        ]
+        data = {
+            "version": SNAPSHOT_VERSION,
+            "saved_at": time.time(),
+            "shard": client.shard and list(client.shard),
+            "session_id": client.session_id,
+            "seq": client.seq,
+            "resume_gateway_url": client.resume_gateway_url,
+            "user": client.user.to_dict(),
+            "application": client.application,
+            "guilds": guilds,
+        }
+
+        path = self.get_path(client)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(json_dumps(data))
+        os.replace(tmp_path, path)
+        logger.info(f"Saved session {client.session_id} to {path}.")
+
+    def load(self, client):
+        """Reads and removes the saved session of the client.
+
+        Returns:
+            dict of the saved session, or None if there's none that could be
+            used by the client.
+        """
+        path = self.get_path(client)
+        try:
+            with open(path, "rb") as f:
+                raw = f.read()
+        except FileNotFoundError:
+            return None
+
+        try:
+            data = json_loads(raw)
+        except ValueError:
+            logger.warning(f"Ignoring corrupted session file {path}.")
+            return None
+
+        shard = client.shard and list(client.shard)
+        if data.get("version") != SNAPSHOT_VERSION:
+            logger.warning(f"Ignoring session file of other version {path}.")
+            return None
+        if data["shard"] != shard:
+            logger.warning(
+                f"Ignoring session of shard {data['shard']} for {shard}."
+            )
+            return None
+
+        os.remove(path)
+        return data
+
+    def restore(self, client):
+        """Restores the saved session and the guilds to the client.
+
+        Returns:
+            Whether a session has been restored.
+        """
+        data = self.load(client)
+        if data is None:
+            return False
+
+        client.session_id = data["session_id"]
+        client.seq = data["seq"]
+        client.resume_gateway_url = data["resume_gateway_url"]
+        client.application = data["application"]
+        client.user = BotUser(client, data["user"])
+        client.guilds = {}
+        client.index.clear()
+
+        for guild in data["guilds"]:
+            if guild.get("unavailable"):
+                client._set_guild(guild["id"], False)
+            else:
+                client.event_parser.on_guild_create(guild)
+
+        client.is_reconnect = True
+        logger.info(
+            f"Restored session {client.session_id} with "
+            f"{len(client.guilds)} guilds, saved "
+            f"{time.time() - data['saved_at']:.0f}s ago."
+        )
+        return True
@@ -0,0 +1,320 @@
+#
+# NicoBot is Nicovideo Player bot for Discord, written from the scratch.
+# This file is part of NicoBot.
+#
+# Copyright (C) 2021 Wonjun Jung (KokoseiJ)
+#
+#    Nicobot is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+from .client import DiscordClient, make_http_pool
+from .handler import EventHandler
+from .ratelimit import RateLimitHandler
+from .const import LIB_NAME
+
+import time
+import asyncio
+import logging
+from threading import Lock
+from types import MappingProxyType
+
+__all__ = ["ShardManager", "IdentifyLimiter", "get_shard_id"]
+
+logger = logging.getLogger(LIB_NAME)
+
+# Shards in the same bucket can IDENTIFY once in this many seconds
+IDENTIFY_INTERVAL = 5
+
+
+def get_shard_id(guild_id, shard_count):
+    """Returns the id of the shard receiving the events of the guild."""
+    return (int(guild_id) >> 22) % shard_count
+
+
+class IdentifyLimiter:
+    """Spaces out IDENTIFYs of the shards sharing a bucket.
+
+    Attributes:
+        max_concurrency:
+            Number of buckets, shards are in the bucket of
+            shard_id % max_concurrency.
+        _slots:
+            dict of the time the last IDENTIFY is scheduled at, per bucket.
+        _lock:
+            Lock for reserving the slots.
+    """
+
+    def __init__(self, max_concurrency=1):
+        self.max_concurrency = max_concurrency
+        self._slots = {}
+        self._lock = Lock()
+
+    def reserve(self, shard_id):
+        """Reserves the next slot of the bucket of the shard.
+
+        Returns:
+            Seconds to wait before sending IDENTIFY.
+        """
+        with self._lock:
+            now = time.monotonic()
+            bucket = shard_id % self.max_concurrency
+            last = self._slots.get(bucket)
+            if last is None:
+                slot = now
+            else:
+                slot = max(now, last + IDENTIFY_INTERVAL)
+            self._slots[bucket] = slot
+
+        return slot - now
+
+
+class ShardManager:
+    """Runs a client per shard, splitting the guilds between connections.
+
+    A single gateway connection has to receive the events of every guild,
+    which stops scaling beyond a few thousand guilds. With sharding, guilds
+    are split among shard_count connections by their id, and each connection
+    is a separate client with its own guilds and dispatch thread, sharing
+    the event loop.
+
+    Shards in the same bucket of shard_id % max_concurrency are allowed to
+    IDENTIFY once every 5 seconds, so shards wait for their turn before
+    sending one, on reconnects as well.
+
+    Attributes:
+        token:
+            Token of the bot.
+        shard_count:
+            Total number of shards. Fetched from /gateway/bot on .start if
+            None.
+        shard_ids:
+            Ids of the shards to run in this process, every shard if None.
+        max_concurrency:
+            Number of identify buckets. Fetched from /gateway/bot on .start
+            if None.
+        shards:
+            dict of the clients per shard id, filled on .start.
+        client:
+            DiscordClient class to construct the shards with.
+        handler:
+            EventHandler class, or a callable returning an EventHandler,
+            called once for every shard since handlers are bound to a client.
+        kwargs:
+            Keyword arguments passed to client.
+        identify_limiter:
+            IdentifyLimiter the shards wait on before sending IDENTIFY.
+        ratelimit_handler:
+            RateLimitHandler shared by every shard, as the global and the
+            per-route limits apply to the bot rather than a connection.
+        http:
+            urllib3 PoolManager shared by every shard, made with the
+            pool_size in kwargs if not given.
+    """
+
+    def __init__(
+        self,
+        token,
+        shard_count=None,
+        shard_ids=None,
+        max_concurrency=None,
+        client=DiscordClient,
+        handler=None,
+        ratelimit_handler=None,
+        http=None,
+        **kwargs,
+    ):
+        """
+        Args:
+            token:
+                same as .token attribute.
+            shard_count:
+                same as .shard_count attribute.
+            shard_ids:
+                same as .shard_ids attribute.
+            max_concurrency:
+                same as .max_concurrency attribute.
+            client:
+                same as .client attribute.
+            handler:
+                same as .handler attribute.
+            ratelimit_handler:
+                same as .ratelimit_handler attribute.
+            http:
+                same as .http attribute.
+            **kwargs:
+                same as .kwargs attribute.
+        """
+        if isinstance(handler, EventHandler):
+            raise TypeError(
+                "handler should be a class or a callable, since every shard "
+                "needs its own EventHandler"
+            )
+
+        self.token = token
+        self.shard_count = shard_count
+        self.shard_ids = shard_ids
+        self.max_concurrency = max_concurrency
+        self.shards = {}
+        self.client = client
+        self.handler = handler
+        self.kwargs = kwargs
+
+        self.identify_limiter = IdentifyLimiter(max_concurrency or 1)
+
+        if ratelimit_handler is None:
+            ratelimit_handler = RateLimitHandler()
+        self.ratelimit_handler = ratelimit_handler
+        if http is None:
+            http = make_http_pool(kwargs.get("pool_size", 10))
+        self.http = http
+
+    def start(self):
+        """Creates the shards and starts them.
+
+        Returns immediately- shards connect in the background as their
+        identify bucket allows.
+        """
+        if self.shards:
+            raise RuntimeError("ShardManager can only be started once")
+
+        if self.shard_count is None or self.max_concurrency is None:
+            self._fetch_gateway()
+
+        self.identify_limiter.max_concurrency = self.max_concurrency
+
+        shard_ids = self.get_shard_ids()
+        logger.info(
+            f"Starting {len(shard_ids)} of {self.shard_count} shards, "
+            f"max_concurrency {self.max_concurrency}"
+        )
+
+        for shard_id in shard_ids:
+            kwargs = self.get_client_kwargs(f"shard_{shard_id}")
+            if self.handler is not None:
+                kwargs["handler"] = self.handler()
+
+            client = self.client(self.token, **kwargs)
+            client.shard = (shard_id, self.shard_count)
+            client.shard_manager = self
+            self.shards[shard_id] = client
+
+        for client in self.shards.values():
+            client.start()
+
+    def get_client_kwargs(self, name):
+        """Returns the keyword arguments to construct a client with."""
+        return {
+            **self.kwargs,
+            "name": name,
+            "ratelimit_handler": self.ratelimit_handler,
+            "http": self.http,
+        }
+
+    def _fetch_gateway(self):
+        client = self.client(self.token, **self.get_client_kwargs("gateway"))
+        try:
+            info = client.get_gateway_bot()
+        finally:
+            client.close_http()
+        if self.shard_count is None:
+            self.shard_count = info["shards"]
+
+        limit = info["session_start_limit"]
+        if self.max_concurrency is None:
+            self.max_concurrency = limit["max_concurrency"]
+
+        count = len(self.get_shard_ids())
+        if limit["remaining"] < count:
+            logger.warning(
+                f"Starting {count} shards with only {limit['remaining']} "
+                f"sessions left, resetting in "
+                f"{limit['reset_after'] / 1000:.0f}s."
+            )
+
+    def get_shard_ids(self):
+        """Returns the ids of the shards to run in this process."""
+        if self.shard_ids is None:
+            return list(range(self.shard_count))
+        return list(self.shard_ids)
+
+    def stop(self):
+        for client in self.shards.values():
+            client.stop()
+
+    def join(self, timeout=None):
+        """Waits until every shard stops. Returns False on timeout."""
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+        for client in self.shards.values():
+            if timeout is not None:
+                timeout = max(deadline - time.monotonic(), 0)
+            if not client.join(timeout):
+                return False
+        return True
+
+    def is_ready(self):
+        return bool(self.shards) and all(
+            client.is_ready() for client in self.shards.values()
+        )
+
+    async def wait_identify(self, shard_id):
+        """Waits until the shard is allowed to IDENTIFY."""
+        await asyncio.sleep(self.identify_limiter.reserve(shard_id))
+
+    def get_shard(self, guild_id):
+        """Returns the client of the shard owning the guild.
+
+        Raises:
+            KeyError:
+                if the shard is not run by this ShardManager.
+        """
+        return self.shards[get_shard_id(guild_id, self.shard_count)]
+
+    def get_guilds(self):
+        guilds = {}
+        for client in self.shards.values():
+            if client.guilds is not None:
+                guilds.update(client.get_guilds().copy())
+        return MappingProxyType(guilds)
+
+    def get_guild(self, id_):
+        return self.get_shard(id_).get_guild(id_)
+
+    def get_channel(self, id_):
+        for client in self.shards.values():
+            channel = client.get_channel(id_)
+            if channel is not None:
+                return channel
+        return None
+
+    def get_user(self, id_):
+        for client in self.shards.values():
+            user = client.get_user(id_)
+            if user is not None:
+                return user
+        return None
+
+    def update_presence(self, *args, **kwargs):
+        for client in self.shards.values():
+            client.update_presence(*args, **kwargs)
+
+    def update_voice_state(self, guild_id, *args, **kwargs):
+        return self.get_shard(guild_id).update_voice_state(
+            guild_id, *args, **kwargs
+        )
+
+    def request_guild_member(self, guild_id, *args, **kwargs):
+        return self.get_shard(guild_id).request_guild_member(
+            guild_id, *args, **kwargs
+        )
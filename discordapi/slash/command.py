@@ -28,7 +28,6 @@ from ..dictobject import DictObject
 from ..gateway import DiscordGateway
 from ..util import get_formdata, clear_postdata
 
-import json
 import logging
 from types import GeneratorType
 
@@ -299,7 +298,7 @@ class SlashCommandManager:
                 self.client.delete_global_command(prev[cmd])
 
         commands = [command._json() for command in self.map.values()]
-        self.client.bulk_global_commands(json.dumps(commands))
+        self.client.bulk_global_commands(commands)
 
     def execute(self, ctx):
         cmdname = ctx.data["name"]
@@ -310,20 +309,31 @@ class SlashCommandManager:
 
         gen = command.execute(ctx, ctx.data.get("options"), self)
 
+        # Sent right away instead of through the REST queue shared with the
+        # other requests, as it has to arrive within 3 seconds.
         self.respond(ctx, 5)
 
         # TODO: Add the option to modify post-processor(res manipulation)
 
-        for res in gen:
-            if not res:
-                self.delete(ctx)
-                break
-            if not isinstance(res, dict):
-                if isinstance(res, Embed):
-                    res = {"embeds": [res]}
-                else:
-                    res = {"content": res}
-            self.edit(ctx, **res)
+        # Each edit is sent while the command goes on to the next response,
+        # but only after the previous one to keep them in order.
+        sent = None
+        try:
+            for res in gen:
+                if sent is not None:
+                    sent.result()
+                if not res:
+                    sent = self.client.submit(self.delete, ctx)
+                    break
+                if not isinstance(res, dict):
+                    if isinstance(res, Embed):
+                        res = {"embeds": [res]}
+                    else:
+                        res = {"content": res}
+                sent = self.client.submit(self.edit, ctx, **res)
+        finally:
+            if sent is not None:
+                sent.result()
 
     def respond(self, ctx, type_, message=None):
         postdata = {"type": type_}
@@ -388,17 +398,32 @@ class SlashCommandManager:
 
 class Context(DictObject):
     def __init__(self, client, data):
-        super().__init__(data, CTX_KEYLIST)
         self.client = client
         self.manager = None
+        super().__init__(data, CTX_KEYLIST)
+
+    def _resolve_user(self):
+        user = self._json.get("user")
+        if user is not None:
+            return User(self.client, user)
+
+    def _resolve_member(self):
+        member = self._json.get("member")
+        if member is not None and self.guild_id is not None:
+            guild = self.client.get_guild(self.guild_id)
+            member = Member(self.client, guild, member)
+        return member
+
+    def _resolve_message(self):
+        message = self._json.get("message")
+        if message is not None:
+            return Message(self.client, message)
 
-        if self.user is not None:
-            self.user = User(client, self.user)
-        if self.member is not None and self.guild_id is not None:
-            guild = client.get_guild(self.guild_id)
-            self.member = Member(client, guild, self.member)
-        if self.message is not None:
-            self.message = Message(client, self.message)
+    RESOLVERS = {
+        "user": _resolve_user,
+        "member": _resolve_member,
+        "message": _resolve_message,
+    }
 
     def __str__(self):
         class_name = self.__class__.__name__
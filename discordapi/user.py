@@ -26,7 +26,7 @@ from .dictobject import DictObject
 import base64
 from urllib.parse import urljoin
 
-__all__ = ["User"]
+__all__ = ["User", "CompactUser"]
 
 KEYLIST = [
     "id",
@@ -52,10 +52,22 @@ and thus I did not add further explanations about how things work.
 
 
 class User(DictObject):
+    __slots__ = (*KEYLIST, "client", "_json", "_keylist")
+
     def __init__(self, client, data):
-        super(User, self).__init__(data, KEYLIST)
         self.client = client
-        self.avatar = urljoin(CDN_URL, f"avatars/{self.id}/{self.avatar}.png")
+        super(User, self).__init__(data, KEYLIST)
+
+    def _resolve_avatar(self):
+        avatar = self._json.get("avatar")
+        return urljoin(CDN_URL, f"avatars/{self.id}/{avatar}.png")
+
+    def _export_avatar(self, url):
+        avatar = url.rsplit("/", 1)[-1][:-len(".png")]
+        return None if avatar == "None" else avatar
+
+    RESOLVERS = {"avatar": _resolve_avatar}
+    EXPORTERS = {"avatar": _export_avatar}
 
     def dm(self):
         return self.client.user.create_dm(self)
@@ -68,6 +80,18 @@ class User(DictObject):
         return self._get_str(class_name, self.id, username_full)
 
 
+class CompactUser(User):
+    """User which doesn't keep the raw dict, for use in caches.
+
+    Like User, it has no __dict__ and stores its attributes in the slots.
+    The raw dict is not kept unless keep_json is set to True.
+    """
+
+    __slots__ = ()
+    lazy = False
+    keep_json = False
+
+
 class BotUser(User):
     def modify_user(self, username=EMPTY, avatar=None):
         if avatar is not None:
@@ -20,9 +20,9 @@
 
 from .const import EMPTY
 from .file import File
+from .codec import json_dumps
 
 import os
-import json
 from select import select
 from threading import Thread, Event
 
@@ -109,31 +109,154 @@ def filter_dict(data, keys):
 
 
 def get_formdata(data, boundary_prefix=None):
-    if boundary_prefix is None:
-        boundary_prefix = "VOCALOIDIA-"
+    """Encodes data as multipart/form-data.
 
-    randhex = os.urandom(8).hex()
-    boundary = f"{boundary_prefix}{randhex}"
+    Args:
+        data:
+            dict of field names and values. Values could be str, bytes, dict
+            which gets encoded to JSON, or File.
+        boundary_prefix:
+            Prefix of the randomly generated boundary.
 
-    content_type = f'multipart/form-data;boundary="{boundary}"'
+    Returns:
+        tuple of (content_type, body) where body is a MultipartEncoder.
+    """
+    body = MultipartEncoder(data, boundary_prefix)
+
+    return body.content_type, body
+
+
+class MultipartEncoder:
+    """multipart/form-data body which gets read while being sent.
+
+    Files are read in chunks as the body is read, instead of being loaded
+    into the memory beforehand. Length of the body is calculated from the
+    size of the files, so that Content-Length could be sent without
+    buffering. Body can be read again after seek(0), e.g. to retry.
+
+    Attributes:
+        boundary:
+            Boundary string separating the fields.
+        content_type:
+            Value of the Content-Type header for the body.
+        parts:
+            list of (part, start, size) tuples where part is either bytes or
+            File, and start is the offset of the content in part.
+        _length:
+            Length of the whole body.
+        _position:
+            Position of the body to read next.
+        _index:
+            Index of the part to read next.
+        _offset:
+            Position in the part to read next, relative to start.
+    """
+
+    def __init__(self, data, boundary_prefix=None):
+        if boundary_prefix is None:
+            boundary_prefix = "VOCALOIDIA-"
+
+        randhex = os.urandom(8).hex()
+        self.boundary = f"{boundary_prefix}{randhex}"
+        self.content_type = f'multipart/form-data;boundary="{self.boundary}"'
+
+        self.parts = []
+        self._length = 0
+
+        for key, value in data.items():
+            head = (
+                f"--{self.boundary}\n"
+                f'Content-Disposition: form-data; name="{key}"'
+            )
+
+            if isinstance(value, File):
+                head += (
+                    f'; filename="{value.get_name()}"\n'
+                    "Content-Type: application/octet-stream\n\n"
+                )
+                self._add(head.encode())
+                self._add(value, value.tell(), value.get_size())
+                self._add(b"\n")
+                continue
+
+            if isinstance(value, dict):
+                value = json_dumps(value)
+            elif isinstance(value, str):
+                value = value.encode()
+            self._add(head.encode() + b"\n\n" + value + b"\n")
+
+        self._add(f"--{self.boundary}--\n".encode())
+
+        self._position = 0
+        self._index = 0
+        self._offset = 0
+
+    def _add(self, part, start=0, size=None):
+        if size is None:
+            size = len(part)
+        self.parts.append((part, start, size))
+        self._length += size
+
+    def __len__(self):
+        return self._length
+
+    def read(self, size=-1):
+        """Reads up to size bytes of the body, or the rest if negative.
+
+        Raises:
+            ValueError:
+                if a file got shorter than it was when the body was created.
+        """
+        chunks = []
+
+        while size and self._index < len(self.parts):
+            part, start, length = self.parts[self._index]
+            count = length - self._offset
+            if 0 < size < count:
+                count = size
+
+            if isinstance(part, File):
+                part.seek(start + self._offset)
+                chunk = part.read(count)
+                if len(chunk) != count:
+                    raise ValueError(
+                        f"File '{part.get_name()}' has been truncated."
+                    )
+            else:
+                chunk = part[self._offset : self._offset + count]
+
+            chunks.append(chunk)
+            self._position += count
+            self._offset += count
+            if self._offset == length:
+                self._index += 1
+                self._offset = 0
+            if size > 0:
+                size -= count
+
+        return b"".join(chunks)
 
-    body = bytes()
+    def readable(self):
+        return True
 
-    for key, value in data.items():
-        body += f"--{boundary}\n".encode()
-        body += f'Content-Disposition: form-data; name="{key}"'.encode()
+    def tell(self):
+        return self._position
 
-        if isinstance(value, dict):
-            value = json.dumps(value).encode()
-        elif isinstance(value, File):
-            name = value.get_name()
-            value = value.read()
-            body += f'; filename="{name}"\n'.encode()
-            body += b"Content-Type: application/octet-stream"
+    def seek(self, offset, whence=os.SEEK_SET):
+        """Moves to the position of the body, only used to read it again."""
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence == os.SEEK_END:
+            offset += self._length
+        offset = max(0, min(offset, self._length))
 
-        body += b"\n\n"
-        body += value if isinstance(value, bytes) else value.encode()
-        body += b"\n"
-    body += f"--{boundary}--\n".encode()
+        self._position = offset
+        self._index = 0
+        for _, _, length in self.parts:
+            if offset < length:
+                break
+            offset -= length
+            self._index += 1
+        self._offset = offset
 
-    return content_type, body
+        return self._position
@@ -20,14 +20,18 @@
 
 from .const import LIB_NAME
 from .exceptions import DiscordError
-from .websocket import WebSocketThread
+from .codec import json_dumps
+from .websocket import AsyncWebSocketClient
+from .encryption import ENCRYPTION_MODES, PREFERRED_MODES, HEADER_SIZE
 
-import json
+import sys
 import time
+import errno
+import ctypes
 import struct
 import socket
+import asyncio
 import logging
-from threading import Event
 from websocket import WebSocketException
 
 __all__ = ["DiscordVoiceClient"]
@@ -37,6 +41,17 @@ logger = logging.getLogger(LIB_NAME)
 IP_DISCOVERY_STRUCT = struct.Struct(">HHI64sH")
 VOICE_STRUCT = struct.Struct(">ccHII")
 
+# Size of the buffer for each packet. Way bigger than 20ms Opus frame
+PACKET_SIZE = 2048
+MAX_PAYLOAD = PACKET_SIZE - HEADER_SIZE - max(
+    cls.overhead for cls in ENCRYPTION_MODES.values()
+)
+# Maximum amount of packets to be sent at once
+BATCH_SIZE = 16
+
+DISCOVERY_TIMEOUT = 5
+DISCOVERY_RETRIES = 3
+
 try:
     import nacl.secret
 
@@ -46,7 +61,168 @@ except ImportError:
     AVAILABLE = False
 
 
-class DiscordVoiceClient(WebSocketThread):
+class _iovec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+
+class _msghdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_name", ctypes.c_void_p),
+        ("msg_namelen", ctypes.c_uint32),
+        ("msg_iov", ctypes.POINTER(_iovec)),
+        ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int),
+    ]
+
+
+class _mmsghdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _msghdr), ("msg_len", ctypes.c_uint)]
+
+
+try:
+    if not sys.platform.startswith("linux"):
+        raise OSError("sendmmsg is only available on Linux")
+    _libc = ctypes.CDLL(None, use_errno=True)
+    _sendmmsg = _libc.sendmmsg
+    _sendmmsg.argtypes = [
+        ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int
+    ]
+    _sendmmsg.restype = ctypes.c_int
+except (OSError, AttributeError):
+    _sendmmsg = None
+
+
+class UDPBatch:
+    """Sends multiple packets from a buffer with a single sendmmsg call.
+
+    Message headers pointing to each slot of the buffer are built once, so
+    that sending only needs to fill in the length of each packet. Falls back
+    to calling sendto for every packet where sendmmsg is not available.
+
+    Attributes:
+        sock:
+            UDP socket to send packets with.
+        addr:
+            (host, port) tuple of the destination.
+        view:
+            memoryview of the buffer containing the packets.
+        slot_size:
+            Size of each slot in the buffer.
+        size:
+            Amount of the slots in the buffer.
+    """
+
+    def __init__(self, sock, addr, buffer, slot_size, size):
+        self.sock = sock
+        self.addr = addr
+        self.view = memoryview(buffer)
+        self.slot_size = slot_size
+        self.size = size
+
+        self._msgs = None
+        if _sendmmsg is not None and sock.family == socket.AF_INET:
+            self._build(buffer)
+
+    def _build(self, buffer):
+        host, port = self.addr
+        self._sockaddr = ctypes.create_string_buffer(
+            struct.pack("=H", socket.AF_INET)
+            + struct.pack(">H", port)
+            + socket.inet_aton(socket.gethostbyname(host))
+            + bytes(8)
+        )
+        self._cbuf = (ctypes.c_char * len(buffer)).from_buffer(buffer)
+        base = ctypes.addressof(self._cbuf)
+
+        self._iovecs = (_iovec * self.size)()
+        self._msgs = (_mmsghdr * self.size)()
+        for i in range(self.size):
+            self._iovecs[i].iov_base = base + i * self.slot_size
+            hdr = self._msgs[i].msg_hdr
+            hdr.msg_name = ctypes.addressof(self._sockaddr)
+            hdr.msg_namelen = len(self._sockaddr.raw)
+            hdr.msg_iov = ctypes.pointer(self._iovecs[i])
+            hdr.msg_iovlen = 1
+
+    def send(self, lengths):
+        """Sends the first len(lengths) slots, with each given length."""
+        if self._msgs is None:
+            for i, length in enumerate(lengths):
+                offset = i * self.slot_size
+                try:
+                    self.sock.sendto(
+                        self.view[offset:offset + length], self.addr
+                    )
+                except BlockingIOError:
+                    logger.debug("Socket buffer full, dropping packets")
+                    return
+            return
+
+        for i, length in enumerate(lengths):
+            self._iovecs[i].iov_len = length
+
+        base = ctypes.addressof(self._msgs)
+        sent = 0
+        while sent < len(lengths):
+            res = _sendmmsg(
+                self.sock.fileno(),
+                base + sent * ctypes.sizeof(_mmsghdr),
+                len(lengths) - sent,
+                0,
+            )
+            if res < 0:
+                err = ctypes.get_errno()
+                if err in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    logger.debug("Socket buffer full, dropping packets")
+                    return
+                raise OSError(err, "sendmmsg failed")
+            sent += res
+
+
+class VoiceProtocol(asyncio.DatagramProtocol):
+    """Receives datagrams from the voice UDP socket on the event loop.
+
+    IP discovery responses are passed to the client. Every other datagram,
+    such as the voice of the other users, gets discarded- so that they won't
+    fill up the socket buffer.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def datagram_received(self, data, addr):
+        waiter = self.client._discovery
+        if waiter is not None and not waiter.done() and \
+                addr == self.client.server_addr and \
+                len(data) == IP_DISCOVERY_STRUCT.size:
+            waiter.set_result(data)
+
+    def error_received(self, exc):
+        logger.warning(f"Voice UDP socket error: {exc}")
+
+
+class DiscordVoiceClient(AsyncWebSocketClient):
+    """Client for the voice gateway, which also sends voice over UDP.
+
+    Both the gateway connection and the UDP socket run on the event loop.
+    Voice packets are sent straight from the player's thread, through the
+    non-blocking UDP socket.
+
+    Attributes:
+        encryption_modes:
+            Encryption modes to choose from, in the order of preference. The
+            first one that the server supports is used. You can override this
+            to force a mode, e.g. for benchmarking.
+        mode:
+            Name of the encryption mode in use.
+        encryption:
+            VoiceEncryption instance encrypting the packets.
+    """
+
+    encryption_modes = PREFERRED_MODES
+
     IDENTIFY = 0
     SELECT_PROTOCOL = 1
     READY = 2
@@ -70,14 +246,18 @@ class DiscordVoiceClient(WebSocketThread):
         self.user_id = client.user.id
         self._set_info(endpoint, token, session_id, server_id)
 
-        self.got_ready = Event()
-        self.is_heartbeat_ready = Event()
-        self.heartbeat_ack_received = Event()
+        self.got_ready = asyncio.Event()
         self.secret_box = None
+        self.mode = None
+        self.encryption = None
         self.voice_sequence = 0
         self.timestamp = 0
 
-        self.heartbeat_interval = None
+        # Packets are built here in place, one slot per packet
+        self._packet_buf = bytearray(PACKET_SIZE * BATCH_SIZE)
+        self._packet_view = memoryview(self._packet_buf)
+        self._batch = None
+
         self.ssrc = None
         self.server_addr = None
         self.modes = None
@@ -86,6 +266,8 @@ class DiscordVoiceClient(WebSocketThread):
         self.secret_key = None
 
         self.udp_sock = None
+        self._udp_transport = None
+        self._discovery = None
 
     def _set_info(self, endpoint, token, session_id, server_id=None):
         self.url = endpoint
@@ -131,40 +313,110 @@ class DiscordVoiceClient(WebSocketThread):
         self.client.update_voice_state(self.server_id, None, False, False)
 
     def _send_voice(self, data):
-        header = VOICE_STRUCT.pack(
+        size = self._pack_voice(data, 0)
+        if size:
+            try:
+                self.udp_sock.sendto(
+                    self._packet_view[:size], self.server_addr
+                )
+            except BlockingIOError:
+                logger.debug("Socket buffer full, dropping packet")
+
+    def send_voice_batch(self, frames):
+        """Encrypts multiple frames and sends them in one burst.
+
+        Packets are sent with a single sendmmsg syscall where available. This
+        is meant for catching up after falling behind- frames are sent
+        immediately, not paced.
+
+        Args:
+            frames:
+                list of Opus frames to send, in order.
+        """
+        batch = self._batch
+        if batch is None or batch.addr != self.server_addr or \
+                batch.sock is not self.udp_sock:
+            batch = self._batch = UDPBatch(
+                self.udp_sock, self.server_addr, self._packet_buf,
+                PACKET_SIZE, BATCH_SIZE
+            )
+
+        lengths = []
+        for data in frames:
+            size = self._pack_voice(data, len(lengths) * PACKET_SIZE)
+            if not size:
+                continue
+
+            lengths.append(size)
+            if len(lengths) == BATCH_SIZE:
+                batch.send(lengths)
+                lengths = []
+
+        if lengths:
+            batch.send(lengths)
+
+    def _pack_voice(self, data, offset):
+        """Builds an encrypted voice packet into the buffer at given offset.
+
+        Returns:
+            Length of the packet, or 0 if the packet has been dropped.
+        """
+        if len(data) > MAX_PAYLOAD:
+            logger.warning("Dropping oversized voice frame: %d", len(data))
+            return 0
+
+        VOICE_STRUCT.pack_into(
+            self._packet_buf,
+            offset,
             b"\x80",
             b"\x78",
             self.voice_sequence % 65536,
             self.timestamp,
             self.ssrc,
         )
-        payload = self.xsalsa20_poly1305(header, data)
 
-        self.send_udp(payload)
+        size = self.encryption.encrypt(offset, data)
+        if not size:
+            if self.ready_to_run.is_set():
+                logger.warning("Voice nonce exhausted, reconnecting...")
+                self.ready_to_run.clear()
+                self.reconnect()
+            return 0
+
         self.voice_sequence += 1
         self.timestamp += 960
 
-    def xsalsa20_poly1305(self, header, data):
-        nonce = bytearray(24)
-        nonce[:12] = header
-        enc = self.secret_box.encrypt(data, bytes(nonce)).ciphertext
-        return header + enc
+        return size
 
-    def init_connection(self):
-        self.udp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.send_identify()
-        self.got_ready.wait()
+    async def init_connection(self):
         self.got_ready.clear()
+        self.send_identify()
+        await self.got_ready.wait()
 
-        while True:
+        await self.open_udp()
+
+        for _ in range(DISCOVERY_RETRIES):
             try:
-                self.ip, self.port = self.ip_discovery()
+                self.ip, self.port = await self.ip_discovery()
                 break
             except RuntimeError:
                 logger.warning("IP Discovery data mismatch!")
-                continue
+            except asyncio.TimeoutError:
+                logger.warning("IP Discovery timed out!")
+        else:
+            raise DiscordError("IP Discovery failed")
+
         self.send_protocol()
 
+    async def open_udp(self):
+        """Opens the UDP socket and registers it to the event loop."""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setblocking(False)
+        self._udp_transport, _ = await self.loop.create_datagram_endpoint(
+            lambda: VoiceProtocol(self), sock=sock
+        )
+        self.udp_sock = sock
+
     def send_identify(self):
         payload = self._get_payload(
             self.IDENTIFY,
@@ -175,7 +427,7 @@ class DiscordVoiceClient(WebSocketThread):
         )
         self.send(payload)
 
-    def ip_discovery(self):
+    async def ip_discovery(self, timeout=DISCOVERY_TIMEOUT):
         payload = IP_DISCOVERY_STRUCT.pack(
             0x1,
             70,
@@ -184,11 +436,13 @@ class DiscordVoiceClient(WebSocketThread):
             self.server_addr[1],
         )
 
-        self.send_udp(payload)
+        self._discovery = self.loop.create_future()
+        try:
+            self.send_udp(payload)
+            payload = await asyncio.wait_for(self._discovery, timeout)
+        finally:
+            self._discovery = None
 
-        addr = None
-        while addr != self.server_addr:
-            payload, addr = self.udp_sock.recvfrom(1024)
         typ, leng, ssrc, addr, port = IP_DISCOVERY_STRUCT.unpack(payload)
         logger.debug(
             f"typ: {typ} leng: {leng} ssrc: {ssrc} addr: {addr} port: {port}"
@@ -202,52 +456,35 @@ class DiscordVoiceClient(WebSocketThread):
 
     def send_udp(self, data):
         if isinstance(data, dict):
-            data = json.dumps(data)
+            data = json_dumps(data)
         if isinstance(data, str):
             data = data.encode()
 
         self.udp_sock.sendto(data, self.server_addr)
 
+    def select_mode(self):
+        """Returns the most preferred encryption mode the server supports."""
+        for mode in self.encryption_modes:
+            if mode in self.modes and mode in ENCRYPTION_MODES:
+                return mode
+
+        raise DiscordError(f"No supported encryption mode in {self.modes}")
+
     def send_protocol(self):
+        self.mode = self.select_mode()
+        logger.info("Using encryption mode %s", self.mode)
+
         payload = self._get_payload(
             self.SELECT_PROTOCOL,
             protocol="udp",
             data={
                 "address": self.ip,
                 "port": self.port,
-                "mode": "xsalsa20_poly1305",
+                "mode": self.mode,
             },
         )
         self.send(payload)
 
-    def do_heartbeat(self):
-        ready_flag = self.is_heartbeat_ready
-        stop_flag = self.heartbeat_thread.stop_flag
-        ack_flag = self.heartbeat_ack_received
-
-        ready_flag.wait()
-
-        wait_time = self.heartbeat_interval
-
-        while not stop_flag.is_set():
-            ready_flag.wait()
-            self.send_heartbeat()
-            sendtime = time.time()
-            logger.debug("Sending heartbeat...")
-
-            deadline = sendtime + wait_time
-
-            if not ack_flag.wait(deadline - time.time()):
-                logger.error("Warning! No HEARTBEAT_ACK received within time!")
-                self.reconnect()
-
-            if stop_flag.wait(deadline - time.time()):
-                break
-
-            self.heartbeat_ack_received.clear()
-
-        logger.info("Terminating heartbeat thread...")
-
     def send_heartbeat(self):
         payload = self._get_payload(self.HEARTBEAT, d=time.time())
         try:
@@ -259,23 +496,20 @@ class DiscordVoiceClient(WebSocketThread):
         return {"op": op, "d": data if d is None else d}
 
     def cleanup(self):
-        self.udp_sock.close()
-
-        self.is_heartbeat_ready.clear()
-        self.heartbeat_ack_received.set()
+        if self._udp_transport is not None:
+            self._udp_transport.close()
+            self._udp_transport = None
 
     def _dispatcher(self, data):
         op = data["op"]
         payload = data["d"]
 
         if op == self.HELLO:
-            self.heartbeat_interval = payload["heartbeat_interval"] / 1000
-            self.is_heartbeat_ready.set()
+            self.start_heartbeat(payload["heartbeat_interval"] / 1000)
 
         elif op == self.READY:
             self.ssrc = payload["ssrc"]
             self.server_addr = (payload["ip"], payload["port"])
-            self.udp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
             self.modes = payload["modes"]
             self.got_ready.set()
 
@@ -283,8 +517,12 @@ class DiscordVoiceClient(WebSocketThread):
             self.secret_key = bytes(payload["secret_key"])
             logger.info("Received secret key, generating SecretBox...")
             self.secret_box = nacl.secret.SecretBox(self.secret_key)
+            self.mode = payload.get("mode", self.mode)
+            self.encryption = ENCRYPTION_MODES[self.mode](
+                self.secret_key, self._packet_buf
+            )
             self.ready_to_run.set()
             logger.info("VOICE READY!!!")
 
         elif op == self.HEARTBEAT_ACK:
-            self.heartbeat_ack_received.set()
+            self.ack_heartbeat()
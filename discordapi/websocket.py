@@ -20,33 +20,310 @@
 
 from .const import LIB_NAME
 from .util import StoppableThread
+from .etf import etf_pack, etf_unpack
+from .codec import json_loads, json_dumps
 
-import json
-import time
+import os
+import ssl
+import zlib
+import base64
 import random
-import select
+import struct
+import asyncio
+import hashlib
 import logging
-from ssl import SSLError
-from threading import Event
-from websocket import WebSocket, WebSocketConnectionClosedException
+from threading import Event, Lock
+from urllib.parse import urlsplit
+from websocket import WebSocketException
 from websocket._abnf import ABNF
 
 __all__ = []
 
 logger = logging.getLogger(LIB_NAME)
 
-SELECT_TIMEOUT = 5
+CONNECT_TIMEOUT = 10
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+ZLIB_SUFFIX = b"\x00\x00\xff\xff"
 
+# Decoder, encoder and WebSocket opcode of each gateway encoding
+ENCODINGS = {
+    "json": (json_loads, json_dumps, ABNF.OPCODE_TEXT),
+    "etf": (etf_unpack, etf_pack, ABNF.OPCODE_BINARY),
+}
 
-class WebSocketThread(StoppableThread):
-    """Base class for running WebSocket connection.
 
-    It has .do_heartbeat, .init_connection, .cleanup method to be overriden by
-    inherited client, for defining desired behaviour depending on clients.
+class EventLoopThread(StoppableThread):
+    """Thread running the asyncio event loop shared by the clients.
 
-    This class inherits from Thread, and is running as a separate thread.
-    To start the client, you have to invoke .start method as you would with
-    typical threads.
+    Every AsyncWebSocketClient started with .start method runs on a single
+    instance of this thread, so that connections, heartbeats and voice sockets
+    don't need threads of their own.
+
+    Attributes:
+        loop:
+            asyncio event loop running in this thread.
+    """
+
+    _instance = None
+    _lock = Lock()
+
+    def __init__(self, name="discordapi_loop"):
+        super(EventLoopThread, self).__init__(name=name, daemon=True)
+        self.loop = asyncio.new_event_loop()
+        self._running = Event()
+
+    @classmethod
+    def get_loop(cls):
+        """Returns the shared event loop, starting the thread if needed."""
+        with cls._lock:
+            if cls._instance is None or not cls._instance.is_alive():
+                cls._instance = cls()
+                cls._instance.start()
+                cls._instance._running.wait()
+            return cls._instance.loop
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(self._running.set)
+        self.loop.run_forever()
+
+    def stop(self):
+        super(EventLoopThread, self).stop()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+class WebSocketConnection:
+    """Client side WebSocket connection running on asyncio streams.
+
+    Only implements what the gateways need: the opening handshake, receiving
+    (possibly fragmented) messages, answering pings and closing. Frames are
+    built with websocket-client's ABNF class.
+
+    Attributes:
+        reader:
+            asyncio.StreamReader of the connection.
+        writer:
+            asyncio.StreamWriter of the connection.
+    """
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, url, timeout=CONNECT_TIMEOUT):
+        """Opens the connection and performs the opening handshake."""
+        parsed = urlsplit(url)
+        secure = parsed.scheme == "wss"
+        host = parsed.hostname
+        port = parsed.port or (443 if secure else 80)
+
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(
+                host,
+                port,
+                ssl=ssl.create_default_context() if secure else None,
+                server_hostname=host if secure else None,
+            ),
+            timeout,
+        )
+
+        try:
+            await asyncio.wait_for(
+                cls._handshake(reader, writer, parsed, host), timeout
+            )
+        except BaseException:
+            writer.close()
+            raise
+
+        return cls(reader, writer)
+
+    @staticmethod
+    async def _handshake(reader, writer, parsed, host):
+        key = base64.b64encode(os.urandom(16)).decode()
+        path = parsed.path or "/"
+        if parsed.query:
+            path += "?" + parsed.query
+        if parsed.port is not None:
+            host = f"{host}:{parsed.port}"
+
+        writer.write(
+            (
+                f"GET {path} HTTP/1.1\r\n"
+                f"Host: {host}\r\n"
+                "Upgrade: websocket\r\n"
+                "Connection: Upgrade\r\n"
+                f"Sec-WebSocket-Key: {key}\r\n"
+                "Sec-WebSocket-Version: 13\r\n"
+                "\r\n"
+            ).encode()
+        )
+
+        status = await reader.readline()
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if status.split(b" ", 2)[1:2] != [b"101"]:
+            raise WebSocketException(
+                f"Handshake failed: {status.decode('latin-1').strip()}"
+            )
+
+        accept = base64.b64encode(
+            hashlib.sha1((key + WS_GUID).encode()).digest()
+        ).decode()
+        if headers.get("sec-websocket-accept") != accept:
+            raise WebSocketException("Invalid Sec-WebSocket-Accept header")
+
+    @property
+    def connected(self):
+        return not self.writer.is_closing()
+
+    @staticmethod
+    def frame(data, opcode=ABNF.OPCODE_TEXT):
+        """Returns data as a masked frame ready to be written."""
+        return ABNF.create_frame(data, opcode).format()
+
+    def write(self, frame):
+        """Writes a frame built with .frame method, if still connected."""
+        if self.connected:
+            self.writer.write(frame)
+
+    def send(self, data, opcode=ABNF.OPCODE_TEXT):
+        self.write(self.frame(data, opcode))
+
+    async def drain(self):
+        await self.writer.drain()
+
+    async def _recv_frame(self):
+        readexactly = self.reader.readexactly
+
+        head = await readexactly(2)
+        fin = head[0] & 0x80
+        opcode = head[0] & 0x0F
+        length = head[1] & 0x7F
+
+        if length == 126:
+            length, = struct.unpack("!H", await readexactly(2))
+        elif length == 127:
+            length, = struct.unpack("!Q", await readexactly(8))
+
+        if head[1] & 0x80:
+            mask = await readexactly(4)
+            data = ABNF.mask(mask, await readexactly(length))
+        else:
+            data = await readexactly(length)
+
+        return fin, opcode, data
+
+    async def recv(self):
+        """Receives a whole message.
+
+        Pings are answered and pongs are ignored here. Close frames are
+        returned as is, so that the caller could read the close code.
+
+        Returns:
+            (opcode, data) tuple.
+
+        Raises:
+            asyncio.IncompleteReadError:
+                if the connection has been closed.
+        """
+        opcode = None
+        fragments = []
+
+        while True:
+            fin, frame_opcode, data = await self._recv_frame()
+
+            if frame_opcode == ABNF.OPCODE_PING:
+                self.send(data, ABNF.OPCODE_PONG)
+                continue
+            elif frame_opcode == ABNF.OPCODE_PONG:
+                continue
+            elif frame_opcode == ABNF.OPCODE_CLOSE:
+                return frame_opcode, data
+            elif frame_opcode != ABNF.OPCODE_CONT:
+                opcode = frame_opcode
+                fragments = []
+
+            fragments.append(data)
+            if fin:
+                if len(fragments) == 1:
+                    return opcode, fragments[0]
+                return opcode, b"".join(fragments)
+
+    def close(self, status=1000, reason=b""):
+        """Closes the connection.
+
+        Status 1006 means abnormal closure, which is never sent over the wire-
+        In that case the connection just gets dropped.
+        """
+        if not self.connected:
+            return
+        if status != 1006:
+            self.send(struct.pack("!H", status) + reason, ABNF.OPCODE_CLOSE)
+        self.writer.close()
+
+
+class ZlibStreamInflator:
+    """Decompresses messages sent with zlib-stream transport compression.
+
+    The gateway compresses the whole connection with a single zlib context,
+    flushing it with Z_SYNC_FLUSH at the end of every payload. A payload may
+    be split over multiple messages, so those get buffered until the flush
+    suffix shows up. Thus a new instance is needed for every connection.
+
+    Attributes:
+        bytes_in:
+            Amount of compressed bytes received.
+        bytes_out:
+            Amount of bytes after decompression.
+    """
+
+    def __init__(self):
+        self._inflator = zlib.decompressobj()
+        self._buffer = bytearray()
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def feed(self, data):
+        """Returns the decompressed payload, or None if it's incomplete."""
+        self.bytes_in += len(data)
+
+        if not self._buffer and data[-4:] == ZLIB_SUFFIX:
+            # Usual case, a whole payload in a single message
+            payload = self._inflator.decompress(data)
+        else:
+            self._buffer += data
+            if self._buffer[-4:] != ZLIB_SUFFIX:
+                return None
+            payload = self._inflator.decompress(self._buffer)
+            self._buffer.clear()
+
+        self.bytes_out += len(payload)
+        return payload
+
+
+class AsyncWebSocketClient:
+    """Base class for running WebSocket connection on asyncio event loop.
+
+    It has .init_connection, .send_heartbeat, .cleanup method to be overriden
+    by inherited client, for defining desired behaviour depending on clients.
+
+    Connections don't own any threads. Heartbeats are scheduled with
+    loop.call_later, and the dispatcher runs on the event loop. Thus the
+    dispatcher should return quickly, and hand time-consuming jobs over to
+    another thread.
+
+    This class keeps the interface of a thread for the threaded code- .start
+    runs the client on the event loop shared by every client, .join waits for
+    it to stop, and .send, .reconnect and .stop could be called from any
+    thread. Asynchronous code can await .run_async method instead, which runs
+    the client on the current event loop.
 
     Attributes:
         url:
@@ -54,22 +331,33 @@ class WebSocketThread(StoppableThread):
         dispatcher:
             Handler to be called when the event has been received. It should
             recieve a single argument with type of dict.
+        name:
+            Name of this client, used in logs.
+        loop:
+            Event loop this client runs on. Chosen when the client starts if
+            not given.
         ready_to_run:
             Event object indicating if the event is ready to be used. This
             event must be set manually by the inherited class.
-        _sock:
-            internal WebSocket object to be used to communicate with gateway.
-        heartbeat_thread:
-            Thread where .do_heartbeat method runs. This thread runs throughout
-            the lifetime of this thread, so .do_heartbeat should be written
-            with continuability in mind.
-        init_thread:
-            Thread where init_thread method runs. It runs in thread so that
-            ._event_loop method could run parellelly. This thread is expected
-            to run quick and quit shortly after.
+        stop_flag:
+            Event object which gets set when .stop method is called.
+        heartbeat_interval:
+            Interval between heartbeats in seconds.
+        compress:
+            Whether binary messages are zlib-stream compressed. The URL
+            should request the compression accordingly.
+        encoding:
+            Encoding of the payloads, either "json" or "etf". The URL should
+            request the encoding accordingly.
+        _conn:
+            internal WebSocketConnection object to be used to communicate
+            with gateway.
     """
 
-    def __init__(self, url, dispatcher, name):
+    def __init__(
+        self, url, dispatcher, name, loop=None, compress=False,
+        encoding="json"
+    ):
         """
         Args:
             url:
@@ -77,126 +365,169 @@ class WebSocketThread(StoppableThread):
             dispatcher:
                 same as .dispatcher attribute
             name:
-                same as name argument in threading.Thread
+                same as .name attribute
+            loop:
+                same as .loop attribute
+            compress:
+                same as .compress attribute
+            encoding:
+                same as .encoding attribute
         """
-        super(WebSocketThread, self).__init__()
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unknown encoding '{encoding}'")
 
         self.url = url
         self.dispatcher = dispatcher
-        self.ready_to_run = Event()
         self.name = str(name)
+        self.loop = loop
+        self.ready_to_run = Event()
+        self.stop_flag = Event()
+        self.heartbeat_interval = None
+        self.compress = compress
+        self.encoding = encoding
+        self._decode, self._encode, self._opcode = ENCODINGS[encoding]
+
+        self._conn = None
+        self._inflator = None
+        self._started = False
+        self._finished = Event()
+        self._stop_event = None
+        self._init_task = None
+        self._heartbeat_handle = None
+        self._heartbeat_acked = True
+
+    def start(self):
+        """Starts the client on the event loop.
+
+        Like threads, a client can only be started once.
+        """
+        if self._started:
+            raise RuntimeError("clients can only be started once")
+        self._started = True
+        if self.loop is None:
+            self.loop = EventLoopThread.get_loop()
+        asyncio.run_coroutine_threadsafe(self.run_async(), self.loop)
 
-        self._sock = None
+    def join(self, timeout=None):
+        """Waits until the client stops. Returns False on timeout."""
+        return self._finished.wait(timeout)
 
-        self.heartbeat_thread = None
-        self.init_thread = None
+    def is_alive(self):
+        return self._started and not self._finished.is_set()
 
-    def run(self):
-        """Start the heartbeat and run _event_loop in a loop until .stop calls.
+    async def run_async(self):
+        """Connects and runs _event_loop in a loop until .stop is called.
 
-        heartbeat_thread, init_thread gets created in this method, as well as
-        .cleanup method which gets called after the socket disconnects.
+        .init_connection gets scheduled as a task whenever the connection is
+        established, and .cleanup gets called after the socket disconnects.
 
         Since the connection restarts after the socket has been disconnected,
-        if a problem occurs from eg. heartbeat thread or init thread, you can
-        call ._sock.stop method to stop the socket and reconnect.
+        if a problem occurs from eg. heartbeat or .init_connection, you can
+        call .reconnect method to drop the socket and reconnect.
         """
-        self._sock = WebSocket(
-            enable_multithread=True, skip_utf8_validation=True
-        )
-        self.run_heartbeat()
+        if self._stop_event is not None:
+            raise RuntimeError("clients can only be started once")
+        self._started = True
+        self.loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
 
-        while True:
-            logger.info("Connecting to Gateway...")
-            try:
-                self._sock.connect(self.url)
-            except Exception:
-                logger.exception("Failed to connect to Gateway.")
-                continue
+        try:
+            while not self.stop_flag.is_set():
+                logger.info("Connecting to Gateway...")
+                try:
+                    self._conn = await WebSocketConnection.connect(
+                        self.get_url()
+                    )
+                except Exception:
+                    logger.exception("Failed to connect to Gateway.")
+                    await self._wait_reconnect()
+                    continue
 
-            self.run_init_connection()
+                if self.compress:
+                    self._inflator = ZlibStreamInflator()
 
-            self._event_loop()
+                self._init_task = self.loop.create_task(self._run_init())
 
-            logger.warning("Gateway connection is lost!")
+                await self._event_loop()
 
-            self.ready_to_run.clear()
-            try:
-                self.cleanup()
-            except Exception:
-                logger.exception("Exception occured while cleaning up.")
+                logger.warning("Gateway connection is lost!")
 
-            if self.stop_flag.is_set():
-                break
-            else:
-                time.sleep(random.randint(1, 5))
+                self._teardown()
 
-        logger.info("Stopping thread...")
+                if self.stop_flag.is_set():
+                    break
+                await self._wait_reconnect()
+        finally:
+            logger.info(f"Stopping {self.name}...")
+            self.ready_to_run.clear()
+            self._finished.set()
 
-        self.heartbeat_thread.stop()
+    async def _wait_reconnect(self):
+        try:
+            await asyncio.wait_for(
+                self._stop_event.wait(), random.randint(1, 5)
+            )
+        except asyncio.TimeoutError:
+            pass
 
-        self.ready_to_run.clear()
+    async def _run_init(self):
+        try:
+            await self.init_connection()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Exception occured while initializing.")
+            self.reconnect()
 
-    def run_heartbeat(self):
-        logger.info("Starting heartbeat thread.")
-        self.heartbeat_thread = StoppableThread(
-            target=self.do_heartbeat, name=f"{self.name}_heartbeat"
-        )
-        self.heartbeat_thread.start()
+    def _teardown(self):
+        self._stop_heartbeat()
+        if self._init_task is not None:
+            self._init_task.cancel()
+            self._init_task = None
 
-    def run_init_connection(self):
-        logger.info("Starting init thread.")
-        self.init_thread = StoppableThread(
-            target=self.init_connection, name=f"{self.name}_init"
-        )
-        self.init_thread.start()
+        self._conn.close(status=1006)
+        self.ready_to_run.clear()
+        try:
+            self.cleanup()
+        except Exception:
+            logger.exception("Exception occured while cleaning up.")
 
-    def _event_loop(self):
+    async def _event_loop(self):
         """
-        Receives from _socket, parses it to JSON and passes it to dispatcher.
+        Receives from _conn, decodes it and passes it to dispatcher.
         """
-        while self._sock.connected:
-            rl, _, _ = select.select(
-                (self._sock.sock,), (), (), SELECT_TIMEOUT
-            )
+        conn = self._conn
+        decode = self._decode
 
-            if self._sock.sock not in rl:
-                if not self._sock.sock:
-                    logger.warning("Gateway connection severed!")
-                    break
-                else:
-                    continue
+        while True:
             try:
-                opcode, data = self._sock.recv_data()
-                if opcode == ABNF.OPCODE_TEXT:
-                    data = data.decode()
-                elif opcode == ABNF.OPCODE_CLOSE:
-                    code, reason = self._get_close_args(data)
-                    if code:
-                        logger.warning(
-                            "Gateway connection closed with Code "
-                            f"{code}: {reason}"
-                        )
-                    self.on_close(code, reason)
-                    break
-                elif not data:
-                    logger.warning("No Data! Gateway Connection Dropped?")
-                    break
-                parsed_data = json.loads(data)
-            except json.JSONDecodeError:
-                logger.error(f"Gateway returned invalid JSON data:\n{data}")
-            except WebSocketConnectionClosedException:
+                opcode, data = await conn.recv()
+            except (asyncio.IncompleteReadError, OSError):
+                logger.warning("Gateway connection severed!")
                 break
-            except OSError as e:
-                if e.args[0] != 9:
-                    raise
-            except Exception:
-                logger.exception(
-                    "Exception occured while receiving data from the gateway."
-                )
+
+            if opcode == ABNF.OPCODE_CLOSE:
+                code, reason = self._get_close_args(data)
+                if code:
+                    logger.warning(
+                        f"Gateway connection closed with Code {code}: {reason}"
+                    )
+                self.on_close(code, reason)
+                break
+
+            if opcode == ABNF.OPCODE_BINARY and self._inflator is not None:
+                data = self._inflator.feed(data)
+                if data is None:
+                    continue
 
             try:
-                logger.debug("Received " + data)
+                parsed_data = decode(data)
+            except ValueError:
+                logger.error(f"Gateway returned invalid data:\n{data}")
+                continue
+
+            try:
+                logger.debug("Received %s", data)
                 self.dispatcher(parsed_data)
             except Exception:
                 logger.exception(
@@ -204,72 +535,137 @@ class WebSocketThread(StoppableThread):
                 )
 
     def _get_close_args(self, close_frame):
-        if close_frame is None:
-            return [None, None]
-
         if close_frame and len(close_frame) >= 2:
             close_status_code = 256 * close_frame[0] + close_frame[1]
-            reason = close_frame[2:].decode("utf-8")
+            reason = close_frame[2:].decode("utf-8", "replace")
             return [close_status_code, reason]
         else:
             # Most likely reached this because len(close_frame_data.data) < 2
             return [None, None]
 
-    def send(self, data, retry=5, i=0):
-        """serializes data to json if dict, and send it through the socket.
+    def _in_loop(self):
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+
+    def _call(self, func, *args):
+        """Calls func on the event loop, from whichever thread."""
+        if self.loop is None:
+            return
+        if self._in_loop():
+            func(*args)
+        else:
+            self.loop.call_soon_threadsafe(func, *args)
+
+    def send(self, data):
+        """serializes data if dict, and send it through the socket.
 
-        I strongly encourage you to use this method instead of _sock.send,
-        because this method is meant to solve the SSLError caused by ssl module
-        by catching the exception and running the method recursively.
+        This method is safe to be called from any thread. The frame is built
+        in the calling thread, and written by the event loop.
+
+        Returns:
+            False if the client is not connected, True otherwise.
         """
-        if i == retry:
+        conn = self._conn
+        if conn is None or not conn.connected:
+            logger.warning("Not connected, dropping outgoing payload.")
             return False
 
         if isinstance(data, dict):
-            data = json.dumps(data)
+            data = self._encode(data)
 
-        try:
-            logger.debug("Sent " + data)
-            return self._sock.send(data)
-        except SSLError:
-            logger.exception("SSLError while sending data! retrying...")
-            time.sleep(3)
-            return self.send(data, retry, i + 1)
-        except Exception:
-            logger.exception("Unexpected error while sending data!")
+        logger.debug("Sent %s", data)
+        self._call(conn.write, conn.frame(data, self._opcode))
+        return True
+
+    async def send_async(self, data):
+        """Same as .send, but waits until the data has been flushed."""
+        if self.send(data):
+            await self._conn.drain()
+
+    def start_heartbeat(self, interval):
+        """Starts sending heartbeats every interval seconds.
+
+        Should be called on the event loop, typically when HELLO is received.
+        The first heartbeat is sent after interval * random.random() seconds
+        as Discord requires, so that clients reconnecting together don't
+        heartbeat together. If a heartbeat hasn't been acknowledged by the
+        time the next one is due, the connection gets reestablished.
+        """
+        self._stop_heartbeat()
+        self.heartbeat_interval = interval
+        self._heartbeat_acked = True
+        self._heartbeat_handle = self.loop.call_later(
+            interval * random.random(), self._heartbeat
+        )
+
+    def ack_heartbeat(self):
+        """Marks the last heartbeat as acknowledged."""
+        self._heartbeat_acked = True
+
+    def _heartbeat(self):
+        self._heartbeat_handle = None
+
+        if not self._heartbeat_acked:
+            logger.error("Warning! No HEARTBEAT_ACK received within time!")
+            self.reconnect()
+            return
+
+        self._heartbeat_acked = False
+        logger.debug("Sending heartbeat...")
+        self.send_heartbeat()
+
+        self._heartbeat_handle = self.loop.call_later(
+            self.heartbeat_interval, self._heartbeat
+        )
+
+    def _stop_heartbeat(self):
+        if self._heartbeat_handle is not None:
+            self._heartbeat_handle.cancel()
+            self._heartbeat_handle = None
 
     def is_ready(self):
         return self.ready_to_run.is_set()
 
-    def reconnect(self, status=1006, *args, **kwargs):
+    def reconnect(self, status=1006, reason=b""):
         logger.info(f"Attempting reconnect: code {status}")
-        self._sock.close(status=1006, *args, **kwargs)
+        if self._conn is not None:
+            self._call(self._conn.close, status, reason)
+
+    def get_url(self):
+        """Returns the URL to connect to, called on every connection."""
+        return self.url
 
     def stop(self, status=1000):
         """Stops the gateway connection.
 
-        This client cannot be started after this method has been called, since
-        .start method in Thread object can only be called once per instances.
-        if you have to restart the client, you have to create a new instance.
+        This client cannot be started after this method has been called. if
+        you have to restart the client, you have to create a new instance.
         """
-        super(WebSocketThread, self).stop()
-        self._sock.close(status=status)
+        self.stop_flag.set()
+        self._call(self._stop, status)
+
+    def _stop(self, status):
+        if self._stop_event is not None:
+            self._stop_event.set()
+        if self._conn is not None:
+            self._conn.close(status)
 
-    def init_connection(self):
-        """Method to be run when websocket connection establishes.
+    async def init_connection(self):
+        """Coroutine to be run when websocket connection establishes.
 
-        This method is expected to run shortly, if a problem occurs during the
-        procedure, run .reconnect method which will reestablish the connection.
+        This runs as a task alongside ._event_loop, so it could wait for the
+        responses from the gateway. if a problem occurs during the procedure,
+        raise an exception or run .reconnect method which will reestablish
+        the connection.
 
         This method should be implemented by the inherited client.
         """
         raise NotImplementedError()
 
-    def do_heartbeat(self):
-        """Method to be run when websocket connection establishes.
-
-        This method runs throughout the main thread's lifetime, so you should
-        consider that while overriding the method.
+    def send_heartbeat(self):
+        """Method to send a single heartbeat.
 
         This method should be implemented by the inherited class.
         """
@@ -285,7 +681,9 @@ class WebSocketThread(StoppableThread):
 
         Args:
             code:
-
+                Close code sent by the server, or None.
+            reason:
+                Close reason sent by the server, or None.
         """
         pass
 
@@ -298,3 +696,7 @@ class WebSocketThread(StoppableThread):
         Whether to override this method or not is your choice.
         """
         pass
+
+
+# The threaded client this replaced, AsyncWebSocketClient keeps its interface
+WebSocketThread = AsyncWebSocketClient
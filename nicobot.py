@@ -1,6 +1,7 @@
 from discordapi import DiscordClient, CommandError, EmbedCommandManager, \
                        ThreadedCommandEventHandler, QueuedAudioPlayer, \
-                       FFMPEGAudioSource, Embed, CDN_URL
+                       FFMPEGAudioSource, PrefetchAudioSource, Embed, \
+                       CDN_URL, WorkerPool
 from niconico import NicoPlayer
 
 import os
@@ -110,7 +111,8 @@ class NicoBot(EmbedCommandManager):
             color=self.color
         )
         embed.set_thumbnail(songthumb)
-        textchannel.send(embed=embed)
+        # Called from the player, which shouldn't wait for the message
+        textchannel.client.submit(textchannel.send, embed=embed)
 
     def execute_cmd(self, cmdinput, message):
         if message.guild is None:
@@ -162,7 +164,9 @@ class NicoBot(EmbedCommandManager):
         elif type_ == 1:
             videos = [player.get_thumb_info(val)]
 
-        sources = [NicoAudioSource(video) for video in videos]
+        sources = [
+            PrefetchAudioSource(NicoAudioSource(video)) for video in videos
+        ]
 
         if len(sources) == 1:
             video = videos[0]
@@ -284,7 +288,7 @@ class NicobotHandler(ThreadedCommandEventHandler):
         self.on_ready(obj)
 
 
-handler = NicobotHandler(NicoBot, "?")
+handler = NicobotHandler(NicoBot, "?", pool=WorkerPool())
 
 client = DiscordClient(
     open("token").read(),
@@ -18,16 +18,43 @@
 #    along with this program.  If not, see <https://www.gnu.org/licenses/>.
 #
 
+import os
 import re
-import json
 import requests
 from base64 import b64decode
+from importlib import import_module
 from urllib.parse import urljoin
 from collections import namedtuple
 from threading import Thread, Event
 from bs4 import BeautifulSoup as bs
 from xml.etree import ElementTree as ET
 
+# In the order of preference, same as discordapi.codec
+JSON_BACKENDS = ("orjson", "ujson", "json")
+
+
+def _load_json(name=None):
+    """Returns (loads, dumps) of the JSON library, the first one if None.
+
+    niconico doesn't depend on discordapi, but picks the library the same
+    way, honouring the NICOBOT_JSON environment variable.
+    """
+    if name is not None:
+        if name not in JSON_BACKENDS:
+            raise ValueError(f"Unknown JSON backend '{name}'")
+        module = import_module(name)
+        return module.loads, module.dumps
+
+    for name in JSON_BACKENDS:
+        try:
+            module = import_module(name)
+        except ImportError:
+            continue
+        return module.loads, module.dumps
+
+
+json_loads, json_dumps = _load_json(os.environ.get("NICOBOT_JSON") or None)
+
 User = namedtuple("User", ("id", "name", "thumbnail"))
 Mylist = namedtuple("Mylist", ("id", "name", "description", "owner", "items"))
 Video = namedtuple(
@@ -120,7 +147,7 @@ class NicoPlayer:
             url = self.MYLIST_URL.format(id_, pagesize, index)
             r = self.session.get(url)
             r.raise_for_status()
-            data = r.json()["data"]["mylist"]
+            data = json_loads(r.content)["data"]["mylist"]
 
             _id = data['id']
             name = data['name']
@@ -168,7 +195,7 @@ class NicoPlayer:
         url = f"{self.SEARCH_URL}?{arg}"
 
         r = self.session.get(url)
-        data = r.json()
+        data = json_loads(r.content)
 
         if r.status_code != 200:
             meta = data['meta']
@@ -277,7 +304,7 @@ class NicoDMCVideo:
         r.raise_for_status()
         soup = bs(r.content, "html.parser")
         data_container = soup.find("div", {"id": "jsDataContainer"})
-        self.watch_data = json.loads(data_container['data-context'])
+        self.watch_data = json_loads(data_container['data-context'])
 
         self.action_track_id = self.watch_data['action_track_id']
         self.frontend_id = self.watch_data['frontend_id']
@@ -306,7 +333,7 @@ class NicoDMCVideo:
 
         r = self.session.get(url, headers=headers)
         r.raise_for_status()
-        self.api_data = r.json()
+        self.api_data = json_loads(r.content)
 
         data = self.api_data['data']['media']['delivery']['movie']['session']
         self.video_quality = data['videos']
@@ -386,11 +413,11 @@ class NicoDMCVideo:
 
     def init_dmc(self):
         headers = {"Content-Type": "application/json"}
-        data = json.dumps(self.dmc_postdata)
+        data = json_dumps(self.dmc_postdata)
         url = self.DMC_URL + "?_format=json"
         r = self.session.post(url, headers=headers, data=data)
         r.raise_for_status()
-        self.heartbeat_data = r.json()['data']
+        self.heartbeat_data = json_loads(r.content)['data']
         self.session_id = self.heartbeat_data['session']['id']
         self.HEARTBEAT_URL = urljoin(self.DMC_URL + "/", self.session_id)
         self.m3u8_url = self.heartbeat_data['session']['content_uri']
@@ -408,7 +435,7 @@ class NicoDMCVideo:
         headers = {"Content-Type": "application/json"}
         while not self.stop_flag.is_set():
             self.stop_flag.wait(self.heartbeat_interval)
-            data = json.dumps(self.heartbeat_data)
+            data = json_dumps(self.heartbeat_data)
             r = self.session.post(url, headers=headers, data=data)
             r.raise_for_status()
-            self.heartbeat_data = r.json()['data']
+            self.heartbeat_data = json_loads(r.content)['data']
@@ -0,0 +1,127 @@
+import os
+import sys
+import threading
+from multiprocessing import Pipe
+
+import pytest
+
+projpath = os.path.normpath(os.path.join(os.path.abspath(__file__), "../.."))
+sys.path.insert(0, projpath)
+
+from discordapi import Cluster, ClusterError, get_shard_id
+from discordapi.cluster import IPCConnection
+from .test_websocket import FakeGateway, wait_until
+
+SHARD_COUNT = 4
+# Two guilds per shard
+GUILD_IDS = [str((x + 4) << 22) for x in range(SHARD_COUNT * 2)]
+
+
+def setup(worker):
+    @worker.register("peer_name")
+    def peer_name(worker, guild_id, other_id):
+        # Asked from the worker owning guild_id, about a guild of another
+        return worker.cluster_id, worker.get_guild(other_id)["name"]
+
+
+def dispatch(send, event, seq, data):
+    send({"t": event, "s": seq, "op": 0, "d": data})
+
+
+class FakeShardedGateway(FakeGateway):
+    """Sends READY and GUILD_CREATEs of the shard after IDENTIFY."""
+
+    def __init__(self):
+        self.shards = {}
+        self.voice_states = []
+        super(FakeShardedGateway, self).__init__(
+            self.handle, self.hello
+        )
+
+    def hello(self, send):
+        send({"t": None, "s": None, "op": 10,
+              "d": {"heartbeat_interval": 45000}})
+
+    def handle(self, message, send):
+        if message["op"] == 2:
+            shard_id, shard_count = message["d"]["shard"]
+            self.shards[send] = shard_id
+            guild_ids = [x for x in GUILD_IDS
+                         if get_shard_id(x, shard_count) == shard_id]
+
+            dispatch(send, "READY", 1, {
+                "user": {"id": "1", "username": "bot",
+                         "discriminator": "0000"},
+                "guilds": [{"id": x, "unavailable": True}
+                           for x in guild_ids],
+                "session_id": f"session{shard_id}",
+                "application": {"id": "1", "flags": 0},
+            })
+            for seq, guild_id in enumerate(guild_ids, 2):
+                dispatch(send, "GUILD_CREATE", seq, {
+                    "id": guild_id, "name": f"guild {guild_id}",
+                    "channels": [{"id": guild_id, "type": 2,
+                                  "name": "voice", "guild_id": guild_id}],
+                    "members": [],
+                })
+
+        elif message["op"] == 4:
+            self.voice_states.append(
+                (self.shards[send], message["d"]["guild_id"])
+            )
+
+
+def test_cluster():
+    server = FakeShardedGateway()
+    cluster = Cluster(
+        "token", cluster_count=2, shard_count=SHARD_COUNT,
+        max_concurrency=SHARD_COUNT, setup=setup,
+        gateway_url=server.url.partition("?")[0],
+    )
+    try:
+        cluster.start()
+        assert cluster.wait_ready(30)
+        assert len(server.shards) == SHARD_COUNT
+
+        first, last = GUILD_IDS[0], GUILD_IDS[-1]
+        assert cluster.clusters[get_shard_id(first, SHARD_COUNT)] == 0
+        assert cluster.clusters[get_shard_id(last, SHARD_COUNT)] == 1
+
+        guild = cluster.get_guild(last)
+        assert guild["name"] == f"guild {last}"
+        assert guild["channels"][0]["type"] == 2
+        assert cluster.call(first, "peer_name", last) == \
+            (0, f"guild {last}")
+
+        cluster.update_voice_state(last, last)
+        assert wait_until(lambda: server.voice_states)
+        assert server.voice_states == \
+            [(get_shard_id(last, SHARD_COUNT), last)]
+    finally:
+        cluster.stop()
+        assert cluster.join(20)
+        server.close()
+
+
+def test_ipc_unpicklable():
+    def on_request(command, args):
+        if command == "lock":
+            return threading.Lock()
+        return args
+
+    parent, child = Pipe()
+    client = IPCConnection(parent, lambda command, args: None)
+    server = IPCConnection(child, on_request)
+    client.start()
+    server.start()
+
+    try:
+        with pytest.raises(ClusterError):
+            client.request("lock").result(timeout=5)
+        with pytest.raises(ClusterError):
+            client.request("echo", threading.Lock()).result(timeout=5)
+        assert client._pending == {}
+        assert client.request("echo", 1).result(timeout=5) == (1,)
+    finally:
+        client.close()
+        server.close()
@@ -0,0 +1,52 @@
+import os
+import sys
+import importlib
+
+import pytest
+
+projpath = os.path.normpath(os.path.join(os.path.abspath(__file__), "../.."))
+sys.path.insert(0, projpath)
+
+from discordapi import codec
+from discordapi import json_loads, json_dumps, set_json_backend, peek_event
+
+
+@pytest.fixture(params=codec.JSON_BACKENDS)
+def backend(request):
+    if importlib.util.find_spec(request.param) is None:
+        pytest.skip(f"{request.param} is not installed")
+
+    previous = codec.get_json_backend()
+    set_json_backend(request.param)
+    yield request.param
+    set_json_backend(previous)
+
+
+def test_roundtrip(backend):
+    payload = {
+        "op": 0,
+        "d": {"content": "ニコニコ", "id": "769981832006598718",
+              "embeds": [], "tts": False, "nonce": None, "x": 1.5},
+    }
+    data = json_dumps(payload)
+    assert isinstance(data, bytes)
+    assert "ニコニコ".encode() in data
+    assert json_loads(data) == payload
+    assert json_loads(data.decode()) == payload
+
+
+def test_invalid(backend):
+    with pytest.raises(ValueError):
+        json_loads(b"{invalid")
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        set_json_backend("simdjson")
+
+
+def test_peek_event():
+    data = b'{"t":"TYPING_START","s":42,"op":0,"d":{"t":"MESSAGE_CREATE"}}'
+    assert peek_event(data) == ("TYPING_START", 42)
+    assert peek_event(b'{"t":null,"s":null,"op":11,"d":null}') is None
+    assert peek_event(b'{"op":0,"d":{"t":"A","s":1},"t":"B","s":2}') is None
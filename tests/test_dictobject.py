@@ -0,0 +1,125 @@
+import os
+import sys
+
+import pytest
+
+projpath = os.path.normpath(os.path.join(os.path.abspath(__file__), "../.."))
+sys.path.insert(0, projpath)
+
+from discordapi import DictObject, Message, Member, User
+from discordapi import CompactMember, CompactUser, CompactGuildTextChannel
+from discordapi import get_channel, make_member
+
+
+class FakeGuild:
+    id = "2"
+
+    def __init__(self):
+        self.channel = object()
+
+    def get_channel(self, id_):
+        return self.channel if id_ == "3" else None
+
+
+class FakeClient:
+    compact = False
+
+    def __init__(self):
+        self.guild = FakeGuild()
+        self.guild_lookups = 0
+
+    def get_guild(self, id_):
+        self.guild_lookups += 1
+        return self.guild if id_ == "2" else None
+
+    def get_channel(self, id_):
+        return self.guild.get_channel(id_)
+
+
+def make_message():
+    user = {"id": "4", "username": "nico", "discriminator": "0001",
+            "avatar": "abcd"}
+    return {
+        "id": "1", "guild_id": "2", "channel_id": "3", "content": "hi",
+        "author": user, "member": {"nick": "nico", "roles": []},
+        "mentions": [user],
+        "referenced_message": {"id": "0", "channel_id": "3",
+                               "content": "hello", "author": user},
+    }
+
+
+@pytest.fixture(params=[False, True], ids=["eager", "lazy"])
+def lazy(request, monkeypatch):
+    monkeypatch.setattr(DictObject, "lazy", request.param)
+    return request.param
+
+
+def test_message(lazy):
+    client = FakeClient()
+    message = Message(client, make_message())
+
+    assert ("author" in message.__dict__) is not lazy
+    assert message.content == "hi"
+    assert message.guild is client.guild
+    assert message.channel is client.guild.channel
+    assert isinstance(message.author, User)
+    assert message.author.avatar.endswith("avatars/4/abcd.png")
+    assert isinstance(message.member, Member)
+    assert message.member.user is message.author
+    assert message.mentions == [message.author]
+    assert message.referenced_message.content == "hello"
+    assert message.referenced_message.guild is None
+    assert message.nonce is None
+    with pytest.raises(AttributeError):
+        message.nonexistent
+
+    # Resolved only once
+    assert message.author is message.author
+    assert client.guild_lookups == 1
+
+
+def test_reinit(lazy):
+    client = FakeClient()
+    member = Member(client, client.guild, {
+        "user": {"id": "4", "username": "nico"}, "nick": "nico",
+        "roles": ["5"],
+    })
+    user = member.user
+
+    member.__init__(client, client.guild, {"nick": "nicobot"})
+    assert member.nick == "nicobot"
+    assert member.roles == ["5"]
+    assert member.user is user
+
+    member.__init__(client, client.guild, {"user": {"id": "4",
+                                                    "username": "bot"}})
+    assert member.user.username == "bot"
+    assert member.nick == "nicobot"
+
+
+def test_compact():
+    client = FakeClient()
+    client.compact = True
+    data = {"user": {"id": "4", "username": "nico", "avatar": "abcd"},
+            "nick": "nico", "roles": ["5"]}
+    member = make_member(client, client.guild, data)
+
+    assert isinstance(member, CompactMember)
+    assert isinstance(member.user, CompactUser)
+    assert not hasattr(member, "__dict__")
+    assert not hasattr(member.user, "__dict__")
+    assert member._json is None and member.user._json is None
+    assert member.nick == "nico"
+    assert member.user.avatar.endswith("avatars/4/abcd.png")
+    assert member.pending is None
+
+    member.__init__(client, client.guild, {"nick": "nicobot"})
+    assert member.nick == "nicobot"
+    assert member.roles == ["5"]
+
+    channel = get_channel(client, {"id": "3", "type": 0, "name": "general"},
+                          client.guild)
+    assert isinstance(channel, CompactGuildTextChannel)
+    assert not hasattr(channel, "__dict__")
+    assert channel.guild is client.guild
+    assert channel.name == "general"
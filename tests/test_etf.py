@@ -0,0 +1,81 @@
+import os
+import sys
+import zlib
+import struct
+
+import pytest
+
+projpath = os.path.normpath(os.path.join(os.path.abspath(__file__), "../.."))
+sys.path.insert(0, projpath)
+
+from discordapi import etf
+from discordapi import etf_pack, etf_unpack
+
+
+def atom(name):
+    return bytes((etf.SMALL_ATOM_UTF8_EXT, len(name))) + name
+
+
+def binary(value):
+    return struct.pack(">BI", etf.BINARY_EXT, len(value)) + value
+
+
+def test_unpack_gateway_shapes():
+    snowflake = 769981832006598718
+    data = bytes((etf.VERSION,)) + struct.pack(">BI", etf.MAP_EXT, 6)
+    data += atom(b"id") + struct.pack(
+        ">BBB", etf.SMALL_BIG_EXT, 8, 0
+    ) + snowflake.to_bytes(8, "little")
+    data += atom(b"name") + binary("ニコ".encode())
+    data += atom(b"nick") + atom(b"nil")
+    data += atom(b"bot") + atom(b"true")
+    data += atom(b"key") + struct.pack(">BH", etf.STRING_EXT, 3) \
+        + b"\x01\x02\x03"
+    data += atom(b"list") + struct.pack(">BI", etf.LIST_EXT, 3) \
+        + struct.pack(">BB", etf.SMALL_INTEGER_EXT, 5) \
+        + struct.pack(">Bi", etf.INTEGER_EXT, -70000) \
+        + struct.pack(">Bd", etf.NEW_FLOAT_EXT, 1.5) \
+        + bytes((etf.NIL_EXT,))
+
+    assert etf_unpack(data) == {
+        "id": str(snowflake),
+        "name": "ニコ",
+        "nick": None,
+        "bot": True,
+        "key": [1, 2, 3],
+        "list": [5, -70000, 1.5],
+    }
+
+    body = data[1:]
+    compressed = bytes((etf.VERSION, etf.COMPRESSED)) \
+        + struct.pack(">I", len(body)) + zlib.compress(body)
+    assert etf_unpack(compressed) == etf_unpack(data)
+
+
+@pytest.mark.parametrize("use_erlpack", [False, True])
+def test_roundtrip(monkeypatch, use_erlpack):
+    if use_erlpack and etf.erlpack is None:
+        pytest.skip("erlpack is not installed")
+    if not use_erlpack:
+        monkeypatch.setattr(etf, "erlpack", None)
+
+    payload = {
+        "op": 2,
+        "d": {
+            "token": "token",
+            "intents": 32509,
+            "properties": {"$os": "linux"},
+            "presence": {"since": 1633264496000.0, "activities": [],
+                         "afk": False, "status": None},
+            "shard": [0, 1],
+            "large": -(1 << 40),
+        },
+    }
+    assert etf_unpack(etf_pack(payload)) == payload
+
+
+def test_malformed():
+    with pytest.raises(ValueError):
+        etf_unpack(b"\x83t\x00\x00\x00\x01")
+    with pytest.raises(ValueError):
+        etf_unpack(b"\x00")
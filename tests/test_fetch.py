@@ -0,0 +1,76 @@
+import os
+import sys
+import threading
+
+projpath = os.path.normpath(os.path.join(os.path.abspath(__file__), "../.."))
+sys.path.insert(0, projpath)
+
+from discordapi import Message
+from .test_ratelimit import MockDiscord, KeepAliveHandler, make_client
+
+
+class EntityServer(MockDiscord):
+    """Serves a guild, and a text channel in it per channel id."""
+
+    def __init__(self):
+        super(EntityServer, self).__init__(KeepAliveHandler)
+        self.paths = []
+
+    def respond(self, path):
+        with self.lock:
+            self.requests += 1
+            self.paths.append(path)
+
+        route = path.partition("?")[0].split("/")
+        if route[1] == "guilds":
+            body = {"id": route[2], "name": "guild", "roles": []}
+        else:
+            body = {"id": route[2], "type": 0, "guild_id": "100"}
+        return 200, {}, body
+
+
+def test_message_burst():
+    server = EntityServer()
+    server.delay = 0.2
+    client = make_client(server)
+    client.guilds = {}
+    messages = []
+
+    def receive(index):
+        data = {"id": str(index), "channel_id": "10", "content": ""}
+        messages.append(Message(client, data))
+
+    try:
+        threads = [threading.Thread(target=receive, args=(x,))
+                   for x in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sorted(server.paths) == [
+            "/channels/10", "/guilds/100?with_counts=false"
+        ]
+
+        channel = client.get_channel("10")
+        assert channel is not None
+        assert all(message.channel is channel for message in messages)
+        assert client.get_guild("100") is channel.guild
+
+        Message(client, {"id": "20", "channel_id": "10", "content": ""})
+        assert server.requests == 2
+    finally:
+        server.close()
+
+
+def test_cached_guild_kept():
+    server = EntityServer()
+    client = make_client(server)
+    client.guilds = {"100": "complete"}
+    try:
+        guild = client.fetch_guild("100")
+    finally:
+        server.close()
+
+    assert guild.id == "100"
+    assert client.get_guild("100") == "complete"
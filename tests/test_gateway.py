@@ -0,0 +1,67 @@
+import os
+import sys
+
+projpath = os.path.normpath(os.path.join(os.path.abspath(__file__), "../.."))
+sys.path.insert(0, projpath)
+
+from discordapi import DiscordClient, MethodEventHandler
+from discordapi import DecoratorEventHandler, GeneratorEventHandler
+
+
+class Handler(MethodEventHandler):
+    def on_message_create(self, obj):
+        pass
+
+
+def dispatch(client, event, seq, payload="{}"):
+    data = f'{{"t":"{event}","s":{seq},"op":0,"d":{payload}}}'.encode()
+    submitted = []
+    client._dispatch_executor.submit = \
+        lambda func, *args: submitted.append(args)
+    client._dispatcher(client._decode(data))
+    return submitted
+
+
+def test_event_filter():
+    client = DiscordClient(token="token", handler=Handler)
+    assert "MESSAGE_CREATE" in client.wanted_events
+    assert "GUILD_CREATE" in client.wanted_events
+    assert "TYPING_START" not in client.wanted_events
+
+    # Skipped without decoding, but the sequence is still tracked
+    assert not dispatch(client, "TYPING_START", 5, "{invalid")
+    assert client.seq == 5
+    assert dispatch(client, "MESSAGE_CREATE", 6) == [("MESSAGE_CREATE", {})]
+    assert client.seq == 6
+
+    handler = DecoratorEventHandler()
+    client.set_handler(handler)
+    assert not dispatch(client, "TYPING_START", 7)
+
+    @handler.on("typing_start")
+    def on_typing_start(obj, handler):
+        pass
+
+    assert dispatch(client, "TYPING_START", 8)
+
+    client.set_handler(GeneratorEventHandler)
+    assert client.wanted_events is None
+    assert dispatch(client, "PRESENCE_UPDATE", 9)
+
+
+def test_handle_overridden():
+    class AllHandler(MethodEventHandler):
+        def handle(self, event, obj):
+            pass
+
+    class LoggingHandler(Handler):
+        def handle(self, event, obj):
+            super(LoggingHandler, self).handle(event, obj)
+
+    for handler in (AllHandler, LoggingHandler):
+        client = DiscordClient(token="token", handler=handler)
+        assert client.wanted_events is None
+        assert dispatch(client, "TYPING_START", 1)
+
+    client.set_handler(Handler)
+    assert client.wanted_events is not None
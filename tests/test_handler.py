@@ -0,0 +1,78 @@
+import os
+import sys
+import time
+import threading
+
+import pytest
+
+projpath = os.path.normpath(os.path.join(os.path.abspath(__file__), "../.."))
+sys.path.insert(0, projpath)
+
+from discordapi import WorkerPool, ThreadedCommandEventHandler
+from discordapi import CommandManager
+
+
+def test_guild_order():
+    pool = WorkerPool(workers=4)
+    results = {"1": [], "2": []}
+
+    def handle(guild_id, index):
+        time.sleep(0.001)
+        results[guild_id].append(index)
+
+    for index in range(50):
+        for guild_id in results:
+            pool.submit("MESSAGE_CREATE", {"guild_id": guild_id},
+                        handle, guild_id, index)
+    pool.stop()
+    pool.join()
+
+    assert results["1"] == results["2"] == list(range(50))
+    metrics = pool.metrics()
+    assert metrics["handled"] == 100 and metrics["queue_depth"] == 0
+    assert metrics["latency_max"] >= metrics["latency_avg"] > 0
+
+
+@pytest.mark.parametrize("overflow", ["drop", "shed"])
+def test_overflow(overflow):
+    pool = WorkerPool(workers=1, maxsize=1, overflow=overflow)
+    started = threading.Event()
+    release = threading.Event()
+
+    def block():
+        started.set()
+        release.wait()
+
+    assert pool.submit("MESSAGE_CREATE", {}, block)
+    started.wait()
+    assert pool.submit("MESSAGE_CREATE", {}, lambda: None)
+    assert not pool.submit("TYPING_START", {}, lambda: None)
+
+    if overflow == "shed":
+        threading.Timer(0.1, release.set).start()
+        assert pool.submit("MESSAGE_CREATE", {}, lambda: None)
+    else:
+        assert not pool.submit("MESSAGE_CREATE", {}, lambda: None)
+        release.set()
+
+    pool.stop()
+    pool.join()
+    assert pool.dropped == (1 if overflow == "shed" else 2)
+
+
+def test_unknown_overflow():
+    with pytest.raises(ValueError):
+        WorkerPool(overflow="ignore")
+
+
+def test_command_handler():
+    handled = threading.Event()
+
+    class Handler(ThreadedCommandEventHandler):
+        def on_ready(self, obj):
+            assert threading.current_thread().name.startswith("handler_")
+            handled.set()
+
+    pool = WorkerPool(workers=1)
+    Handler(CommandManager, "?", pool=pool).handle("READY", {})
+    assert handled.wait(1)
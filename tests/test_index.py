@@ -0,0 +1,83 @@
+import os
+import sys
+
+import pytest
+
+projpath = os.path.normpath(os.path.join(os.path.abspath(__file__), "../.."))
+sys.path.insert(0, projpath)
+
+from discordapi import DiscordClient
+
+
+def make_guild(id_, channel_ids, user_ids):
+    return {
+        "id": id_,
+        "name": f"guild {id_}",
+        "channels": [{"id": channel_id, "type": 0, "guild_id": id_}
+                     for channel_id in channel_ids],
+        "members": [{"user": {"id": user_id, "username": f"user{user_id}"}}
+                    for user_id in user_ids],
+    }
+
+
+def test_index():
+    client = DiscordClient(token="token")
+    client.guilds = {}
+    parser = client.event_parser
+
+    parser.on_guild_create(make_guild("1", ["10", "11"], ["100", "101"]))
+    parser.on_guild_create(make_guild("2", ["20"], ["100"]))
+    assert client.get_channel("11").guild is client.get_guild("1")
+    assert client.get_channel("20").guild is client.get_guild("2")
+    assert set(client.get_users()) == {"100", "101"}
+
+    parser.on_channel_create({"id": "12", "type": 0, "guild_id": "1"})
+    parser.on_channel_delete({"id": "10", "type": 0, "guild_id": "1"})
+    assert client.get_channel("12") is client.get_guild("1").channels["12"]
+    assert client.get_channel("10") is None
+
+    parser.on_guild_member_remove({"guild_id": "1", "user": {"id": "100"}})
+    assert client.get_user("100") is not None
+    parser.on_guild_member_remove({"guild_id": "2", "user": {"id": "100"}})
+    assert client.get_user("100") is None
+
+    parser.on_guild_member_add({"guild_id": "2", "user": {"id": "102"}})
+    parser.on_guild_member_update({"guild_id": "2", "nick": "nico",
+                                   "user": {"id": "102", "username": "new"}})
+    assert client.get_user("102").username == "new"
+
+    parser.on_guild_create(make_guild("1", ["13"], []))
+    assert client.get_channel("11") is None
+    assert client.get_channel("13") is not None
+    assert client.get_user("101") is None
+
+    parser.on_guild_delete({"id": "2"})
+    assert client.get_channel("20") is None
+    assert client.get_user("102") is None
+
+
+def test_views():
+    client = DiscordClient(token="token")
+    client.guilds = {}
+    parser = client.event_parser
+
+    parser.on_guild_create(make_guild("1", ["10"], ["100"]))
+    guild = client.get_guild("1")
+    guilds = client.get_guilds()
+    channels = guild.get_channels()
+    members = guild.get_members()
+
+    with pytest.raises(TypeError):
+        channels["11"] = None
+
+    parser.on_channel_create({"id": "11", "type": 0, "guild_id": "1"})
+    parser.on_guild_member_add({"guild_id": "1", "user": {"id": "101"}})
+    parser.on_guild_create(make_guild("2", [], []))
+
+    # Channels are replaced on update, members and guilds updated in place
+    assert list(channels) == ["10"]
+    assert list(members) == ["100", "101"]
+    assert list(guilds) == ["1", "2"]
+    assert set(guild.get_channels()) == {"10", "11"}
+    assert guild.get_channel("11") is client.get_channel("11")
+    assert set(client.get_guilds()) == {"1", "2"}
@@ -0,0 +1,140 @@
+import os
+import sys
+import time
+import threading
+from functools import partial
+from types import SimpleNamespace
+
+projpath = os.path.normpath(os.path.join(os.path.abspath(__file__), "../.."))
+sys.path.insert(0, projpath)
+
+from discordapi import membercache
+from discordapi import DiscordClient
+from discordapi.websocket import EventLoopThread
+from discordapi import LRUMemberCache, TTLMemberCache, VoiceMemberCache
+
+
+def make_member(user_id):
+    return {"user": {"id": user_id, "username": f"user{user_id}"},
+            "joined_at": "2021-10-03T12:34:56.789000+00:00"}
+
+
+def make_client(member_cache):
+    client = DiscordClient(token="token", member_cache=member_cache)
+    client.guilds = {}
+    return client
+
+
+def create_guild(client, user_ids, voice_states=()):
+    client.event_parser.on_guild_create({
+        "id": "1",
+        "channels": [{"id": "10", "type": 2, "guild_id": "1"}],
+        "members": [make_member(user_id) for user_id in user_ids],
+        "voice_states": list(voice_states),
+    })
+    return client.get_guild("1")
+
+
+def test_lru():
+    client = make_client(partial(LRUMemberCache, 2))
+    guild = create_guild(client, ["100", "101", "102"])
+    assert set(guild.members) == {"101", "102"}
+    assert client.get_user("100") is None
+
+    assert guild.get_member("101") is not None
+    client.event_parser.on_guild_member_add(
+        {"guild_id": "1", **make_member("103")}
+    )
+    assert set(guild.members) == {"101", "103"}
+    assert set(client.get_users()) == {"101", "103"}
+
+
+def test_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(membercache.time, "monotonic", lambda: now[0])
+    client = make_client(partial(TTLMemberCache, 60))
+    guild = create_guild(client, ["100"])
+
+    now[0] += 30
+    client.event_parser.on_guild_member_add(
+        {"guild_id": "1", **make_member("101")}
+    )
+    now[0] += 40
+    assert not guild.member_cache.accessed("100")
+    client.event_parser.on_guild_member_add(
+        {"guild_id": "1", **make_member("102")}
+    )
+    assert set(guild.members) == {"101", "102"}
+
+
+def test_voice():
+    client = make_client(VoiceMemberCache)
+    client.user = SimpleNamespace(id="0")
+    guild = create_guild(client, ["100", "101"], [
+        {"user_id": "100", "channel_id": "10", "session_id": "x"}
+    ])
+    assert set(guild.members) == {"100"}
+
+    parser = client.event_parser
+    parser.on_voice_state_update({"guild_id": "1", "user_id": "101",
+                                  "channel_id": "10",
+                                  "member": make_member("101")})
+    assert set(guild.members) == {"100", "101"}
+    parser.on_voice_state_update({"guild_id": "1", "user_id": "100",
+                                  "channel_id": None,
+                                  "member": make_member("100")})
+    assert set(guild.members) == {"101"}
+    assert client.get_user("100") is None
+
+
+def test_request_batched(monkeypatch):
+    client = make_client(VoiceMemberCache)
+    client.loop = EventLoopThread.get_loop()
+    client.intents |= membercache.GUILD_MEMBERS_INTENT
+    client.ready_to_run.set()
+    guild = create_guild(client, ["100"])
+
+    requests = []
+
+    def request_guild_member(guild_id, user_ids, nonce):
+        requests.append((guild_id, user_ids))
+        threading.Thread(target=client.event_parser.on_guild_members_chunk,
+                         args=({"guild_id": guild_id, "nonce": nonce,
+                                "members": [make_member("100")],
+                                "not_found": ["101"]},)).start()
+
+    monkeypatch.setattr(client, "request_guild_member", request_guild_member)
+
+    results = {}
+
+    def lookup(user_id):
+        results[user_id] = guild.get_member(user_id, timeout=5)
+
+    threads = [threading.Thread(target=lookup, args=(user_id,))
+               for user_id in ("100", "101")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(requests) == 1 and sorted(requests[0][1]) == ["100", "101"]
+    assert results["100"].user.id == "100"
+    assert results["101"] is None
+    # Not in voice, thus not cached
+    assert guild.members == {}
+
+
+def test_request_timeout(monkeypatch):
+    client = make_client(VoiceMemberCache)
+    client.loop = EventLoopThread.get_loop()
+    client.intents |= membercache.GUILD_MEMBERS_INTENT
+    client.ready_to_run.set()
+    guild = create_guild(client, [])
+
+    # Never answered
+    monkeypatch.setattr(client, "request_guild_member",
+                        lambda guild_id, user_ids, nonce: None)
+    monkeypatch.setattr(guild, "fetch_member",
+                        lambda user_id: f"fetched {user_id}")
+
+    assert guild.get_member("100", timeout=0.1) == "fetched 100"
@@ -0,0 +1,83 @@
+import os
+import sys
+from io import BytesIO
+
+projpath = os.path.normpath(os.path.join(os.path.abspath(__file__), "../.."))
+sys.path.insert(0, projpath)
+
+from discordapi import File
+from discordapi.util import get_formdata
+from .test_ratelimit import MockDiscord, make_client
+
+
+def expected_body(boundary, content, payload):
+    return (
+        f"--{boundary}\n"
+        'Content-Disposition: form-data; name="file"; filename="clip.ogg"\n'
+        "Content-Type: application/octet-stream\n\n"
+    ).encode() + content + (
+        f"\n--{boundary}\n"
+        'Content-Disposition: form-data; name="payload_json"\n\n'
+        f"{payload}\n--{boundary}--\n"
+    ).encode()
+
+
+def test_encode():
+    content = os.urandom(100000)
+    content_type, body = get_formdata({
+        "file": File(("clip.ogg", content)),
+        "payload_json": {"content": "x"},
+    })
+    expected = expected_body(body.boundary, content, '{"content":"x"}')
+
+    assert content_type.endswith(f'boundary="{body.boundary}"')
+    assert len(body) == len(expected)
+
+    chunks = iter(lambda: body.read(4096), b"")
+    assert all(len(chunk) <= 4096 for chunk in chunks)
+    body.seek(0)
+    assert b"".join(iter(lambda: body.read(999), b"")) == expected
+
+    body.seek(len(expected) - 100)
+    assert body.read() == expected[-100:]
+    body.seek(50)
+    assert body.read(100) == expected[50:150]
+
+
+def test_file_position(tmp_path):
+    path = tmp_path / "clip.ogg"
+    path.write_bytes(b"0123456789")
+    file = File(str(path))
+    assert file.get_size() == 10
+
+    io = BytesIO(b"0123456789")
+    io.seek(4)
+    _, body = get_formdata({"file": File(("clip.ogg", io))})
+    data = body.read()
+    assert len(data) == len(body)
+    assert b"\n\n456789\n--" in data
+
+
+def test_upload(tmp_path):
+    content = os.urandom(1 << 20)
+    path = tmp_path / "clip.ogg"
+    path.write_bytes(content)
+
+    server = MockDiscord()
+    server.fail_next = 1
+    client = make_client(server)
+    try:
+        _, body = get_formdata({
+            "file": File(str(path)), "payload_json": {"content": "x"}
+        })
+        client.send_request(
+            "POST", "/channels/1/messages", body,
+            headers={"Content-Type": body.content_type},
+        )
+    finally:
+        server.close()
+
+    assert server.requests == 2
+    assert server.body == expected_body(
+        body.boundary, content, '{"content":"x"}'
+    )
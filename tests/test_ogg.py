@@ -0,0 +1,100 @@
+import os
+import sys
+import struct
+from io import BytesIO
+
+projpath = os.path.normpath(os.path.join(os.path.abspath(__file__), "../.."))
+sys.path.insert(0, projpath)
+
+from discordapi.ogg import (
+    HEADER_STRUCT, CONTINUED, OggParser, OggDemuxer, ogg_crc
+)
+
+
+def reference_crc(data):
+    crc = 0
+    for byte in data:
+        crc ^= byte << 24
+        for _ in range(8):
+            if crc & 0x80000000:
+                crc = ((crc << 1) ^ 0x04C11DB7) & 0xFFFFFFFF
+            else:
+                crc = (crc << 1) & 0xFFFFFFFF
+    return crc
+
+
+def make_page(seg_table, body, flag=0, seq=0):
+    header = b"OggS" + HEADER_STRUCT.pack(0, flag, 0, 1, seq, 0,
+                                          len(seg_table))
+    page = bytearray(header + bytes(seg_table) + body)
+    struct.pack_into("<I", page, 22, ogg_crc(page))
+    return bytes(page)
+
+
+def lacing(size):
+    return [255] * (size // 255) + [size % 255]
+
+
+def make_stream(packets):
+    stream = b""
+    seg_table = []
+    body = b""
+    seq = 0
+
+    for packet in packets:
+        packet_lacing = lacing(len(packet))
+        if len(seg_table) + len(packet_lacing) > 255:
+            stream += make_page(seg_table, body, seq=seq)
+            seg_table = []
+            body = b""
+            seq += 1
+        seg_table.extend(packet_lacing)
+        body += packet
+
+    return stream + make_page(seg_table, body, seq=seq)
+
+
+def collect(parser):
+    return [bytes(packet) for packet in parser.packet_iter()]
+
+
+def test_crc():
+    for size in (0, 1, 27, 300, 4096):
+        data = bytearray(os.urandom(size + 27))
+        data[22:26] = bytes(4)
+        assert ogg_crc(data) == reference_crc(data)
+
+
+def test_same_as_oggparser():
+    packets = [os.urandom(n) for n in range(1, 2000, 7)]
+    stream = make_stream(packets)
+
+    expected = collect(OggParser(BytesIO(stream)))
+    assert collect(OggDemuxer(BytesIO(stream))) == expected
+    assert expected == packets + [b""]
+
+
+def test_continued_packet():
+    big = os.urandom(600)
+    stream = make_page([255, 255], big[:510], seq=0)
+    stream += make_page([90, 5], big[510:] + b"hello", CONTINUED, seq=1)
+
+    assert collect(OggDemuxer(BytesIO(stream))) == [big, b"hello", b""]
+
+
+def test_orphan_continuation_is_dropped():
+    stream = make_page([10, 5], os.urandom(10) + b"hello", CONTINUED)
+
+    assert collect(OggDemuxer(BytesIO(stream))) == [b"hello", b""]
+
+
+def test_crc_mismatch():
+    first = make_page([5], b"first", seq=0)
+    broken = bytearray(make_page([6], b"second", seq=1))
+    broken[-1] ^= 0xFF
+    last = make_page([4], b"last", seq=2)
+
+    demuxer = OggDemuxer(BytesIO(first + bytes(broken) + last))
+
+    assert collect(demuxer) == [b"first", b"last", b""]
+    assert demuxer.crc_errors == 1
@@ -0,0 +1,91 @@
+import os
+import sys
+import time
+from threading import Event
+from collections import deque
+
+projpath = os.path.normpath(os.path.join(os.path.abspath(__file__), "../.."))
+sys.path.insert(0, projpath)
+
+from discordapi import AudioSource, PrefetchAudioSource
+from discordapi.player import SILENCE
+
+
+class ListSource(AudioSource):
+    def __init__(self, frames, gate=None):
+        self.frames = list(frames)
+        self.gate = gate
+        self.cleaned = False
+        self.extra = "extra"
+
+    def read(self):
+        if self.gate is not None:
+            self.gate.wait()
+        if not self.frames:
+            return b""
+        return self.frames.pop(0)
+
+    def cleanup(self):
+        self.cleaned = True
+        if self.gate is not None:
+            self.gate.set()
+
+
+def test_prefetch_reads_everything():
+    frames = [bytes([i]) * 10 for i in range(1, 100)]
+    source = PrefetchAudioSource(ListSource(frames), seconds=0.2)
+    source.prepare()
+
+    received = []
+    while True:
+        data = source.read()
+        if not data:
+            break
+        if data != SILENCE:
+            received.append(data)
+
+    source.cleanup()
+
+    assert received == frames
+    assert source.overruns > 0
+    assert source.cleaned
+    assert source.extra == "extra"
+
+
+def test_prefetch_underrun():
+    gate = Event()
+    source = PrefetchAudioSource(ListSource([b"frame"], gate), prefill=0)
+    source.prepare()
+
+    assert source.read() == SILENCE
+    assert source.underruns == 1
+
+    gate.set()
+    deadline = time.time() + 5
+    while source.buffered() == 0 and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert source.read() == b"frame"
+    source.cleanup()
+
+
+def test_prefetch_last_frame():
+    source = PrefetchAudioSource(ListSource([]))
+
+    class RacingDeque(deque):
+        raced = False
+
+        def popleft(self):
+            if not self.raced:
+                # The producer appends the last frame and finishes right
+                # after the buffer was found empty
+                self.raced = True
+                self.append(b"last")
+                source._finished = True
+                raise IndexError
+            return super(RacingDeque, self).popleft()
+
+    source._buffer = RacingDeque()
+    assert source.read() == b"last"
+    assert source.read() == b""
+    assert source.underruns == 0
@@ -0,0 +1,179 @@
+import os
+import sys
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+projpath = os.path.normpath(os.path.join(os.path.abspath(__file__), "../.."))
+sys.path.insert(0, projpath)
+
+from discordapi import DiscordClient, RateLimitHandler
+
+BUCKET_LIMIT = 5
+BUCKET_PERIOD = 0.2
+GLOBAL_LIMIT = 50
+GLOBAL_PERIOD = 0.25
+
+
+class MockDiscord(ThreadingHTTPServer):
+    """Enforces per-channel and global limits like Discord, in windows."""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, handler=None):
+        super(MockDiscord, self).__init__(
+            ("127.0.0.1", 0), handler or MockHandler
+        )
+        self.connections = 0
+        self.delay = 0
+        self.body = None
+        self.lock = threading.Lock()
+        self.windows = {}
+        self.global_window = [0, 0]
+        self.requests = 0
+        self.limited = 0
+        self.fail_next = 0
+        self.url = f"http://127.0.0.1:{self.server_address[1]}/"
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.start()
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+        self.thread.join()
+
+    def respond(self, path):
+        with self.lock:
+            self.requests += 1
+            now = time.monotonic()
+
+            if self.fail_next:
+                self.fail_next -= 1
+                self.limited += 1
+                return 429, {}, {"retry_after": 0.05, "global": False}
+
+            if now >= self.global_window[0]:
+                self.global_window = [now + GLOBAL_PERIOD, 0]
+            self.global_window[1] += 1
+            if self.global_window[1] > GLOBAL_LIMIT:
+                self.limited += 1
+                retry_after = self.global_window[0] - now
+                return 429, {"x-ratelimit-global": "true"}, \
+                    {"retry_after": retry_after, "global": True}
+
+            key = path.split("/")[2]
+            window = self.windows.get(key)
+            if window is None or now >= window[0]:
+                window = self.windows[key] = [now + BUCKET_PERIOD,
+                                              BUCKET_LIMIT]
+            headers = {
+                "x-ratelimit-bucket": "messages",
+                "x-ratelimit-limit": str(BUCKET_LIMIT),
+                "x-ratelimit-reset-after": f"{window[0] - now:.3f}",
+            }
+            if window[1] == 0:
+                self.limited += 1
+                headers["x-ratelimit-remaining"] = "0"
+                return 429, headers, \
+                    {"retry_after": window[0] - now, "global": False}
+
+            window[1] -= 1
+            headers["x-ratelimit-remaining"] = str(window[1])
+            return 200, headers, {"id": key}
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.server.body = self.rfile.read(
+            int(self.headers.get("Content-Length", 0))
+        )
+        code, headers, body = self.server.respond(self.path)
+        time.sleep(self.server.delay)
+        body = json.dumps(body).encode()
+
+        self.send_response(code)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST
+
+    def log_message(self, *args):
+        pass
+
+
+class KeepAliveHandler(MockHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super(KeepAliveHandler, self).setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+
+def make_client(server):
+    client = DiscordClient("token")
+    client.api_url = server.url
+    client.ratelimit_handler = RateLimitHandler(GLOBAL_LIMIT, GLOBAL_PERIOD)
+    return client
+
+
+def test_concurrent_senders():
+    server = MockDiscord()
+    client = make_client(server)
+    results = []
+
+    def sender(index):
+        for _ in range(2):
+            route = f"/channels/{index % 10 + 1}/messages"
+            results.append(client.send_request("POST", route, {"x": 1}))
+
+    try:
+        threads = [threading.Thread(target=sender, args=(x,))
+                   for x in range(100)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        server.close()
+
+    assert server.limited == 0
+    assert server.requests == len(results) == 200
+    assert all(x is not None for x in results)
+
+
+def test_retry_after():
+    server = MockDiscord()
+    client = make_client(server)
+    server.fail_next = 2
+    try:
+        assert client.send_request("POST", "/channels/1/messages") == \
+            {"id": "1"}
+    finally:
+        server.close()
+    assert server.requests == 3
+
+
+def test_connection_reuse():
+    server = MockDiscord(KeepAliveHandler)
+    client = make_client(server)
+    try:
+        for x in range(20):
+            client.send_request("POST", f"/channels/{x % 3}/messages")
+    finally:
+        server.close()
+    assert server.requests == 20
+    assert server.connections == 1
+
+
+def test_split_route():
+    split = RateLimitHandler.split_route
+    assert split("GET", "/guilds/1/members/2?limit=1") == \
+        ("GET /guilds/{id}/members/{id}", "/guilds/1")
+    assert split("GET", "users/@me") == ("GET /users/@me", None)
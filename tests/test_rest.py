@@ -0,0 +1,78 @@
+import os
+import sys
+import time
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+projpath = os.path.normpath(os.path.join(os.path.abspath(__file__), "../.."))
+sys.path.insert(0, projpath)
+
+from discordapi import DiscordClient
+from discordapi.slash import SlashCommand, SlashCommandManager
+from .test_ratelimit import MockDiscord, KeepAliveHandler, make_client
+from .test_websocket import wait_until
+
+
+def test_send_request_async():
+    server = MockDiscord(KeepAliveHandler)
+    server.delay = 0.2
+    client = make_client(server)
+    try:
+        start = time.monotonic()
+        futures = [
+            client.send_request_async("POST", f"/channels/{x}/messages")
+            for x in range(5)
+        ]
+        results = [future.result(timeout=5) for future in futures]
+        elapsed = time.monotonic() - start
+    finally:
+        server.close()
+
+    assert results == [{"id": str(x)} for x in range(5)]
+    # sequentially, this would take a second
+    assert elapsed < 0.8
+
+
+def test_submit_exception():
+    client = DiscordClient("token")
+
+    def fail():
+        raise ValueError("failed")
+
+    with pytest.raises(ValueError):
+        client.submit(fail).result(timeout=5)
+
+
+def test_slash_ack_not_queued():
+    client = DiscordClient("token", pool_size=1)
+    client.user = SimpleNamespace(id="1")
+    requests = []
+
+    def send_request(method, route, *args, **kwargs):
+        requests.append((method, threading.current_thread()))
+        return {"id": "3", "content": "pong"}
+
+    client.send_request = send_request
+
+    def ping(ctx):
+        yield "pong"
+
+    manager = SlashCommandManager(client)
+    manager.register(SlashCommand(ping, "ping", "Replies with pong"))
+    ctx = SimpleNamespace(id="2", token="token", data={"name": "ping"})
+
+    # Keeps the only REST thread busy, as a long upload would
+    busy = threading.Event()
+    client.submit(busy.wait, 5)
+    thread = threading.Thread(target=manager.execute, args=(ctx,))
+    thread.start()
+    try:
+        assert wait_until(lambda: requests)
+        assert requests == [("POST", thread)]
+    finally:
+        busy.set()
+        thread.join()
+
+    assert [method for method, _ in requests] == ["POST", "PATCH"]
@@ -0,0 +1,170 @@
+import os
+import sys
+import time
+import threading
+
+import pytest
+
+projpath = os.path.normpath(os.path.join(os.path.abspath(__file__), "../.."))
+sys.path.insert(0, projpath)
+
+from discordapi import DiscordHTTPError, ResponseCache, MethodEventHandler
+from .test_ratelimit import MockDiscord, make_client
+
+
+class Counter:
+    def __init__(self, delay=0):
+        self.calls = 0
+        self.delay = delay
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        return {"calls": self.calls}, True
+
+
+class NotFound:
+    status = 404
+
+
+def test_ttl():
+    cache = ResponseCache(default_ttl=0.1, ttls={"/guilds/{id}/roles": 0})
+    request = Counter()
+    assert cache.fetch("/channels/1", request) == {"calls": 1}
+    assert cache.fetch("channels/1", request) == {"calls": 1}
+    time.sleep(0.15)
+    assert cache.fetch("/channels/1", request) == {"calls": 2}
+
+    cache.fetch("/guilds/1/roles", request)
+    cache.fetch("/guilds/1/roles", request)
+    assert request.calls == 4
+
+
+def test_ttl_prefix():
+    cache = ResponseCache(ttls={"/guilds/{id}/members": 5})
+    assert cache.get_ttl("/channels/1/messages?limit=50") == 0
+    assert cache.get_ttl("/channels/1/messages/2/reactions/%F0%9F%91%8D") == 0
+    assert cache.get_ttl("/guilds/1/members/2") == 5
+    assert cache.get_ttl("/guilds/1/roles") == cache.default_ttl
+
+    request = Counter()
+    cache.fetch("/channels/1/messages/2/reactions/x", request)
+    cache.fetch("/channels/1/messages/2/reactions/x", request)
+    assert request.calls == 2
+
+
+def test_single_flight():
+    cache = ResponseCache()
+    request = Counter(delay=0.1)
+    results = []
+
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(cache.fetch("/users/1", request))
+        )
+        for _ in range(10)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert request.calls == 1
+    assert results == [{"calls": 1}] * 10
+    assert len({id(x) for x in results}) == 10
+
+
+def test_copies():
+    cache = ResponseCache()
+
+    def request():
+        return {"id": "1", "roles": ["2"]}, True
+
+    value = cache.fetch("/guilds/1/members/1", request)
+    value["roles"].append("3")
+    value["id"] = None
+    cached = cache.fetch("/guilds/1/members/1", request)
+    assert cached == {"id": "1", "roles": ["2"]}
+    cached["roles"].clear()
+    assert cache.fetch("/guilds/1/members/1", request) == \
+        {"id": "1", "roles": ["2"]}
+
+
+def test_negative():
+    cache = ResponseCache()
+    calls = []
+
+    def request():
+        calls.append(None)
+        raise DiscordHTTPError(10003, "Unknown Channel", NotFound())
+
+    for _ in range(2):
+        with pytest.raises(DiscordHTTPError):
+            cache.fetch("/channels/1", request)
+    assert len(calls) == 1
+
+    def rate_limited():
+        calls.append(None)
+        return {"message": "You are being rate limited."}, False
+
+    cache.fetch("/channels/2", rate_limited)
+    cache.fetch("/channels/2", rate_limited)
+    assert len(calls) == 3
+
+
+def test_invalidate():
+    cache = ResponseCache()
+    request = Counter()
+    routes = ["/channels/1", "/channels/1/invites", "/guilds/1/roles",
+              "/guilds/1?with_counts=true", "/guilds/2/roles"]
+    for route in routes:
+        cache.fetch(route, request)
+
+    cache.handle_event("CHANNEL_UPDATE", {"id": "1", "type": 0})
+    cache.handle_event("GUILD_ROLE_CREATE", {"guild_id": "2", "role": {}})
+    assert set(cache._entries) == set(routes) - {
+        "/channels/1", "/guilds/2/roles"
+    }
+
+    cache.invalidate_request("PATCH", "/guilds/1/roles/3")
+    assert set(cache._entries) == {"/channels/1/invites"}
+
+
+def test_invalidate_inflight():
+    cache = ResponseCache()
+    request = Counter(delay=0.1)
+    thread = threading.Thread(target=cache.fetch,
+                              args=("/channels/1", request))
+    thread.start()
+    time.sleep(0.05)
+    cache.invalidate("/channels/1")
+    thread.join()
+
+    assert cache.fetch("/channels/1", request) == {"calls": 2}
+
+
+def test_client():
+    class Handler(MethodEventHandler):
+        def on_message_create(self, obj):
+            pass
+
+    server = MockDiscord()
+    client = make_client(server)
+    client.response_cache = ResponseCache()
+    client.set_handler(Handler())
+    assert "CHANNEL_UPDATE" in client.wanted_events
+
+    try:
+        for _ in range(3):
+            assert client.send_request("GET", "/channels/1") == {"id": "1"}
+        assert server.requests == 1
+
+        client.send_request("POST", "/channels/1/messages")
+        client.send_request("GET", "/channels/1")
+        assert server.requests == 3
+
+        client._handle_event("CHANNEL_DELETE", {"id": "1", "type": 1})
+        client.send_request("GET", "/channels/1")
+        assert server.requests == 4
+    finally:
+        server.close()
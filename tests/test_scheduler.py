@@ -0,0 +1,163 @@
+import os
+import sys
+import heapq
+from threading import Event
+
+import pytest
+
+projpath = os.path.normpath(os.path.join(os.path.abspath(__file__), "../.."))
+sys.path.insert(0, projpath)
+
+from discordapi import AudioPlayer, QueuedAudioPlayer, VoiceScheduler
+from discordapi import scheduler as scheduler_module
+from discordapi.player import SILENCE
+from discordapi.scheduler import DELAY, MAX_LAG_FRAMES
+from .test_player import ListSource
+from .test_websocket import wait_until
+
+START = 1000.0
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = START
+
+    def __call__(self):
+        return self.now
+
+
+class FakeVoiceClient:
+    def __init__(self):
+        self.ready = True
+        self.sent = []
+        self.batches = []
+        self.speaking = []
+
+    def is_ready(self):
+        return self.ready
+
+    def speak(self, flag):
+        self.speaking.append(flag)
+
+    def _send_voice(self, packet):
+        self.sent.append(packet)
+
+    def send_voice_batch(self, packets):
+        self.batches.append(len(packets))
+        self.sent.extend(packets)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    # Shared by the scheduler and the player
+    monkeypatch.setattr(scheduler_module.time, "perf_counter", clock)
+    return clock
+
+
+def make_player(frames, player_class=AudioPlayer, callback=None):
+    scheduler = VoiceScheduler()
+    player = player_class(scheduler=scheduler, callback=callback)
+    # set_client only accepts DiscordVoiceClient
+    player.client = FakeVoiceClient()
+    player.play(ListSource(frames))
+    return scheduler, player
+
+
+def run_next(scheduler, clock, late=0):
+    """Does what the scheduler thread does for the earliest entry."""
+    when, seq, player = heapq.heappop(scheduler._heap)
+    assert scheduler._scheduled.pop(player) == seq
+    clock.now = when + late
+    scheduler._tick(player, when)
+    return when
+
+
+def next_deadline(scheduler):
+    return scheduler._heap[0][0]
+
+
+def test_pacing(clock):
+    frames = [bytes([x]) for x in range(10)]
+    scheduler, player = make_player(frames)
+
+    for index in range(3):
+        when = run_next(scheduler, clock)
+        assert when == pytest.approx(START + DELAY * index)
+        assert next_deadline(scheduler) == pytest.approx(when + DELAY)
+
+    assert player.client.sent == frames[:3]
+    assert player.client.batches == []
+    assert player.client.speaking == [1]
+    assert scheduler.ticks == 3 and scheduler.late == 0
+
+
+def test_lag(clock):
+    frames = [bytes([x]) for x in range(20)]
+    scheduler, player = make_player(frames)
+
+    # Missed frames are sent together to catch up
+    when = run_next(scheduler, clock, late=DELAY * 3.5)
+    assert player.client.batches == [4]
+    assert next_deadline(scheduler) == pytest.approx(when + DELAY * 4)
+    assert scheduler.late == 1
+
+    # Too far behind, it resyncs instead of bursting every missed frame
+    when = run_next(scheduler, clock, late=DELAY * 20)
+    assert player.client.batches == [4, MAX_LAG_FRAMES + 1]
+    assert next_deadline(scheduler) == pytest.approx(clock.now)
+    assert player.client.sent == frames[:4 + MAX_LAG_FRAMES + 1]
+
+
+def test_pause(clock):
+    scheduler, player = make_player([b"frame"] * 20)
+    run_next(scheduler, clock)
+
+    player.pause()
+    for _ in range(5):
+        run_next(scheduler, clock)
+    assert player.client.sent == [b"frame"] + [SILENCE] * 5
+
+    # Idle after the silence, until resumed
+    run_next(scheduler, clock)
+    assert scheduler._heap == [] and scheduler._scheduled == {}
+    assert player.client.sent[-1] == SILENCE
+
+    player.resume()
+    run_next(scheduler, clock)
+    assert player.client.sent[-1] == b"frame"
+
+
+def test_client_not_ready(clock):
+    scheduler, player = make_player([b"frame"] * 5)
+    player.client.ready = False
+
+    when = run_next(scheduler, clock)
+    assert player.client.sent == []
+    # Polled again a second later, instead of every frame
+    assert len(scheduler._heap) == 1
+    assert next_deadline(scheduler) == pytest.approx(when + 1)
+
+    player.client.ready = True
+    run_next(scheduler, clock)
+    assert player.client.sent == [b"frame"]
+
+
+def test_finish(clock):
+    finished = Event()
+    scheduler, player = make_player(
+        [b"first"], QueuedAudioPlayer, lambda player: finished.set()
+    )
+    player.add_to_queue(ListSource([b"second"]))
+    first = player.source
+
+    run_next(scheduler, clock)
+    run_next(scheduler, clock)
+    assert finished.wait(5)
+    assert first.cleaned
+
+    # Next source in the queue gets scheduled
+    assert wait_until(lambda: scheduler._heap)
+    run_next(scheduler, clock)
+    assert player.client.sent == [b"first", b"second"]
+    assert 0 in player.client.speaking
@@ -0,0 +1,104 @@
+import os
+import sys
+
+import pytest
+
+projpath = os.path.normpath(os.path.join(os.path.abspath(__file__), "../.."))
+sys.path.insert(0, projpath)
+
+from discordapi import DiscordClient, SessionStore
+from discordapi.user import BotUser
+from .test_websocket import FakeGateway, wait_until
+
+GUILD = {
+    "id": "1", "name": "guild",
+    "channels": [{"id": "10", "type": 2, "name": "voice", "guild_id": "1"}],
+    "members": [{"user": {"id": "100", "username": "user",
+                          "avatar": "abcd"}, "roles": []}],
+    "voice_states": [{"user_id": "100", "channel_id": "10"}],
+}
+
+
+def handle(server):
+    def on_message(message, send):
+        if message["op"] == 2:
+            send({"t": "READY", "s": 1, "op": 0, "d": {
+                "user": {"id": "2", "username": "bot"},
+                "guilds": [{"id": "1", "unavailable": True}],
+                "session_id": "session",
+                "resume_gateway_url": server.url.partition("?")[0],
+                "application": {"id": "2"},
+            }})
+            send({"t": "GUILD_CREATE", "s": 2, "op": 0, "d": GUILD})
+        elif message["op"] == 6:
+            send({"t": "RESUMED", "s": 3, "op": 0, "d": None})
+
+    return on_message
+
+
+def hello(send):
+    send({"t": None, "s": None, "op": 10,
+          "d": {"heartbeat_interval": 45000}})
+
+
+def test_resume(tmp_path):
+    server = FakeGateway(None, hello)
+    server.on_message = handle(server)
+    url = server.url.partition("?")[0]
+    store = SessionStore(str(tmp_path / "session{shard}.json"))
+    path = tmp_path / "session0.json"
+
+    try:
+        client = DiscordClient("token", gateway_url=url,
+                               session_store=store, compact=True)
+        client.start()
+        assert wait_until(lambda: client.guilds and client.guilds["1"])
+        client.stop()
+        assert client.join(5)
+        assert wait_until(path.exists)
+
+        client = DiscordClient("token", gateway_url=url,
+                               session_store=store)
+        client.start()
+        assert wait_until(client.is_ready)
+        assert not path.exists()
+        ops = [x["op"] for x in server.received]
+        assert ops.count(2) == 1
+        assert {"op": 6, "d": {
+            "token": "token", "session_id": "session", "seq": 2,
+        }} in server.received
+
+        guild = client.get_guild("1")
+        assert client.get_channel("10") is guild.channels["10"]
+        member = guild.members["100"]
+        assert client.get_user("100") is member.user
+        assert member.user.to_dict() == GUILD["members"][0]["user"]
+        assert guild.voice_states == {"100": guild.channels["10"]}
+        client.stop()
+        assert client.join(5)
+    finally:
+        server.close()
+
+
+def test_other_shard(tmp_path):
+    store = SessionStore(str(tmp_path / "session{shard}.json"))
+    client = DiscordClient("token", shard=(1, 2))
+    client.session_id = "session"
+    client.user = BotUser(client, {"id": "2", "username": "bot"})
+    client.guilds = {"1": False}
+    store.save(client)
+
+    # Resharded, the file is kept for the shard it belongs to
+    client = DiscordClient("token", shard=(1, 4))
+    assert not store.restore(client)
+    assert (tmp_path / "session1.json").exists()
+
+    client = DiscordClient("token", shard=(1, 2))
+    assert store.restore(client)
+    assert not (tmp_path / "session1.json").exists()
+
+
+def test_shard_path(tmp_path):
+    store = SessionStore(str(tmp_path / "session.json"))
+    with pytest.raises(ValueError):
+        store.get_path(DiscordClient("token", shard=(0, 2)))
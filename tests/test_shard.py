@@ -0,0 +1,104 @@
+import os
+import sys
+import time
+import asyncio
+import threading
+
+projpath = os.path.normpath(os.path.join(os.path.abspath(__file__), "../.."))
+sys.path.insert(0, projpath)
+
+from discordapi import shard
+from discordapi import DiscordClient, MethodEventHandler
+from discordapi import ShardManager, RateLimitHandler, get_shard_id
+
+from .test_ratelimit import MockDiscord, GLOBAL_LIMIT, GLOBAL_PERIOD
+
+
+class FakeClient(DiscordClient):
+    def start(self):
+        self.sent = []
+
+    def send(self, data):
+        self.sent.append(data)
+
+    def get_gateway_bot(self):
+        return {
+            "url": "wss://gateway.discord.gg",
+            "shards": 3,
+            "session_start_limit": {
+                "total": 1000, "remaining": 999, "reset_after": 0,
+                "max_concurrency": 1,
+            },
+        }
+
+
+def test_routing():
+    manager = ShardManager("token", client=FakeClient,
+                           handler=MethodEventHandler)
+    manager.start()
+    assert manager.shard_count == 3 and manager.max_concurrency == 1
+    assert [x.shard for x in manager.shards.values()] == \
+        [(0, 3), (1, 3), (2, 3)]
+    handlers = {id(x.handler) for x in manager.shards.values()}
+    assert len(handlers) == 3
+
+    guild_id = str((1 << 22) * 4)
+    assert get_shard_id(guild_id, 3) == 1
+    manager.shards[0].update_voice_state(guild_id, "1")
+    manager.request_guild_member(guild_id)
+    assert not manager.shards[0].sent
+    assert [x["op"] for x in manager.shards[1].sent] == [4, 8]
+
+    manager.shards[2].send_identify()
+    assert manager.shards[2].sent[0]["d"]["shard"] == [2, 3]
+
+
+def test_identify_buckets(monkeypatch):
+    monkeypatch.setattr(shard, "IDENTIFY_INTERVAL", 0.2)
+    manager = ShardManager("token", shard_count=4, max_concurrency=2)
+
+    async def identify(shard_id):
+        await manager.wait_identify(shard_id)
+        return shard_id, time.monotonic()
+
+    async def main():
+        return await asyncio.gather(*(identify(x) for x in range(4)))
+
+    start = time.monotonic()
+    times = {x: y - start for x, y in asyncio.run(main())}
+    assert times[0] < 0.1 and times[1] < 0.1
+    assert 0.2 <= times[2] < 0.35 and 0.2 <= times[3] < 0.35
+
+
+def test_shared_ratelimit():
+    server = MockDiscord()
+    manager = ShardManager(
+        "token", shard_count=2, max_concurrency=1, client=FakeClient,
+        ratelimit_handler=RateLimitHandler(GLOBAL_LIMIT, GLOBAL_PERIOD),
+    )
+    manager.start()
+    shards = list(manager.shards.values())
+    assert shards[0].ratelimit_handler is shards[1].ratelimit_handler
+    assert shards[0].http is shards[1].http is manager.http
+
+    def sender(client, index):
+        client.api_url = server.url
+        for x in range(3):
+            route = f"/channels/{index * 3 + x}/messages"
+            client.send_request("POST", route, {"x": 1})
+
+    # Shards with their own handlers would each use the whole global limit
+    try:
+        threads = [
+            threading.Thread(target=sender, args=(client, x))
+            for x in range(GLOBAL_LIMIT // 2 + 5) for client in shards
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        server.close()
+
+    assert server.requests == len(threads) * 3
+    assert server.limited == 0
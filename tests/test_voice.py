@@ -0,0 +1,108 @@
+import os
+import sys
+import socket
+from types import SimpleNamespace
+
+import pytest
+import nacl.secret
+
+projpath = os.path.normpath(os.path.join(os.path.abspath(__file__), "../.."))
+sys.path.insert(0, projpath)
+
+from discordapi import DiscordVoiceClient, ENCRYPTION_MODES
+from discordapi.voice import VOICE_STRUCT
+
+SECRET_KEY = bytes(range(32))
+
+
+def make_client(mode="xsalsa20_poly1305"):
+    client = SimpleNamespace(user=SimpleNamespace(id="1"))
+    voice = DiscordVoiceClient(client, "wss://localhost", "token", "sid", "1")
+
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(("127.0.0.1", 0))
+    receiver.settimeout(5)
+
+    voice.ssrc = 1234
+    voice.server_addr = receiver.getsockname()
+    voice.udp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    voice._dispatcher({
+        "op": DiscordVoiceClient.SESSION_DESCRIPTION,
+        "d": {"secret_key": list(SECRET_KEY), "mode": mode},
+    })
+
+    return voice, receiver
+
+
+def decrypt_packet(packet, mode):
+    header = packet[:12]
+    box = nacl.secret.SecretBox(SECRET_KEY)
+
+    if mode == "xsalsa20_poly1305":
+        nonce = header + bytes(12)
+        body = packet[12:]
+    elif mode == "xsalsa20_poly1305_suffix":
+        nonce = packet[-24:]
+        body = packet[12:-24]
+    else:
+        nonce = packet[-4:] + bytes(20)
+        body = packet[12:-4]
+
+    return header, box.decrypt(body, nonce)
+
+
+def check_packets(voice, receiver, frames, mode):
+    nonces = set()
+    for i, frame in enumerate(frames):
+        packet, _ = receiver.recvfrom(4096)
+        header, data = decrypt_packet(packet, mode)
+        assert header == VOICE_STRUCT.pack(
+            b"\x80", b"\x78", i, i * 960, voice.ssrc
+        )
+        assert data == frame
+        nonces.add(packet[-4:])
+    return nonces
+
+
+@pytest.mark.parametrize("mode", ENCRYPTION_MODES)
+def test_send_voice(mode):
+    voice, receiver = make_client(mode)
+    frames = [os.urandom(n) for n in (3, 240, 1000)]
+
+    for frame in frames:
+        voice._send_voice(memoryview(frame))
+
+    check_packets(voice, receiver, frames, mode)
+
+
+@pytest.mark.parametrize("mode", ENCRYPTION_MODES)
+def test_send_voice_batch(mode):
+    voice, receiver = make_client(mode)
+    frames = [os.urandom(100 + n) for n in range(40)]
+
+    voice.send_voice_batch(frames)
+
+    nonces = check_packets(voice, receiver, frames, mode)
+
+    assert voice.voice_sequence == len(frames)
+    if mode != "xsalsa20_poly1305":
+        assert len(nonces) == len(frames)
+    if sys.platform.startswith("linux"):
+        assert voice._batch._msgs is not None
+
+
+def test_oversized_frame_dropped():
+    voice, receiver = make_client()
+    voice.send_voice_batch([b"a" * 10, b"b" * 3000, b"c" * 10])
+
+    check_packets(voice, receiver, [b"a" * 10, b"c" * 10],
+                  "xsalsa20_poly1305")
+
+
+def test_select_mode():
+    voice, _ = make_client()
+    voice.modes = ["xsalsa20_poly1305", "xsalsa20_poly1305_lite", "aead"]
+    assert voice.select_mode() == "xsalsa20_poly1305_lite"
+
+    voice.encryption_modes = ("xsalsa20_poly1305",)
+    assert voice.select_mode() == "xsalsa20_poly1305"
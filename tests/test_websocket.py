@@ -0,0 +1,282 @@
+import os
+import sys
+import json
+import zlib
+import base64
+import random
+import struct
+import asyncio
+import hashlib
+import threading
+from types import SimpleNamespace
+
+projpath = os.path.normpath(os.path.join(os.path.abspath(__file__), "../.."))
+sys.path.insert(0, projpath)
+
+from discordapi import DiscordVoiceClient
+from discordapi.voice import IP_DISCOVERY_STRUCT
+from discordapi.websocket import (
+    AsyncWebSocketClient, WebSocketThread, ZlibStreamInflator, WS_GUID
+)
+
+SECRET_KEY = list(range(32))
+
+
+class FakeGateway:
+    """Minimal WebSocket server speaking JSON, running in its own thread."""
+
+    def __init__(self, on_message, on_connect=None):
+        self.on_message = on_message
+        self.on_connect = on_connect
+        self.connections = 0
+        self.received = []
+        self.tasks = set()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever)
+        self.thread.start()
+        self.server = self.call(
+            asyncio.start_server(self._serve, "127.0.0.1", 0)
+        )
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.url = f"ws://127.0.0.1:{self.port}/?v=4"
+
+    def call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(5)
+
+    def close(self):
+        self.server.close()
+        self.call(self._cancel_tasks())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+    async def _cancel_tasks(self):
+        tasks = list(self.tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _serve(self, reader, writer):
+        task = asyncio.current_task()
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+        key = None
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode().partition(":")
+            if name.lower() == "sec-websocket-key":
+                key = value.strip()
+        accept = base64.b64encode(
+            hashlib.sha1((key + WS_GUID).encode()).digest()
+        ).decode()
+        writer.write(
+            "HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n"
+            f"Connection: Upgrade\r\nSec-WebSocket-Accept: {accept}\r\n\r\n"
+            .encode()
+        )
+
+        self.connections += 1
+
+        def frame(head, data):
+            if len(data) < 126:
+                return bytes((head, len(data))) + data
+            return struct.pack("!BBH", head, 126, len(data)) + data
+
+        def send(data):
+            data = json.dumps(data).encode()
+            # Fragmented on purpose, to test reassembly
+            half = len(data) // 2
+            writer.write(frame(0x01, data[:half]))
+            writer.write(frame(0x80, data[half:]))
+
+        if self.on_connect is not None:
+            self.on_connect(send)
+
+        try:
+            while True:
+                head = await reader.readexactly(2)
+                length = head[1] & 0x7F
+                if length == 126:
+                    length, = struct.unpack("!H", await reader.readexactly(2))
+                mask = await reader.readexactly(4)
+                data = bytes(
+                    b ^ mask[i % 4]
+                    for i, b in enumerate(await reader.readexactly(length))
+                )
+                if head[0] & 0x0F == 0x8:
+                    break
+                message = json.loads(data)
+                self.received.append(message)
+                self.on_message(message, send)
+        except asyncio.IncompleteReadError:
+            pass
+        writer.close()
+
+
+class EchoClient(AsyncWebSocketClient):
+    def __init__(self, url):
+        super(EchoClient, self).__init__(url, self.dispatch, "echo")
+        self.events = []
+        self.got_event = threading.Event()
+
+    async def init_connection(self):
+        self.send({"op": "init"})
+
+    def send_heartbeat(self):
+        self.send({"op": "heartbeat"})
+
+    def dispatch(self, data):
+        self.events.append(data)
+        self.got_event.set()
+        if data["op"] == "hello":
+            self.start_heartbeat(data["interval"])
+        elif data["op"] == "ack":
+            self.ack_heartbeat()
+
+
+def wait_until(func, timeout=5):
+    event = threading.Event()
+    for _ in range(int(timeout / 0.01)):
+        if func():
+            return True
+        event.wait(0.01)
+    return False
+
+
+def test_send_and_dispatch():
+    def on_message(message, send):
+        send({"op": "echo", "d": message})
+
+    server = FakeGateway(on_message)
+    client = EchoClient(server.url)
+    try:
+        client.start()
+        assert client.got_event.wait(5)
+        assert client.events[0] == {"op": "echo", "d": {"op": "init"}}
+
+        # from another thread than the event loop
+        client.send({"op": "x" * 1000})
+        assert wait_until(lambda: len(client.events) == 2)
+        assert client.events[1]["d"]["op"] == "x" * 1000
+    finally:
+        client.stop()
+        assert client.join(5)
+        server.close()
+
+    assert not client.is_alive()
+
+
+def test_missed_heartbeat_ack_reconnects():
+    def on_connect(send):
+        send({"op": "hello", "interval": 0.1})
+
+    server = FakeGateway(lambda message, send: None, on_connect)
+    client = EchoClient(server.url)
+    try:
+        client.start()
+        assert wait_until(lambda: server.connections >= 2, 10)
+    finally:
+        client.stop()
+        assert client.join(5)
+        server.close()
+
+
+def test_heartbeat_jitter(monkeypatch):
+    monkeypatch.setattr(random, "random", lambda: 0.25)
+    scheduled = []
+    client = EchoClient("ws://127.0.0.1:1/")
+    client.loop = SimpleNamespace(
+        call_later=lambda delay, func: scheduled.append((delay, func))
+    )
+
+    client.start_heartbeat(2)
+    assert scheduled == [(0.5, client._heartbeat)]
+    assert WebSocketThread is AsyncWebSocketClient
+
+
+def test_voice_handshake():
+    ssrc = 1234
+
+    class DiscoveryProtocol(asyncio.DatagramProtocol):
+        def connection_made(self, transport):
+            self.transport = transport
+
+        def datagram_received(self, data, addr):
+            typ, _, _, _, _ = IP_DISCOVERY_STRUCT.unpack(data)
+            assert typ == 0x1
+            self.transport.sendto(
+                IP_DISCOVERY_STRUCT.pack(0x2, 70, ssrc, b"1.2.3.4", 5678),
+                addr,
+            )
+
+    def on_message(message, send):
+        op = message["op"]
+        if op == DiscordVoiceClient.IDENTIFY:
+            send({"op": DiscordVoiceClient.READY, "d": {
+                "ssrc": ssrc, "ip": "127.0.0.1", "port": udp_port,
+                "modes": ["xsalsa20_poly1305", "xsalsa20_poly1305_lite"],
+            }})
+        elif op == DiscordVoiceClient.SELECT_PROTOCOL:
+            send({"op": DiscordVoiceClient.SESSION_DESCRIPTION, "d": {
+                "mode": message["d"]["data"]["mode"],
+                "secret_key": SECRET_KEY,
+            }})
+        elif op == DiscordVoiceClient.HEARTBEAT:
+            send({"op": DiscordVoiceClient.HEARTBEAT_ACK, "d": message["d"]})
+
+    def on_connect(send):
+        send({"op": DiscordVoiceClient.HELLO,
+              "d": {"heartbeat_interval": 100}})
+
+    server = FakeGateway(on_message, on_connect)
+    udp, _ = server.call(server.loop.create_datagram_endpoint(
+        DiscoveryProtocol, local_addr=("127.0.0.1", 0)
+    ))
+    udp_port = udp.get_extra_info("sockname")[1]
+
+    gateway = SimpleNamespace(user=SimpleNamespace(id="1"))
+    voice = DiscordVoiceClient(gateway, server.url, "token", "sid", "1")
+    try:
+        voice.start()
+        assert voice.ready_to_run.wait(5)
+        assert (voice.ip, voice.port) == ("1.2.3.4", 5678)
+        assert voice.mode == "xsalsa20_poly1305_lite"
+
+        # heartbeats keep getting acknowledged without reconnecting
+        assert wait_until(lambda: len([
+            x for x in server.received
+            if x["op"] == DiscordVoiceClient.HEARTBEAT
+        ]) >= 3)
+        assert server.connections == 1
+    finally:
+        voice.stop()
+        assert voice.join(5)
+        server.loop.call_soon_threadsafe(udp.close)
+        server.close()
+
+
+def test_zlib_stream():
+    deflator = zlib.compressobj()
+    payloads = [
+        json.dumps({"op": 0, "d": {"content": str(i) * 100}}).encode()
+        for i in range(5)
+    ]
+    messages = [
+        deflator.compress(x) + deflator.flush(zlib.Z_SYNC_FLUSH)
+        for x in payloads
+    ]
+
+    inflator = ZlibStreamInflator()
+    assert inflator.feed(messages[0]) == payloads[0]
+    assert inflator.feed(messages[1]) == payloads[1]
+
+    # payload split over multiple messages
+    message = messages[2]
+    assert inflator.feed(message[:3]) is None
+    assert inflator.feed(message[3:-2]) is None
+    assert inflator.feed(message[-2:]) == payloads[2]
+
+    assert inflator.feed(messages[3]) == payloads[3]
+    assert inflator.bytes_out == sum(len(x) for x in payloads[:4])